@@ -0,0 +1,76 @@
+"""Helpers shared by the benchmark scripts (local nodes, percentiles, JSON output)."""
+import json
+import math
+import threading
+from core.async_server import AsyncBankNode
+from core.bank_service import BankService
+from core.pool_server import PooledBankNode
+from core.server import BankNode
+from shared.logger import setup_logging
+from shared.persistence.repository import AccountRepository
+
+ENGINES = {
+    "threaded": BankNode,
+    "asyncio": AsyncBankNode,
+    "pool": PooledBankNode,
+}
+
+
+def quiet_logging():
+    """Benchmarks measure the node, not the console: keep only warnings, drop per-request lines."""
+    setup_logging("WARNING", hot_path_sample=0)
+
+
+def percentile(sorted_values: list, pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list (0 for an empty list)."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(pct / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def latency_summary(latencies: list) -> dict:
+    """Summarizes latencies (seconds) as milliseconds."""
+    values = sorted(latencies)
+    return {
+        "count": len(values),
+        "mean_ms": round(sum(values) / len(values) * 1000, 3) if values else 0.0,
+        "p50_ms": round(percentile(values, 50) * 1000, 3),
+        "p99_ms": round(percentile(values, 99) * 1000, 3),
+        "p999_ms": round(percentile(values, 99.9) * 1000, 3),
+        "max_ms": round(values[-1] * 1000, 3) if values else 0.0,
+    }
+
+
+class LocalNode:
+    """
+    A Bank Node started in-process on a loopback port for benchmarking.
+
+    Attributes:
+        node (BankNode | AsyncBankNode | PooledBankNode): The running server.
+        repository (AccountRepository): The node's storage.
+        port (int): The port the node actually listens on.
+    """
+
+    def __init__(self, data_dir: str, engine: str = "threaded", port: int = 0, **repo_options):
+        self.repository = AccountRepository(f"{data_dir}/accounts.json", **repo_options)
+        self.node = ENGINES[engine]("127.0.0.1", port, BankService(self.repository))
+        self._thread = threading.Thread(target=self.node.start_server, daemon=True)
+        self._thread.start()
+        if not self.node.ready.wait(10):
+            raise RuntimeError("Bank Node did not start")
+        self.port = self.node.port
+
+    def stop(self):
+        self.node.stop()
+        self._thread.join(5)
+        self.repository.close()
+
+
+def emit(result: dict, output: str = None):
+    """Prints the result as JSON and optionally writes it to a file for later comparison."""
+    text = json.dumps(result, indent=2)
+    print(text)
+    if output:
+        with open(output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
@@ -0,0 +1,188 @@
+"""
+Command dispatch microbenchmark: the former if/elif chain vs. the dispatch table.
+
+Both variants run the same command lines against the same BankService and
+repository, including the per-command metrics, so the difference is
+parsing + dispatch + metric lookups only:
+    - legacy: a copy of the original execute_command/_execute_command (split,
+      compare the command code against each branch in turn, convert arguments
+      per branch, look up the labelled metrics by name on every call)
+    - table:  parse_command() with the command's precompiled parser, one dict
+      lookup in execute_request(), metric objects cached per route
+
+Commands late in the old chain (BA, BN) gained the most, since they had to
+pass every earlier comparison.
+
+Usage:
+    python -m benchmarks.dispatch_benchmark [--ops 20000] [--output dispatch.json]
+"""
+import time
+import random
+import argparse
+import tempfile
+from core.bank_service import BankService
+from shared.persistence.repository import AccountRepository
+from benchmarks.common import emit, quiet_logging
+
+
+LEGACY_COMMANDS = {"BC", "AC", "AD", "AW", "AB", "AR", "BA", "BN", "AH", "BM"}
+
+
+def legacy_execute(service: BankService, command_str: str, client_ip: str) -> str:
+    """BankService.execute_command (metrics wrapper) before the dispatch table."""
+    start = time.perf_counter()
+    response = legacy_chain(service, command_str, client_ip)
+    elapsed = time.perf_counter() - start
+
+    head = command_str.split(None, 1)
+    cmd = head[0].upper() if head else ""
+    cmd = cmd if cmd in LEGACY_COMMANDS else "OTHER"
+    status = "error" if response.startswith("ER") else "ok"
+    service.metrics.histogram("bank_command_seconds", command=cmd).observe(elapsed)
+    service.metrics.counter("bank_commands_total", command=cmd, status=status).inc()
+    return response
+
+
+def legacy_chain(service: BankService, command_str: str, client_ip: str) -> str:
+    """The if/elif chain of BankService._execute_command before the dispatch table."""
+    with service.metrics.timer("bank_parse_seconds"):
+        parts = command_str.strip().split()
+        cmd = parts[0].upper() if parts else None
+    if not parts:
+        return "ER Empty command"
+    try:
+        if cmd == "BC":
+            return f"BC {client_ip}"
+        elif cmd == "AC":
+            try:
+                new_num = service.repository.create_next().number
+            except ValueError as e:
+                return f"ER {str(e)}"
+            service._log_transaction("AC", new_num)
+            return f"AC {new_num}/{client_ip}"
+        elif cmd == "AD":
+            if len(parts) != 3: return "ER Invalid format"
+            acc_full = parts[1]
+            amount = int(parts[2])
+            if "/" not in acc_full: return "ER Invalid account format"
+            acc_num_str, target_ip = acc_full.split("/")
+            acc_num = int(acc_num_str)
+            if not service._is_local_account(target_ip):
+                return service._forward_command(target_ip, command_str)
+            try:
+                with service.metrics.timer("bank_repository_seconds", op="deposit"):
+                    service.repository.deposit(acc_num, amount)
+            except ValueError as e:
+                return f"ER {str(e)}"
+            service._log_transaction("AD", acc_num, amount)
+            return "AD"
+        elif cmd == "AW":
+            if len(parts) != 3: return "ER Invalid format"
+            acc_full = parts[1]
+            amount = int(parts[2])
+            if "/" not in acc_full: return "ER Invalid account format"
+            acc_num_str, target_ip = acc_full.split("/")
+            acc_num = int(acc_num_str)
+            if not service._is_local_account(target_ip):
+                return service._forward_command(target_ip, command_str)
+            try:
+                with service.metrics.timer("bank_repository_seconds", op="withdraw"):
+                    service.repository.withdraw(acc_num, amount)
+            except ValueError as e:
+                return f"ER {str(e)}"
+            service._log_transaction("AW", acc_num, amount)
+            return "AW"
+        elif cmd == "AB":
+            if len(parts) != 2: return "ER Invalid format"
+            acc_full = parts[1]
+            if "/" in acc_full:
+                acc_num_str, target_ip = acc_full.split("/")
+                if not service._is_local_account(target_ip):
+                    return service._forward_command(target_ip, command_str)
+                acc_num = int(acc_num_str)
+            else:
+                acc_num = int(acc_full)
+            with service.metrics.timer("bank_repository_seconds", op="lookup"):
+                account = service.repository.find_by_number(acc_num)
+            if not account: return "ER Account not found"
+            return f"AB {account.balance}"
+        elif cmd == "AR":
+            acc_num = int(parts[1].split("/")[0])
+            try:
+                service.repository.delete(acc_num)
+                service._log_transaction("AR", acc_num)
+                return "AR"
+            except ValueError as e:
+                return f"ER {str(e)}"
+        elif cmd == "AH":
+            if not 2 <= len(parts) <= 4: return "ER Invalid format"
+            acc_full = parts[1]
+            if "/" in acc_full:
+                acc_num_str, target_ip = acc_full.split("/")
+                if not service._is_local_account(target_ip):
+                    return service._forward_command(target_ip, command_str)
+            else:
+                acc_num_str = acc_full
+            acc_num = int(acc_num_str)
+            page = int(parts[2]) if len(parts) > 2 else 0
+            page_size = int(parts[3]) if len(parts) > 3 else 10
+            if page < 0 or not 1 <= page_size <= 100: return "ER Invalid page"
+            records = service.audit_log.history(acc_num, page * page_size, page_size)
+            entries = ";".join(r.format() for r in records)
+            return f"AH {entries}" if entries else "AH"
+        elif cmd == "BM":
+            return f"BM {service.metrics.summary()}"
+        elif cmd == "BA":
+            return f"BA {service.repository.total_balance()}"
+        elif cmd == "BN":
+            return f"BN {service.repository.count()}"
+        else:
+            return "ER Unknown command"
+    except Exception as e:
+        return f"ER System error: {str(e)}"
+
+
+def bench(ops: int, accounts: int, rng: random.Random) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        repository = AccountRepository(f"{tmp}/accounts.json", fsync_every=0, snapshot_every=0)
+        service = BankService(repository)
+        try:
+            numbers = [a.number for a in repository.create_many(accounts)]
+            commands = {
+                "BC": lambda: "BC",
+                "AD": lambda: f"AD {rng.choice(numbers)}/127.0.0.1 10",
+                "AW": lambda: f"AW {rng.choice(numbers)}/127.0.0.1 1",
+                "AB": lambda: f"AB {rng.choice(numbers)}/127.0.0.1",
+                "BA": lambda: "BA",
+                "BN": lambda: "BN",
+                "XX": lambda: "XX unknown",
+            }
+            results = {}
+            for cmd, make in commands.items():
+                lines = [make() for _ in range(ops)]
+                timings = {}
+                for name, execute in (("legacy", legacy_execute), ("table", BankService.execute_command)):
+                    start = time.perf_counter()
+                    for line in lines:
+                        execute(service, line, "127.0.0.1")
+                    timings[f"{name}_us"] = round((time.perf_counter() - start) / ops * 1e6, 3)
+                results[cmd] = timings
+        finally:
+            repository.close()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="If/elif chain vs. dispatch table for protocol commands.")
+    parser.add_argument("--ops", type=int, default=20000, help="Executions per command type and variant.")
+    parser.add_argument("--accounts", type=int, default=1000, help="Accounts created before measuring.")
+    parser.add_argument("--output", help="Also write the JSON report to this file.")
+    args = parser.parse_args()
+
+    quiet_logging()
+    results = bench(args.ops, args.accounts, random.Random(1))
+    emit({"benchmark": "dispatch", "ops": args.ops, "results": results}, args.output)
+
+
+if __name__ == "__main__":
+    main()
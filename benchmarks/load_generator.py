@@ -0,0 +1,182 @@
+"""
+Load generator for the banking protocol.
+
+Starts one or more local Bank Nodes on loopback ports (or targets an
+already running node with --target) and drives a configurable command mix
+over many connections, either at fixed concurrency (closed loop: every
+connection sends the next command as soon as the previous answer arrived)
+or at a fixed total rate (open loop). Latency is measured from the
+*intended* send time in fixed-rate mode, so a stalled server is not hidden
+by the client slowing down (coordinated omission).
+
+Usage:
+    python -m benchmarks.load_generator --connections 64 --duration 10
+    python -m benchmarks.load_generator --rate 5000 --mix AD=50,AB=50 --engine asyncio
+    python -m benchmarks.load_generator --target 127.0.0.1:65525 --output before.json
+"""
+import time
+import random
+import socket
+import argparse
+import tempfile
+import threading
+from collections import defaultdict
+from benchmarks.common import ENGINES, LocalNode, emit, latency_summary, quiet_logging
+
+DEFAULT_MIX = "AC=2,AD=35,AW=25,AB=30,BA=4,BN=4"
+
+
+def parse_mix(text: str) -> list:
+    """Parses 'AD=40,AB=60' into [(command, weight), ...]."""
+    mix = []
+    for item in text.split(","):
+        cmd, _, weight = item.partition("=")
+        mix.append((cmd.strip().upper(), float(weight or 1)))
+    return mix
+
+
+class Connection:
+    """One client connection with a line-framed response reader."""
+
+    def __init__(self, endpoint: tuple):
+        self.sock = socket.create_connection(endpoint, timeout=30)
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.reader = self.sock.makefile("r", encoding="utf-8", newline="\r\n")
+
+    def request(self, line: str) -> str:
+        self.sock.sendall(f"{line}\n".encode("utf-8"))
+        return self.reader.readline().strip()
+
+    def close(self):
+        self.sock.close()
+
+
+def build_command(cmd: str, accounts: list, rng: random.Random) -> str:
+    account = rng.choice(accounts)
+    if cmd in ("AD", "AW"):
+        return f"{cmd} {account}/127.0.0.1 {rng.randint(1, 100)}"
+    if cmd == "AB":
+        return f"AB {account}/127.0.0.1"
+    return cmd
+
+
+def prepare_accounts(endpoint: tuple, count: int) -> list:
+    """Creates and funds benchmark accounts on a node."""
+    conn = Connection(endpoint)
+    accounts = []
+    for _ in range(count):
+        number = conn.request("AC").split()[1].split("/")[0]
+        conn.request(f"AD {number}/127.0.0.1 1000000")
+        accounts.append(number)
+    conn.close()
+    return accounts
+
+
+def worker(endpoint, accounts, mix, deadline, interval, seed, results, start_at):
+    """Runs one connection until the deadline and records (command, latency, ok)."""
+    rng = random.Random(seed)
+    commands = [cmd for cmd, _ in mix]
+    weights = [w for _, w in mix]
+    conn = Connection(endpoint)
+    records = []
+    next_send = start_at
+    try:
+        while True:
+            if interval:
+                # Fixed rate: wait for the scheduled slot, measure from it
+                now = time.perf_counter()
+                if next_send > now:
+                    time.sleep(next_send - now)
+                intended = next_send
+                next_send += interval
+            else:
+                intended = time.perf_counter()
+            if intended >= deadline:
+                break
+            cmd = rng.choices(commands, weights)[0]
+            response = conn.request(build_command(cmd, accounts, rng))
+            records.append((cmd, time.perf_counter() - intended, not response.startswith("ER")))
+    finally:
+        conn.close()
+        results.append(records)
+
+
+def run_load(endpoints: list, accounts: dict, mix: list, connections: int, duration: float,
+             rate: float = 0.0) -> dict:
+    """Drives the load against the endpoints and returns the JSON-ready report."""
+    results = []
+    start = time.perf_counter() + 0.2
+    deadline = start + duration
+    interval = connections / rate if rate else 0.0
+    threads = []
+    for i in range(connections):
+        endpoint = endpoints[i % len(endpoints)]
+        # Spread the fixed-rate schedules of the connections evenly over one interval
+        offset = interval * i / connections if interval else 0.0
+        t = threading.Thread(target=worker, args=(endpoint, accounts[endpoint], mix, deadline,
+                                                  interval, i, results, start + offset), daemon=True)
+        threads.append(t)
+        t.start()
+    for t in threads:
+        t.join()
+
+    all_records = [r for records in results for r in records]
+    per_command = defaultdict(list)
+    errors = defaultdict(int)
+    for cmd, latency, ok in all_records:
+        per_command[cmd].append(latency)
+        if not ok:
+            errors[cmd] += 1
+
+    return {
+        "mode": "fixed-rate" if rate else "fixed-concurrency",
+        "connections": connections,
+        "target_rate": rate or None,
+        "duration_s": duration,
+        "requests": len(all_records),
+        "throughput_rps": round(len(all_records) / duration, 1),
+        "latency": latency_summary([r[1] for r in all_records]),
+        "commands": {cmd: dict(latency_summary(lat), errors=errors[cmd])
+                     for cmd, lat in sorted(per_command.items())},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load generator for the P2P Banking Node protocol.")
+    parser.add_argument("--nodes", type=int, default=1, help="Local nodes to start (ignored with --target).")
+    parser.add_argument("--engine", choices=sorted(ENGINES), default="threaded")
+    parser.add_argument("--target", action="append", help="host:port of a running node (repeatable).")
+    parser.add_argument("--connections", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds of measured load.")
+    parser.add_argument("--rate", type=float, default=0.0, help="Total requests/s (0 = fixed concurrency).")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help=f"Command weights (Default: {DEFAULT_MIX}).")
+    parser.add_argument("--accounts", type=int, default=200, help="Funded accounts per node.")
+    parser.add_argument("--group-commit", action="store_true", help="Start local nodes with group commit.")
+    parser.add_argument("--output", help="Also write the JSON report to this file.")
+    args = parser.parse_args()
+
+    quiet_logging()
+    mix = parse_mix(args.mix)
+    nodes = []
+    tmp = tempfile.TemporaryDirectory()
+    try:
+        if args.target:
+            endpoints = [(host, int(port)) for host, _, port in (t.rpartition(":") for t in args.target)]
+        else:
+            for i in range(args.nodes):
+                nodes.append(LocalNode(f"{tmp.name}/node{i}", args.engine, group_commit=args.group_commit))
+            endpoints = [("127.0.0.1", node.port) for node in nodes]
+
+        accounts = {endpoint: prepare_accounts(endpoint, args.accounts) for endpoint in endpoints}
+        report = run_load(endpoints, accounts, mix, args.connections, args.duration, args.rate)
+        report.update({"benchmark": "load", "engine": None if args.target else args.engine,
+                       "nodes": len(endpoints), "mix": dict(mix)})
+        emit(report, args.output)
+    finally:
+        for node in nodes:
+            node.stop()
+        tmp.cleanup()
+
+
+if __name__ == "__main__":
+    main()
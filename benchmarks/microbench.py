@@ -0,0 +1,122 @@
+"""
+Microbenchmarks of the hot internal paths at different database sizes.
+
+Measures, for each account count (default 1k, 10k and the full 90k space):
+    - BankService.execute_command per command type (AB, AD, AW, BA, BN, AC)
+    - AccountRepository.save_all (full snapshot)
+    - AccountRepository._load (startup from a snapshot, JSON or binary)
+
+Results are printed as JSON (and optionally written with --output), so two
+commits can be compared by running the script on both and diffing the files.
+
+Usage:
+    python -m benchmarks.microbench [--sizes 1000,10000,90000] [--snapshot-format binary] [--output after.json]
+"""
+import json
+import time
+import random
+import argparse
+import tempfile
+import statistics
+from core.bank_service import BankService
+from core.domain import ACCOUNT_MIN, ACCOUNT_MAX
+from shared.persistence.repository import AccountRepository
+from shared.persistence.snapshot import load_json, write_binary_snapshot
+from benchmarks.common import emit, quiet_logging
+
+FULL_SPACE = ACCOUNT_MAX - ACCOUNT_MIN + 1
+
+
+def write_snapshot(path: str, size: int, rng: random.Random) -> list:
+    """Writes a JSON snapshot with `size` random accounts and returns their numbers."""
+    numbers = rng.sample(range(ACCOUNT_MIN, ACCOUNT_MAX + 1), size)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump([{"number": n, "balance": rng.randint(0, 100_000)} for n in numbers], f)
+    return numbers
+
+
+def time_call(fn, repeat: int) -> list:
+    """Returns the duration of `repeat` calls of fn in seconds."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def bench_size(size: int, ops: int, repeat: int, store: str, snapshot_format: str, rng: random.Random) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        data_file = f"{tmp}/accounts.json"
+        numbers = write_snapshot(data_file, size, rng)
+        if snapshot_format == "binary":
+            write_binary_snapshot(f"{tmp}/accounts.bin", load_json(data_file))
+        options = dict(fsync_every=0, snapshot_every=0, store=store, snapshot_format=snapshot_format)
+
+        # --- _load: repository construction from the snapshot ---
+        def load():
+            AccountRepository(data_file, **options).close()
+        load_times = time_call(load, repeat)
+
+        # --- first request: construction plus one AB (binary: hydrates one account) ---
+        def first_request():
+            repository = AccountRepository(data_file, **options)
+            BankService(repository).execute_command(f"AB {numbers[0]}/127.0.0.1", "127.0.0.1")
+            repository.close()
+        first_request_times = time_call(first_request, repeat)
+
+        repository = AccountRepository(data_file, **options)
+        service = BankService(repository)
+        try:
+            # --- save_all: full snapshot ---
+            save_times = time_call(repository.save_all, repeat)
+
+            # --- execute_command per command type ---
+            commands = {
+                "AB": lambda: f"AB {rng.choice(numbers)}/127.0.0.1",
+                "AD": lambda: f"AD {rng.choice(numbers)}/127.0.0.1 10",
+                "AW": lambda: f"AW {rng.choice(numbers)}/127.0.0.1 1",
+                "BA": lambda: "BA",
+                "BN": lambda: "BN",
+                "AC": lambda: "AC",
+            }
+            execute = {}
+            for cmd, make in commands.items():
+                lines = [make() for _ in range(ops)]
+                start = time.perf_counter()
+                for line in lines:
+                    service.execute_command(line, "127.0.0.1")
+                execute[cmd] = round((time.perf_counter() - start) / ops * 1e6, 3)
+        finally:
+            repository.close()
+
+    return {
+        "accounts": size,
+        "load_ms": round(statistics.median(load_times) * 1000, 3),
+        "first_request_ms": round(statistics.median(first_request_times) * 1000, 3),
+        "save_all_ms": round(statistics.median(save_times) * 1000, 3),
+        "execute_command_us": execute,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Microbenchmarks of execute_command, save_all and _load.")
+    parser.add_argument("--sizes", default=f"1000,10000,{FULL_SPACE}",
+                        help="Comma separated account counts (Default: 1k, 10k, full 90k space).")
+    parser.add_argument("--ops", type=int, default=5000, help="execute_command calls per command type.")
+    parser.add_argument("--repeat", type=int, default=5, help="Repetitions of save_all/_load (median is reported).")
+    parser.add_argument("--store", choices=["dict", "array"], default="dict")
+    parser.add_argument("--snapshot-format", choices=["json", "binary"], default="json")
+    parser.add_argument("--output", help="Also write the JSON report to this file.")
+    args = parser.parse_args()
+
+    quiet_logging()
+    rng = random.Random(1)
+    sizes = [min(int(s), FULL_SPACE) for s in args.sizes.split(",")]
+    results = [bench_size(size, args.ops, args.repeat, args.store, args.snapshot_format, rng) for size in sizes]
+    emit({"benchmark": "micro", "store": args.store, "snapshot_format": args.snapshot_format, "ops": args.ops,
+          "results": results}, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Peer protocol benchmark: text lines vs. binary frames between two Bank Nodes.
+
+A client BankService forwards the same AD/AW/AB sequence to a local node
+(execute_command -> _forward_command -> peer pool), once with the text
+protocol and once after negotiating the binary protocol, and reports the
+time per forwarded command. Also measures the pure server-side decode cost
+per request (parse_command vs. decode_request).
+
+Usage:
+    python -m benchmarks.protocol_benchmark [--ops 20000] [--engine asyncio] [--output protocol.json]
+"""
+import time
+import argparse
+import tempfile
+from core.bank_service import BankService
+from core.binary_protocol import decode_request, encode_request, LENGTH
+from core.commands import parse_command
+from core.peer_pool import PeerConnectionPool
+from core.peer_registry import PeerRegistry
+from shared.persistence.repository import AccountRepository
+from benchmarks.common import ENGINES, LocalNode, emit, quiet_logging
+
+
+def forwarding(tmp: str, port: int, binary: bool, lines: list) -> float:
+    """Mean microseconds per command forwarded by a client BankService over one pooled connection."""
+    repository = AccountRepository(f"{tmp}/client-{binary}/accounts.json", fsync_every=0)
+    registry = PeerRegistry(ports=range(port, port + 1))
+    client = BankService(repository, peer_pool=PeerConnectionPool(binary=binary), peer_registry=registry)
+    client.my_ips = ["10.255.255.1"]  # 127.0.0.1 is the remote bank
+    try:
+        client.execute_command(lines[0], "127.0.0.1")  # Connect (and negotiate) outside the measurement
+        start = time.perf_counter()
+        for line in lines:
+            client.execute_command(line, "127.0.0.1")
+        return round((time.perf_counter() - start) / len(lines) * 1e6, 3)
+    finally:
+        client.peer_pool.close_all()
+        registry.stop()
+        repository.close()
+
+
+def decode_cost(lines: list) -> dict:
+    """Mean microseconds to turn one received request into a Request (text vs. binary)."""
+    payloads = [encode_request(line)[1][LENGTH.size:] for line in lines]
+    start = time.perf_counter()
+    for line in lines:
+        parse_command(line)
+    text = time.perf_counter() - start
+    start = time.perf_counter()
+    for payload in payloads:
+        decode_request(payload)
+    binary = time.perf_counter() - start
+    return {"text_us": round(text / len(lines) * 1e6, 3), "binary_us": round(binary / len(lines) * 1e6, 3)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Text vs. binary protocol between Bank Nodes.")
+    parser.add_argument("--ops", type=int, default=20000, help="Requests per protocol.")
+    parser.add_argument("--engine", choices=[e for e in ENGINES if e != "pool"], default="threaded",
+                        help="Engine of the node under test (the pool engine only speaks text).")
+    parser.add_argument("--output", help="Also write the JSON report to this file.")
+    args = parser.parse_args()
+
+    quiet_logging()
+    with tempfile.TemporaryDirectory() as tmp:
+        node = LocalNode(tmp, args.engine, fsync_every=0)
+        try:
+            account = node.repository.create_next().number
+            mix = [f"AD {account}/127.0.0.1 5", f"AW {account}/127.0.0.1 2", f"AB {account}/127.0.0.1"]
+            lines = [mix[i % len(mix)] for i in range(args.ops)]
+            results = {
+                "forward_text_us": forwarding(tmp, node.port, False, lines),
+                "forward_binary_us": forwarding(tmp, node.port, True, lines),
+                "decode": decode_cost(lines),
+            }
+        finally:
+            node.stop()
+    emit({"benchmark": "protocol", "engine": args.engine, "ops": args.ops, "results": results}, args.output)
+
+
+if __name__ == "__main__":
+    main()
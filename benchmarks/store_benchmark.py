@@ -0,0 +1,98 @@
+"""
+Memory and latency benchmark of the in-memory account store backends.
+
+Each backend is measured in a fresh subprocess so the RSS numbers are not
+polluted by the other run. Results are printed as JSON.
+
+Usage:
+    python -m benchmarks.store_benchmark [--accounts N] [--ops N]
+"""
+import gc
+import sys
+import json
+import time
+import random
+import argparse
+import subprocess
+import tracemalloc
+from core.domain import ACCOUNT_MIN, ACCOUNT_MAX
+from shared.persistence.stores import STORES
+
+
+def current_rss_kb() -> int:
+    """Resident set size of this process in KiB (Linux /proc, falls back to peak RSS)."""
+    try:
+        with open("/proc/self/status", "r", encoding="utf-8") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def measure(backend: str, accounts: int, ops: int) -> dict:
+    """Fills one store backend and measures memory and per-operation latency."""
+    rng = random.Random(42)
+    numbers = rng.sample(range(ACCOUNT_MIN, ACCOUNT_MAX + 1), accounts)
+
+    gc.collect()
+    rss_before = current_rss_kb()
+    tracemalloc.start()
+    store = STORES[backend]()
+    for number in numbers:
+        store.add(number, rng.randint(0, 10_000))
+    traced, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    gc.collect()
+    rss_after = current_rss_kb()
+
+    probe = [rng.choice(numbers) for _ in range(ops)]
+
+    start = time.perf_counter()
+    for number in probe:
+        store.get_balance(number)
+    lookup_ns = (time.perf_counter() - start) / ops * 1e9
+
+    start = time.perf_counter()
+    for number in probe:
+        store.set_balance(number, store.get_balance(number) + 1)
+    update_ns = (time.perf_counter() - start) / ops * 1e9
+
+    return {
+        "backend": backend,
+        "accounts": accounts,
+        "traced_bytes": traced,
+        "bytes_per_account": round(traced / max(accounts, 1), 1),
+        "rss_delta_kb": rss_after - rss_before,
+        "lookup_ns": round(lookup_ns, 1),
+        "update_ns": round(update_ns, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare account store backends (memory + latency).")
+    parser.add_argument("--accounts", type=int, default=ACCOUNT_MAX - ACCOUNT_MIN + 1)
+    parser.add_argument("--ops", type=int, default=200_000)
+    parser.add_argument("--backend", choices=sorted(STORES), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.backend:
+        # Child mode: measure a single backend and print its JSON line
+        print(json.dumps(measure(args.backend, args.accounts, args.ops)))
+        return
+
+    results = []
+    for backend in sorted(STORES):
+        out = subprocess.run(
+            [sys.executable, "-m", "benchmarks.store_benchmark", "--backend", backend,
+             "--accounts", str(args.accounts), "--ops", str(args.ops)],
+            check=True, capture_output=True, text=True,
+        )
+        results.append(json.loads(out.stdout.strip().splitlines()[-1]))
+    print(json.dumps({"benchmark": "store", "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
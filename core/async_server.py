@@ -0,0 +1,184 @@
+import asyncio
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from core.bank_service import BankService
+from core.framing import LineReader, encode_responses
+from core.binary_protocol import HELLO, HELLO_REJECTED, FrameReader, encode_response, execute_frames
+from shared.logger import REQUEST_LOGGER
+from core.metrics import METRICS
+
+logger = logging.getLogger(__name__)
+request_log = logging.getLogger(REQUEST_LOGGER)
+
+
+class AsyncBankNode:
+    """
+    Alternative Network Layer built on asyncio (selected with `--engine asyncio`).
+
+    All client sockets are served by a single event loop instead of one OS
+    thread per connection, so thousands of idle PuTTY/netcat sessions cost
+    only a few kilobytes each. Commands are still executed through
+    BankService.execute_command, which may block (disk I/O, P2P forwarding),
+    so it runs on a small, bounded thread pool.
+
+    Attributes:
+        ip (str): The IP address to bind to.
+        port (int): The TCP port to listen on.
+        service (BankService): The business logic controller.
+        backlog (int): Size of the kernel accept queue.
+        reuse_port (bool): Share the port with other processes (SO_REUSEPORT, sharded mode).
+        max_connections (int): Connections above this limit are refused with an ER message.
+        active_connections (int): Number of currently open client connections.
+        ready (threading.Event): Set once the server is listening.
+    """
+
+    def __init__(self, ip: str, port: int, service: BankService = None,
+                 backlog: int = 1024, max_connections: int = 10000, executor_workers: int = 32,
+                 reuse_port: bool = False):
+        self.ip = ip
+        self.port = port
+        self.service = service or BankService()
+        self.backlog = backlog
+        self.reuse_port = reuse_port
+        self.max_connections = max_connections
+        self.executor_workers = executor_workers
+        self.active_connections = 0
+        self.ready = threading.Event()
+
+        self._loop = None
+        self._server = None
+        self._executor = None
+
+    def start_server(self):
+        """Runs the event loop until the server is stopped (Blocking call)."""
+        asyncio.run(self._serve())
+
+    def stop(self):
+        """Stops the server from any thread."""
+        if self._loop is not None and self._server is not None:
+            self._loop.call_soon_threadsafe(self._server.close)
+
+    async def _serve(self):
+        self._loop = asyncio.get_running_loop()
+        self._executor = ThreadPoolExecutor(max_workers=self.executor_workers,
+                                            thread_name_prefix="bank-worker")
+        try:
+            self._server = await asyncio.start_server(
+                self.handle_client, self.ip, self.port,
+                backlog=self.backlog, reuse_address=True,
+                reuse_port=self.reuse_port or None
+            )
+            self.port = self._server.sockets[0].getsockname()[1]  # Resolves port 0 to the real port
+            logger.info("[SERVER] Bank Node (asyncio) running on %s:%s", self.ip, self.port)
+            logger.info("[SERVER] Backlog %d, connection limit %d", self.backlog, self.max_connections)
+            self.ready.set()
+            async with self._server:
+                try:
+                    await self._server.serve_forever()
+                except asyncio.CancelledError:
+                    pass
+        except Exception as e:
+            logger.critical("[CRITICAL] Server failed: %s", e)
+        finally:
+            self._executor.shutdown(wait=False)
+
+    async def handle_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """
+        Handles the lifecycle of a single client connection (coroutine version of
+        BankNode.handle_client). Speaks exactly the same line-based text protocol,
+        including the switch to the binary protocol after "BP 2" (refused when
+        more data follows it in the same read).
+        """
+        addr = writer.get_extra_info("peername") or ("?", 0)
+
+        if self.active_connections >= self.max_connections:
+            writer.write(b"ER Too many connections\r\n")
+            await self._close(writer)
+            return
+
+        self.active_connections += 1
+        METRICS.gauge("bank_active_connections").inc()
+        request_log.info("[CONN] %s connected. Active connections: %d", addr[0], self.active_connections)
+
+        line_reader = LineReader()
+        frames = None  # FrameReader once the client switched to the binary protocol
+
+        try:
+            while True:
+                # Same idle timeout as the threaded engine (manual testing friendly)
+                data = await asyncio.wait_for(reader.read(4096), timeout=300)
+                if not data:
+                    break  # Connection closed by client
+
+                if frames is not None:
+                    try:
+                        payloads = frames.feed(data)
+                    except ValueError as e:
+                        writer.write(encode_response(None, f"ER {e}"))
+                        await writer.drain()
+                        break
+                    if payloads:
+                        writer.write(await self._loop.run_in_executor(
+                            self._executor, execute_frames, self.service, payloads, addr[0]))
+                        await writer.drain()
+                    continue
+
+                try:
+                    lines = line_reader.feed(data)
+                except ValueError as e:
+                    writer.write(encode_responses([f"ER {e}"]))
+                    await writer.drain()
+                    break
+
+                commands = []
+                for index, line in enumerate(lines):
+                    command_str = line.strip()
+                    if command_str == HELLO and not (
+                            line_reader.pending or any(rest.strip() for rest in lines[index + 1:])):
+                        # Binary from the next packet on (the client waits for this answer)
+                        frames = FrameReader()
+                        break
+                    if command_str:
+                        commands.append(command_str)
+                if not commands and frames is None:
+                    continue
+
+                for command_str in commands:
+                    request_log.info("[RECV] %s", command_str)
+
+                # --- PROCESS COMMANDS (off the event loop, in order) ---
+                responses = await self._loop.run_in_executor(
+                    self._executor, self._execute_all, commands, addr[0]
+                )
+                if frames is not None:
+                    responses.append(HELLO)
+
+                writer.write(encode_responses(responses))
+                await writer.drain()
+
+        except asyncio.TimeoutError:
+            logger.info("[TIMEOUT] Client %s was idle for too long.", addr[0])
+        except ConnectionResetError:
+            logger.info("[DISCONNECT] Client %s forcibly closed connection.", addr[0])
+        except Exception as e:
+            logger.error("[ERROR] Handling client %s: %s", addr[0], e)
+        finally:
+            self.active_connections -= 1
+            METRICS.gauge("bank_active_connections").dec()
+            await self._close(writer)
+            request_log.info("[CLOSED] Connection with %s closed.", addr[0])
+
+    def _execute_all(self, commands: list, client_ip: str) -> list:
+        """Executes a pipelined group of commands sequentially on a worker thread."""
+        # A hello that reaches this point was followed by more data: refused
+        return [HELLO_REJECTED if command_str == HELLO
+                else self.service.execute_command(command_str, client_ip) for command_str in commands]
+
+    @staticmethod
+    async def _close(writer: asyncio.StreamWriter):
+        try:
+            writer.close()
+            await writer.wait_closed()
+        except Exception:
+            pass
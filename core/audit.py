@@ -0,0 +1,119 @@
+import os
+import logging
+import time
+import threading
+from pathlib import Path
+from typing import NamedTuple
+from shared.structures.RingBuffer import RingBuffer
+
+logger = logging.getLogger(__name__)
+
+
+class TransactionRecord(NamedTuple):
+    """One structured audit entry (instead of a preformatted string)."""
+    timestamp: float
+    op: str
+    account: int
+    amount: int = 0
+
+    def format(self) -> str:
+        """Human readable form used by the AH command and the spill file."""
+        when = time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(self.timestamp))
+        return f"{when} {self.op} {self.account} {self.amount}"
+
+    # Lets loggers format the record lazily (only if the line is actually written)
+    __str__ = format
+
+
+class AuditLog:
+    """
+    Bounded in-memory transaction history with on-disk spill.
+
+    The most recent `capacity` records are kept in a RingBuffer, so memory use
+    is fixed no matter how long the node runs. Records pushed out of the ring
+    are appended to a rotating log file (`spill_file`, `spill_file.1`, ...)
+    in batches, so old history is archived instead of lost.
+
+    Attributes:
+        buffer (RingBuffer): Recent records, oldest to newest.
+        spill_file (Path): Archive for evicted records (None = drop them).
+        max_bytes (int): Size after which the archive is rotated.
+        backup_count (int): Number of rotated archive files to keep.
+    """
+
+    def __init__(self, capacity: int = 10000, spill_file: str = None,
+                 max_bytes: int = 10 * 1024 * 1024, backup_count: int = 5, spill_batch: int = 256):
+        self.buffer = RingBuffer(capacity)
+        self.spill_file = Path(spill_file) if spill_file else None
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.spill_batch = spill_batch
+        self._pending_spill = []
+        self._lock = threading.Lock()
+        self._spill_lock = threading.Lock()
+        if self.spill_file:
+            self.spill_file.parent.mkdir(parents=True, exist_ok=True)
+
+    def record(self, op: str, account: int, amount: int = 0) -> TransactionRecord:
+        """Stores a new record; evicted records are queued for the archive."""
+        entry = TransactionRecord(time.time(), op, account, amount)
+        spill = None
+        with self._lock:
+            evicted = self.buffer.add(entry)
+            if evicted is not None and self.spill_file:
+                self._pending_spill.append(evicted)
+                if len(self._pending_spill) >= self.spill_batch:
+                    spill, self._pending_spill = self._pending_spill, []
+        if spill:
+            self._write_spill(spill)
+        return entry
+
+    def history(self, account: int = None, offset: int = 0, limit: int = 10) -> list:
+        """
+        Returns recent records (newest first), optionally only for one account.
+
+        Args:
+            account (int): Filter by account number (None = all accounts).
+            offset (int): Number of matching records to skip (paging).
+            limit (int): Maximum number of records to return.
+        """
+        with self._lock:
+            snapshot = list(self.buffer.newest_first())
+        matches = (r for r in snapshot if account is None or r.account == account)
+        result = []
+        for i, entry in enumerate(matches):
+            if i < offset:
+                continue
+            if len(result) >= limit:
+                break
+            result.append(entry)
+        return result
+
+    def flush(self):
+        """Writes queued evicted records to the archive (call on shutdown)."""
+        with self._lock:
+            spill, self._pending_spill = self._pending_spill, []
+        if spill:
+            self._write_spill(spill)
+
+    def _write_spill(self, records: list):
+        with self._spill_lock:
+            try:
+                with open(self.spill_file, "a", encoding="utf-8") as f:
+                    f.write("".join(f"{r.format()}\n" for r in records))
+                    size = f.tell()
+                if size >= self.max_bytes:
+                    self._rotate()
+            except OSError as e:
+                logger.warning("[WARN] Could not archive audit records: %s", e)
+
+    def _rotate(self):
+        """Shifts audit.log -> audit.log.1 -> ... and drops the oldest archive."""
+        for i in range(self.backup_count - 1, 0, -1):
+            src = Path(f"{self.spill_file}.{i}")
+            if src.exists():
+                os.replace(src, f"{self.spill_file}.{i + 1}")
+        if self.backup_count > 0:
+            os.replace(self.spill_file, f"{self.spill_file}.1")
+        else:
+            self.spill_file.unlink()
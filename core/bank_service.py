@@ -1,8 +1,68 @@
 import time
+import uuid
 import socket
-from shared.persistence.repository import AccountRepository
-from shared.structures.LinkedStack import LinkedStack
-from shared.structures.LinkedQueue import LinkedQueue
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import NamedTuple
+from shared.persistence.repository import AccountRepository, BatchError
+from core.peer_pool import PeerConnectionPool
+from core.peer_registry import PeerRegistry
+from core.circuit_breaker import CLOSED, HALF_OPEN, CircuitBreakerRegistry
+from core.audit import AuditLog
+from core.metrics import METRICS, MetricsRegistry
+from core.profiling import ProfileSession
+from core.commands import (COMMAND_SPECS, WRITE_COMMANDS, CommandSpec, ParseError, Request, compile_parser,
+                           is_bank_ip, parse_batch, parse_command)
+from shared.logger import REQUEST_LOGGER
+
+logger = logging.getLogger(__name__)
+request_log = logging.getLogger(REQUEST_LOGGER)
+
+# Default port of the assignment; peers on other ports are found by the PeerRegistry
+PEER_PORT = 65525
+# Metrics label of forwards to IPs where no bank has answered yet
+UNKNOWN_PEER = "unknown"
+# Outgoing transfers whose destination does not answer: longest delay between two
+# recovery attempts, and after how long one whose TC never left this node is refunded
+TRANSFER_RETRY_MAX = 300.0
+TRANSFER_ABORT_AFTER = 600.0
+# Prepared incoming transfers that get no TC within this many seconds are aborted
+INCOMING_TRANSFER_TTL = 24 * 3600
+
+
+class PeerUnavailable(ConnectionError):
+    """
+    A peer bank could not be reached (offline, timeout, circuit open, no bank at the IP).
+
+    Attributes:
+        sent (bool): False if the command provably never left this node (no bank
+            found, circuit open, connection refused); True if the peer may have seen it.
+    """
+
+    def __init__(self, message: str, sent: bool = True):
+        super().__init__(message)
+        self.sent = sent
+
+
+class _Route(NamedTuple):
+    """A registered command: its handler plus the metric objects it reports to."""
+    handler: object
+    forward: bool
+    latency: object
+    ok: object
+    errors: object
+
+
+class _PendingTransfer:
+    """Retry state of an outgoing transfer whose destination did not answer (see recover_transfers)."""
+    __slots__ = ("since", "delay", "next_try", "tc_sent")
+
+    def __init__(self, tc_sent: bool = False):
+        self.since = time.monotonic()
+        self.delay = 1.0
+        self.next_try = 0.0
+        self.tc_sent = tc_sent  # A TC may have reached the destination: never refund on our own
 
 
 class BankService:
@@ -13,23 +73,60 @@ class BankService:
     1. Validates and executes incoming commands.
     2. Manages data persistence via AccountRepository.
     3. Handles P2P routing (forwarding commands to other nodes).
-    4. Logs activity using custom Linked structures.
+    4. Logs activity into a bounded audit history (RingBuffer).
 
     Attributes:
         repository (AccountRepository): Access to data storage.
-        transaction_history (LinkedStack): LIFO log of operations.
-        request_queue (LinkedQueue): FIFO buffer for incoming requests.
+        audit_log (AuditLog): Bounded history of structured transaction records.
         my_ips (list): List of IP addresses identified as 'local'.
+        peer_pool (PeerConnectionPool): Warm, reusable connections to other nodes.
+        peer_registry (PeerRegistry): Routing table bank IP -> (ip, port) of its node.
+        breakers (CircuitBreakerRegistry): Per-peer circuit breakers (fail fast on dead peers).
+        metrics (MetricsRegistry): Counters and latency histograms of this node.
+        shard_router (ShardRouter): Routes accounts of sibling shards (None = not sharded).
+        peers (list): (ip, port) of the other known banks, asked by NA/NN.
+        fanout_timeout (float): Seconds NA/NN wait for the peers' answers.
+        replica (ReplicationFollower): Set while this node follows a leader (see core.replication).
+        read_only (bool): Reject commands that change data (a follower until it is promoted).
+        transfer_retry_max (float): Longest delay between two recovery attempts of a transfer.
+        transfer_abort_after (float): Seconds after which a transfer whose TC never reached
+            the destination is refunded.
+        incoming_transfer_ttl (float): Seconds after which a prepared incoming transfer
+            without TC is aborted.
     """
 
-    def __init__(self):
-        self.repository = AccountRepository()
-
-        # --- CODE REUSE NOTE ---
-        # Integrates LinkedStack (History) and LinkedQueue (Buffer) from algorithmic tasks.
-        # -----------------------
-        self.transaction_history = LinkedStack()
-        self.request_queue = LinkedQueue()
+    def __init__(self, repository: AccountRepository = None, peer_pool: PeerConnectionPool = None,
+                 audit_log: AuditLog = None, metrics: MetricsRegistry = None, peers: list = None,
+                 fanout_timeout: float = 2.0, peer_registry: PeerRegistry = None,
+                 breakers: CircuitBreakerRegistry = None):
+        self.repository = repository or AccountRepository()
+        self.peer_pool = peer_pool or PeerConnectionPool()
+        self.peer_registry = peer_registry or PeerRegistry()
+        self.breakers = breakers or CircuitBreakerRegistry(probe=self.peer_registry.check)
+        self._parsers = {}
+        self._routes = {}
+        self.shard_router = None
+        self.peers = list(peers or [])
+        self.fanout_timeout = fanout_timeout
+        self._fanout_executor = None
+        # Outgoing transfers currently driven by a request (skipped by recovery)
+        self._transfers_in_flight = set()
+        self._transfers_lock = threading.Lock()
+        self._pending_transfers = {}  # Transfer id -> _PendingTransfer
+        self.transfer_retry_max = TRANSFER_RETRY_MAX
+        self.transfer_abort_after = TRANSFER_ABORT_AFTER
+        self.incoming_transfer_ttl = INCOMING_TRANSFER_TTL
+        self._recovery_stop = threading.Event()
+        self.replica = None
+        self.read_only = False
+        self._profiling = None  # ProfileSession, created by the first PF
+        self.metrics = metrics or METRICS
+        self.metrics.add_collector(self._collect_metrics)
+
+        # Fixed-size history; older records are archived next to the database
+        self.audit_log = audit_log or AuditLog(
+            spill_file=self.repository.data_file.parent / "audit.log"
+        )
 
         # --- FIX: Dynamic IP Detection ---
         # We start with standard loopback addresses
@@ -39,197 +136,837 @@ class BankService:
         # This prevents the "Self-Forwarding Loop" error.
         try:
             hostname = socket.gethostname()
-            local_ip = socket.gethostbyname(hostname)
-            if local_ip not in self.my_ips:
-                self.my_ips.append(local_ip)
-
-            # Print for debugging so you can see what IPs are considered local
-            print(f"[INFO] BankService initialized. My local IPs: {self.my_ips}")
+            local_ips = [socket.gethostbyname(hostname)]
+            # All addresses of the host (several interfaces), not only the first one
+            local_ips += [info[4][0] for info in socket.getaddrinfo(hostname, None, socket.AF_INET)]
+            for local_ip in local_ips:
+                if local_ip not in self.my_ips:
+                    self.my_ips.append(local_ip)
+
+            # Log for debugging so you can see what IPs are considered local
+            logger.info("[INFO] BankService initialized. My local IPs: %s", self.my_ips)
         except Exception as e:
-            print(f"[WARN] Could not detect local IP: {e}")
-
-    def _log_transaction(self, message: str):
+            logger.warning("[WARN] Could not detect local IP: %s", e)
+
+        # --- Dispatch table: command code -> _Route(handler, metrics, ...) ---
+        # Parsers and metric objects are resolved once here, not per request.
+        builtin = {
+            "BC": self._bank_check,
+            "AC": self._account_create,
+            "AD": self._account_deposit,
+            "AW": self._account_withdraw,
+            "AB": self._account_balance,
+            "AR": self._account_remove,
+            "AH": self._account_history,
+            "BM": self._bank_metrics,
+            "BA": self._bank_amount,
+            "BN": self._bank_number,
+            "NA": self._network_amount,
+            "NN": self._network_number,
+            "PS": self._peer_status,
+            "BT": self._batch,
+            "AT": self._account_transfer,
+            "TP": self._transfer_prepare,
+            "TC": self._transfer_commit,
+            "TA": self._transfer_acknowledge,
+            "RL": self._replication_lag,
+            "RP": self._promote,
+            "PF": self._profile,
+        }
+        for command, handler in builtin.items():
+            self.register_command(command, handler, COMMAND_SPECS[command])
+
+    def _collect_metrics(self) -> list:
+        """Exports counters owned by other objects (peer pool, WAL) at scrape time."""
+        samples = [(f"bank_peer_pool_{key}", {}, value) for key, value in self.peer_pool.stats().items()]
+        samples.append(("bank_accounts", {}, self.repository.count()))
+        samples.append(("bank_wal_records", {}, self.repository.wal.record_count))
+        samples.append(("bank_wal_group_commit_batches_total", {}, self.repository.wal.batches))
+        peers = self.peer_registry.entries()
+        samples.append(("bank_peer_registry_peers", {}, len(peers)))
+        samples.append(("bank_peer_registry_healthy", {}, sum(1 for peer in peers if peer.healthy)))
+        if self.replica is not None:
+            behind, silent = self.replica.lag()
+            samples.append(("bank_replication_lag_changes", {}, behind))
+            samples.append(("bank_replication_lag_seconds", {}, round(silent, 3)))
+        for peer, breaker in self.breakers.items():
+            # 0 = closed, 1 = half-open, 2 = open
+            state = 0 if breaker.state == CLOSED else 1 if breaker.state == HALF_OPEN else 2
+            samples.append(("bank_peer_circuit_state", {"peer": peer}, state))
+        return samples
+
+    def _log_transaction(self, op: str, account: int, amount: int = 0):
         """
-        Logs an event to both the Audit Log (Stack) and Processing Buffer (Queue).
-        Demonstrates the usage of custom data structures.
+        Records an operation in the bounded audit history.
 
         Args:
-            message (str): The transaction details to log.
+            op (str): Protocol command of the operation (AC, AD, AW, AR).
+            account (int): The affected account number.
+            amount (int): The moved amount (0 for AC/AR).
         """
-        timestamp = time.strftime("%H:%M:%S")
-        entry = f"[{timestamp}] {message}"
-        self.transaction_history.add(entry)
-        self.request_queue.add(entry)
-        print(f"[LOG] {entry}")
+        entry = self.audit_log.record(op, account, amount)
+        request_log.info("[LOG] %s", entry)
 
-    def _forward_command(self, target_ip: str, command: str) -> str:
+    def _forward_command(self, target_ip: str, command, endpoint: tuple = None,
+                         timeout: float = None) -> str:
         """
         Acts as a TCP CLIENT to forward a command to a remote Bank Node.
         Used when the target account IP does not match the local node.
+        Connections are taken from the peer pool and kept open for reuse.
 
         Args:
             target_ip (str): The IP address of the remote bank.
-            command (str): The raw command string to forward.
+            command (str | Request): The command to forward (a parsed Request is sent as-is,
+                in binary form if the peer negotiated the binary protocol).
+            endpoint (tuple): (ip, port) to connect to (Default: looked up in the peer registry).
+            timeout (float): Connect/read timeout for this request (Default: the pool's timeout).
 
         Returns:
             str: The response from the remote server or an error message.
         """
-        print(f"[P2P] Forwarding command to {target_ip}: {command}")
         try:
-            # We assume all nodes listen on port 65525 as per assignment
-            with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
-                s.settimeout(5)  # Avoid hanging indefinitely
-                s.connect((target_ip, 65525))
-                s.sendall(f"{command}\n".encode("utf-8"))
+            return self._send_to_peer(target_ip, command, endpoint, timeout)
+        except PeerUnavailable as e:
+            return f"ER {str(e)}"
 
-                # Wait for response
-                response = s.recv(1024).decode("utf-8").strip()
-                return response
+    def _send_to_peer(self, target_ip: str, command, endpoint: tuple = None, timeout: float = None) -> str:
+        """
+        Like _forward_command, but a failure to reach the peer raises
+        PeerUnavailable instead of returning an ER line, so callers can tell
+        "the peer said no" from "the peer may not have seen the command".
+        """
+        request_log.info("[P2P] Forwarding command to %s: %s", target_ip,
+                         command.raw if isinstance(command, Request) else command)
+        routed = endpoint is None
+        # A bank is known by its IP; explicit endpoints (NA/NN peers) by ip:port
+        peer = target_ip if routed else f"{endpoint[0]}:{endpoint[1]}"
+        breaker = self.breakers.get(peer)
+        # Metrics are labelled per peer only once a bank answered there (bounded label set)
+        label = peer if breaker.endpoint is not None else UNKNOWN_PEER
+        if not breaker.allow():
+            # Known to be down: answer at once instead of waiting for a timeout
+            self.metrics.counter("bank_forward_rejected_total", peer=label).inc()
+            raise PeerUnavailable(f"Bank {target_ip} is unavailable (circuit open)", sent=False)
+
+        start = time.perf_counter()
+        # Every path below records an outcome: a half-open breaker must not wait for a lost trial
+        try:
+            if routed:
+                # Port of the bank from the routing table (scanned once, then cached)
+                endpoint = self.peer_registry.resolve(target_ip)
+                if endpoint is None:
+                    breaker.record_failure()
+                    self.metrics.counter("bank_forward_errors_total", peer=label).inc()
+                    ports = self.peer_registry.ports
+                    raise PeerUnavailable(f"No bank found at {target_ip} (ports {ports[0]}-{ports[-1]})", sent=False)
+            breaker.endpoint = endpoint
+            label = target_ip
+            # Reuse a pooled connection (no handshake/teardown per command)
+            response = self.peer_pool.request(endpoint, command, timeout)
+            breaker.record_success()
+            return response
+        except PeerUnavailable:
+            raise
         except ConnectionRefusedError:
-            return f"ER Connection refused by {target_ip} (Bank is offline)"
+            self._forward_failed(target_ip, routed, breaker, label)
+            raise PeerUnavailable(f"Connection refused by {target_ip} (Bank is offline)", sent=False) from None
         except socket.timeout:
-            return f"ER Timeout connecting to {target_ip}"
+            self._forward_failed(target_ip, routed, breaker, label)
+            raise PeerUnavailable(f"Timeout connecting to {target_ip}") from None
         except Exception as e:
-            return f"ER P2P Error: {str(e)}"
+            self._forward_failed(target_ip, routed, breaker, label)
+            raise PeerUnavailable(f"P2P Error: {str(e)}") from None
+        finally:
+            self.metrics.histogram("bank_forward_seconds", peer=label).observe(time.perf_counter() - start)
+
+    def _forward_failed(self, target_ip: str, routed: bool, breaker, label: str):
+        self.metrics.counter("bank_forward_errors_total", peer=label).inc()
+        breaker.record_failure()
+        if routed:
+            self.peer_registry.mark_failed(target_ip)  # Rescanned before the next use
+
+    @staticmethod
+    def _is_operator(client_ip: str) -> bool:
+        """Operator commands (RP, PF) are only accepted from the node's own host."""
+        return client_ip.startswith("127.") or client_ip == "::1"
 
     def _is_local_account(self, ip_address: str) -> bool:
         """Determines if the request is for this node or a remote peer."""
         return ip_address in self.my_ips
 
-    def execute_command(self, command_str: str, client_ip: str) -> str:
+    @property
+    def metrics(self) -> MetricsRegistry:
+        return self._metrics
+
+    @metrics.setter
+    def metrics(self, registry: MetricsRegistry):
+        # The routes hold direct references to their metric objects, so rebind them
+        self._metrics = registry
+        self._other = self._metrics_for("OTHER")
+        for command, route in self._routes.items():
+            self._routes[command] = _Route(route.handler, route.forward, *self._metrics_for(command))
+
+    def _metrics_for(self, command: str) -> tuple:
+        return (self.metrics.histogram("bank_command_seconds", command=command),
+                self.metrics.counter("bank_commands_total", command=command, status="ok"),
+                self.metrics.counter("bank_commands_total", command=command, status="error"))
+
+    def register_command(self, command: str, handler, spec: CommandSpec = CommandSpec()):
+        """
+        Adds (or replaces) a protocol command.
+
+        Args:
+            command (str): Command code, e.g. "AH".
+            handler (callable): handler(request, client_ip) -> response string.
+            spec (CommandSpec): Argument shape used by the parser.
         """
-        Parses and executes the banking protocol commands.
+        command = command.upper()
+        self._parsers[command] = compile_parser(spec)
+        self._routes[command] = _Route(handler, spec.forward, *self._metrics_for(command))
 
-        Supported Commands:
-        - BC: Bank Check
-        - AC: Account Create
-        - AD: Account Deposit (Supports P2P forwarding)
-        - AW: Account Withdraw (Supports P2P forwarding)
-        - AB: Account Balance (Supports P2P forwarding)
-        - AR: Account Remove
-        - BA: Bank Amount (Total)
-        - BN: Bank Number (Count)
+    def execute_command(self, command_str: str, client_ip: str, internal: bool = False) -> str:
+        """
+        Parses and executes one protocol command and records its latency and
+        outcome (bank_command_seconds / bank_commands_total, labelled by command;
+        unknown and unparsable commands are counted as OTHER).
 
         Args:
             command_str (str): The raw command string received from client.
             client_ip (str): The IP address of the client (for logging/BC).
+            internal (bool): Routed here by a sibling shard; execute locally, never route again.
 
         Returns:
             str: The protocol response string.
         """
-        parts = command_str.strip().split()
-        if not parts:
-            return "ER Empty command"
-
-        cmd = parts[0].upper()
-
-        try:
-            # --- BC: Bank Check ---
-            if cmd == "BC":
-                return f"BC {client_ip}"
-
-            # --- AC: Account Create ---
-            elif cmd == "AC":
-                import random
-                new_num = random.randint(10000, 99999)
-                # Ensure uniqueness
-                while self.repository.find_by_number(new_num):
-                    new_num = random.randint(10000, 99999)
-
-                self.repository.create(new_num)
-                self._log_transaction(f"Created account {new_num}")
-                return f"AC {new_num}/{client_ip}"
-
-            # --- AD: Deposit ---
-            elif cmd == "AD":
-                if len(parts) != 3: return "ER Invalid format"
-                acc_full = parts[1]
-                amount = int(parts[2])
-
-                if "/" not in acc_full: return "ER Invalid account format"
-                acc_num_str, target_ip = acc_full.split("/")
-                acc_num = int(acc_num_str)
-
-                # >>> P2P LOGIC START <<<
-                if not self._is_local_account(target_ip):
-                    return self._forward_command(target_ip, command_str)
-                # >>> P2P LOGIC END <<<
-
-                account = self.repository.find_by_number(acc_num)
-                if not account: return "ER Account not found"
-
-                account.deposit(amount)
-                self.repository.save_all()
-                self._log_transaction(f"Deposit {amount} to {acc_num}")
-                return "AD"
-
-            # --- AW: Withdraw ---
-            elif cmd == "AW":
-                if len(parts) != 3: return "ER Invalid format"
-                acc_full = parts[1]
-                amount = int(parts[2])
-
-                if "/" not in acc_full: return "ER Invalid account format"
-                acc_num_str, target_ip = acc_full.split("/")
-                acc_num = int(acc_num_str)
-
-                # >>> P2P LOGIC START <<<
-                if not self._is_local_account(target_ip):
-                    return self._forward_command(target_ip, command_str)
-                # >>> P2P LOGIC END <<<
-
-                account = self.repository.find_by_number(acc_num)
-                if not account: return "ER Account not found"
-
-                try:
-                    account.withdraw(amount)
-                    self.repository.save_all()
-                    self._log_transaction(f"Withdraw {amount} from {acc_num}")
-                    return "AW"
-                except ValueError:
-                    return "ER Insufficient funds"
-
-            # --- AB: Balance ---
-            elif cmd == "AB":
-                if len(parts) != 2: return "ER Invalid format"
-
-                acc_full = parts[1]
-                if "/" in acc_full:
-                    acc_num_str, target_ip = acc_full.split("/")
-                    # >>> P2P LOGIC START <<<
-                    if not self._is_local_account(target_ip):
-                        return self._forward_command(target_ip, command_str)
-                    # >>> P2P LOGIC END <<<
-                    acc_num = int(acc_num_str)
-                else:
-                    acc_num = int(acc_full)
-
-                account = self.repository.find_by_number(acc_num)
-                if not account: return "ER Account not found"
-                return f"AB {account.balance}"
-
-            # --- AR: Remove ---
-            elif cmd == "AR":
-                acc_num = int(parts[1].split("/")[0])
-                try:
-                    self.repository.delete(acc_num)
-                    self._log_transaction(f"Removed account {acc_num}")
-                    return "AR"
-                except ValueError as e:
-                    return f"ER {str(e)}"
-
-            # --- BA: Bank Amount ---
-            elif cmd == "BA":
-                total = sum(acc.balance for acc in self.repository.get_all_accounts())
-                return f"BA {total}"
-
-            # --- BN: Bank Number ---
-            elif cmd == "BN":
-                count = len(self.repository.get_all_accounts())
-                return f"BN {count}"
+        start = time.perf_counter()
+        try:
+            request = parse_command(command_str.strip(), self._parsers)
+        except ParseError as e:
+            request, response = None, f"ER {str(e)}"
+        self.metrics.histogram("bank_parse_seconds").observe(time.perf_counter() - start)
+        if request is not None:
+            response = self.execute_request(request, client_ip, internal)
+        self._record(request, response, start)
+        return response
+
+    @property
+    def parsers(self) -> dict:
+        """Command code -> parser of every registered command (see core.commands.parse_command)."""
+        return self._parsers
+
+    def execute_parsed(self, request: Request, client_ip: str) -> str:
+        """
+        Executes a request that arrived already decoded (binary protocol, see
+        core.binary_protocol), with the same metrics as execute_command.
+        """
+        start = time.perf_counter()
+        response = self.execute_request(request, client_ip)
+        self._record(request, response, start)
+        return response
+
+    def _record(self, request: Request, response: str, start: float):
+        """Records latency and outcome of one command (bank_command_seconds / bank_commands_total)."""
+        elapsed = time.perf_counter() - start
+        route = self._routes.get(request.command) if request is not None else None
+        latency, ok, errors = route[2:] if route is not None else self._other
+        latency.observe(elapsed)
+        (errors if response.startswith("ER") else ok).inc()
+
+    def execute_request(self, request: Request, client_ip: str, internal: bool = False) -> str:
+        """
+        Executes an already parsed command: one dict lookup instead of an
+        if/elif chain, and the P2P forwarding decision is made here once
+        for every command registered with forward=True. In a sharded node,
+        commands for accounts of another shard are routed to that shard.
 
-            else:
-                return "ER Unknown command"
+        Args:
+            request (Request): The parsed command.
+            client_ip (str): The IP address of the client (for logging/BC).
+            internal (bool): Routed here by a sibling shard; execute locally, never route again.
 
+        Returns:
+            str: The protocol response string.
+        """
+        route = self._routes.get(request.command)
+        if route is None:
+            return "ER Unknown command"
+
+        if not internal:
+            # >>> P2P LOGIC START <<<
+            if route.forward and request.target_ip is not None and not self._is_local_account(request.target_ip):
+                return self._forward_command(request.target_ip, request)
+            # >>> P2P LOGIC END <<<
+
+            if self.read_only and request.command in WRITE_COMMANDS:
+                return "ER Read-only follower, send changes to the leader"
+
+            # Account owned by a sibling shard of this node (see core.cluster)
+            if self.shard_router is not None and request.account is not None:
+                response = self.shard_router.route(request)
+                if response is not None:
+                    return response
+
+        try:
+            return route.handler(request, client_ip)
         except Exception as e:
-            return f"ER System error: {str(e)}"
\ No newline at end of file
+            return f"ER System error: {str(e)}"
+
+    # --- BC: Bank Check ---
+    def _bank_check(self, request: Request, client_ip: str) -> str:
+        return f"BC {client_ip}"
+
+    # --- AC: Account Create ---
+    def _account_create(self, request: Request, client_ip: str) -> str:
+        try:
+            # O(1): next number from the shuffled pool of free numbers
+            new_num = self.repository.create_next().number
+        except ValueError as e:
+            return f"ER {str(e)}"
+
+        self._log_transaction("AC", new_num)
+        return f"AC {new_num}/{client_ip}"
+
+    # --- AD: Deposit (Supports P2P forwarding) ---
+    def _account_deposit(self, request: Request, client_ip: str) -> str:
+        try:
+            # Atomic check-and-update under the account's lock
+            with self.metrics.timer("bank_repository_seconds", op="deposit"):
+                self.repository.deposit(request.account, request.amount)
+        except ValueError as e:
+            return f"ER {str(e)}"
+        self._log_transaction("AD", request.account, request.amount)
+        return "AD"
+
+    # --- AW: Withdraw (Supports P2P forwarding) ---
+    def _account_withdraw(self, request: Request, client_ip: str) -> str:
+        try:
+            # Atomic check-and-update under the account's lock
+            with self.metrics.timer("bank_repository_seconds", op="withdraw"):
+                self.repository.withdraw(request.account, request.amount)
+        except ValueError as e:
+            return f"ER {str(e)}"
+        self._log_transaction("AW", request.account, request.amount)
+        return "AW"
+
+    # --- AB: Balance (Supports P2P forwarding) ---
+    def _account_balance(self, request: Request, client_ip: str) -> str:
+        with self.metrics.timer("bank_repository_seconds", op="lookup"):
+            account = self.repository.find_by_number(request.account)
+        if not account: return "ER Account not found"
+        return f"AB {account.balance}"
+
+    # --- AR: Remove ---
+    def _account_remove(self, request: Request, client_ip: str) -> str:
+        try:
+            self.repository.delete(request.account)
+            self._log_transaction("AR", request.account)
+            return "AR"
+        except ValueError as e:
+            return f"ER {str(e)}"
+
+    # --- AH: Account History (paged, newest first; supports P2P forwarding) ---
+    # Format: AH <account>[/<ip>] [page] [page_size]
+    def _account_history(self, request: Request, client_ip: str) -> str:
+        args = request.args
+        try:
+            page = int(args[0]) if len(args) > 0 else 0
+            page_size = int(args[1]) if len(args) > 1 else 10
+        except ValueError:
+            return "ER Invalid page"
+        if page < 0 or not 1 <= page_size <= 100: return "ER Invalid page"
+
+        records = self.audit_log.history(request.account, page * page_size, page_size)
+        entries = ";".join(r.format() for r in records)
+        return f"AH {entries}" if entries else "AH"
+
+    # --- BM: Bank Metrics ---
+    def _bank_metrics(self, request: Request, client_ip: str) -> str:
+        return f"BM {self.metrics.summary()}"
+
+    # --- BA: Bank Amount (Total) ---
+    def _bank_amount(self, request: Request, client_ip: str) -> str:
+        return f"BA {self.repository.total_balance()}"
+
+    # --- BN: Bank Number (Count) ---
+    def _bank_number(self, request: Request, client_ip: str) -> str:
+        return f"BN {self.repository.count()}"
+
+    # --- PS: Peer Status (circuit breaker state of every peer contacted so far) ---
+    # Format: PS <ip>[:<port>]=<closed|open|half-open>:<consecutive failures> ...
+    def _peer_status(self, request: Request, client_ip: str) -> str:
+        entries = []
+        for peer, breaker in self.breakers.items():
+            name = f"{breaker.endpoint[0]}:{breaker.endpoint[1]}" if breaker.endpoint else peer
+            entries.append(f"{name}={breaker.state}:{breaker.failures}")
+        return " ".join(["PS"] + entries)
+
+    # --- NA: Network Amount (BA summed over this bank and all known peers) ---
+    def _network_amount(self, request: Request, client_ip: str) -> str:
+        return self._network_aggregate("NA", "BA", client_ip)
+
+    # --- NN: Network Number (BN summed over this bank and all known peers) ---
+    def _network_number(self, request: Request, client_ip: str) -> str:
+        return self._network_aggregate("NN", "BN", client_ip)
+
+    def _network_aggregate(self, command: str, local_command: str, client_ip: str) -> str:
+        """
+        Asks every known peer for `local_command` concurrently and adds up the answers.
+
+        All peers are queried at once on a small thread pool, so the latency is
+        that of the slowest peer (bounded by fanout_timeout), not the sum.
+        Peers that are offline, too slow or answer with an error are left out.
+
+        Returns:
+            str: "<command> <total> <answered>/<asked>" (this bank counts as one answer).
+        """
+        local = self._routes[local_command].handler(Request(local_command, raw=local_command), client_ip)
+        if local.startswith("ER"):
+            return local
+        total, answered = int(local.split()[1]), 1
+
+        if self.peers:
+            futures = [self._executor().submit(self._forward_command, ip, local_command, (ip, port),
+                                                    self.fanout_timeout)
+                       for ip, port in self.peers]
+            done, _ = wait(futures, timeout=self.fanout_timeout)
+            for future in done:
+                parts = future.result().split()
+                if len(parts) == 2 and parts[0] == local_command and parts[1].lstrip("-").isdigit():
+                    total += int(parts[1])
+                    answered += 1
+        return f"{command} {total} {answered}/{len(self.peers) + 1}"
+
+    def _executor(self) -> ThreadPoolExecutor:
+        """Thread pool for concurrent requests to peers (created on first use)."""
+        if self._fanout_executor is None:
+            self._fanout_executor = ThreadPoolExecutor(max_workers=32, thread_name_prefix="fanout")
+        return self._fanout_executor
+
+    # --- BT: Batch (many AD/AW/AB in one request) ---
+    # Format: BT <op>;<op>;...  ->  BT <result>;<result>;...
+    def _batch(self, request: Request, client_ip: str) -> str:
+        """
+        Executes a batch of AD/AW/AB operations with one response.
+
+        The operations are grouped by the bank that owns the account. The
+        local group is applied atomically by the repository (all or nothing,
+        one WAL write); every remote bank receives its group as one BT
+        sub-batch, sent concurrently. Atomicity therefore holds per bank: a
+        failed group answers its failed operation with the error and the
+        others with "ER Not applied", while other banks' groups still apply.
+        """
+        try:
+            ops = parse_batch(request.raw, self._parsers)
+        except ParseError as e:
+            return f"ER {str(e)}"
+
+        # Positions of the operations per owner: None = this bank, IP = peer bank, int = sibling shard
+        groups = {}
+        router = self.shard_router
+        for position, op in enumerate(ops):
+            if op.target_ip is not None and not self._is_local_account(op.target_ip):
+                owner = op.target_ip
+            elif router is not None and router.owner(op.account) != router.index:
+                owner = router.owner(op.account)
+            else:
+                owner = None
+            groups.setdefault(owner, []).append(position)
+
+        futures = {}
+        for owner, positions in groups.items():
+            if owner is None:
+                continue
+            line = "BT " + ";".join(ops[position].raw for position in positions)
+            if isinstance(owner, int):
+                sub_batch = Request("BT", account=ops[positions[0]].account, raw=line)
+                futures[owner] = self._executor().submit(router.route, sub_batch)
+            else:
+                futures[owner] = self._executor().submit(self._forward_command, owner, line)
+
+        results = [None] * len(ops)
+        if None in groups:
+            local = self._apply_batch([ops[position] for position in groups[None]])
+            for position, result in zip(groups[None], local):
+                results[position] = result
+        for owner, future in futures.items():
+            positions = groups[owner]
+            for position, result in zip(positions, self._sub_batch_results(future.result(), len(positions))):
+                results[position] = result
+        return "BT " + ";".join(results)
+
+    def _apply_batch(self, ops: list) -> list:
+        """Applies the local operations of a batch atomically; returns one result per operation."""
+        names = {"AD": "deposit", "AW": "withdraw", "AB": "balance"}
+        try:
+            with self.metrics.timer("bank_repository_seconds", op="batch"):
+                balances = self.repository.apply_batch([(names[op.command], op.account, op.amount) for op in ops])
+        except BatchError as e:
+            return [f"ER {str(e)}" if index == e.index else "ER Not applied" for index in range(len(ops))]
+
+        results = []
+        for op, balance in zip(ops, balances):
+            if op.command == "AB":
+                results.append(f"AB {balance}")
+            else:
+                self._log_transaction(op.command, op.account, op.amount)
+                results.append(op.command)
+        return results
+
+    @staticmethod
+    def _sub_batch_results(response: str, count: int) -> list:
+        """Splits a peer's BT response; an error (e.g. bank offline) becomes the result of every operation."""
+        if response.startswith("BT "):
+            results = response[3:].split(";")
+            if len(results) == count:
+                return results
+        if not response.startswith("ER"):
+            response = f"ER Invalid batch response: {response}"
+        return [response] * count
+
+    # --- AT: Account Transfer (debit here, credit here or at another bank) ---
+    # Format: AT <from>/<ip> <to>/<ip> <amount>
+    def _account_transfer(self, request: Request, client_ip: str) -> str:
+        """
+        Moves money from a local account to a local or remote one in one request.
+
+        Local destination: withdrawal and deposit are one repository batch
+        (atomic, one WAL write). Remote destination (another bank or a sibling
+        shard): the debit is written together with an "out" intent, then the
+        destination is asked to prepare (TP: it checks the account and records
+        an "in" intent) and to commit (TC: it credits and closes its intent).
+        A refusal refunds the debit; if the destination cannot be reached the
+        intent stays open and recover_transfers() finishes it later.
+        """
+        number, sep, target_ip = request.args[0].partition("/")
+        if not sep or not is_bank_ip(target_ip):
+            return "ER Invalid account format"
+        try:
+            target = int(number)
+        except ValueError:
+            return "ER Invalid account number"
+        try:
+            amount = int(request.args[1])
+        except ValueError:
+            return "ER Invalid amount"
+        if amount <= 0:
+            return "ER Amount must be positive"
+
+        if self._transfer_channel(target, target_ip) is None:
+            try:
+                with self.metrics.timer("bank_repository_seconds", op="transfer"):
+                    self.repository.apply_batch([("withdraw", request.account, amount), ("deposit", target, amount)])
+            except BatchError as e:
+                return f"ER {str(e)}"
+            self._log_transaction("AW", request.account, amount)
+            self._log_transaction("AD", target, amount)
+            self.metrics.counter("bank_transfers_total", outcome="committed").inc()
+            return "AT"
+
+        transfer_id = uuid.uuid4().hex[:16]
+        details = f"out {request.account} {target}/{target_ip} {amount} {int(time.time())}"
+        with self._transfers_lock:
+            self._transfers_in_flight.add(transfer_id)  # Before the intent exists: recovery must not take it
+        try:
+            try:
+                self.repository.apply_batch([("withdraw", request.account, amount)],
+                                            open_intent=(transfer_id, details))
+            except BatchError as e:
+                return f"ER {str(e)}"
+            self._log_transaction("AW", request.account, amount)
+            return self._finish_transfer(transfer_id, details, prepare=True)
+        finally:
+            with self._transfers_lock:
+                self._transfers_in_flight.discard(transfer_id)
+
+    def _transfer_channel(self, account: int, ip: str):
+        """send(line) -> response for the bank or sibling shard owning the account; None if it is this one."""
+        if not self._is_local_account(ip):
+            return lambda line: self._send_to_peer(ip, line)
+        router = self.shard_router
+        if router is not None and router.owner(account) != router.index:
+            path = router.socket_paths[router.owner(account)]
+            return lambda line: router.pool.request(path, line)
+        return None
+
+    def _finish_transfer(self, transfer_id: str, details: str, prepare: bool) -> str:
+        """
+        Drives an open "out" intent to its end: TP (if not sent yet), then TC.
+
+        The source is only refunded when the TP never left this node (no
+        bank found, circuit open, connection refused), the destination
+        refused the prepare or it shows that it did not credit the transfer
+        (TC answered with "ER Transfer aborted ..." or "ER Unknown
+        transfer"); anything else keeps the intent open for recover_transfers().
+
+        Returns:
+            str: "AT" when the destination committed, the destination's error
+                after a refund, or "ER Transfer <id> pending ..." when the
+                outcome at the destination is not known yet (the intent stays open).
+        """
+        _, source, destination, amount = details.split()[:4]
+        number, _, target_ip = destination.partition("/")
+        send = self._transfer_channel(int(number), target_ip)
+        stage = "TP" if prepare else "TC"
+        try:
+            if prepare:
+                response = send(f"TP {destination} {amount} {transfer_id}")
+                if response != "TP":
+                    return self._refund_transfer(transfer_id, int(source), int(amount), response)
+            stage = "TC"
+            response = send(f"TC {destination} {transfer_id}")
+        except OSError as e:
+            if stage == "TP" and self._not_sent(e):
+                # Nothing can have been prepared at the destination
+                return self._refund_transfer(transfer_id, int(source), int(amount), f"ER {str(e)}")
+            # The destination may or may not have seen the request: keep the intent
+            with self._transfers_lock:
+                pending = self._pending_transfers.setdefault(transfer_id, _PendingTransfer())
+                pending.tc_sent = pending.tc_sent or (stage == "TC" and not self._not_sent(e))
+            logger.warning("[WARN] Transfer %s pending: %s", transfer_id, e)
+            return f"ER Transfer {transfer_id} pending: {str(e)}"
+        if response == "ER Unknown transfer" and self._outcome_may_be_forgotten(details):
+            # The destination may have committed and dropped the outcome since
+            logger.critical("[CRITICAL] Transfer %s: %s forgot it, resolve by hand", transfer_id, destination)
+            return f"ER Transfer {transfer_id} pending: outcome unknown at the destination"
+        if response == "ER Unknown transfer":
+            return self._refund_transfer(transfer_id, int(source), int(amount), response)
+        if response.startswith("ER Transfer aborted"):
+            response = self._refund_transfer(transfer_id, int(source), int(amount), response)
+            self._acknowledge(send, destination, transfer_id)
+            return response
+        if response != "TC":
+            logger.warning("[WARN] Transfer %s pending: %s", transfer_id, response)
+            return f"ER Transfer {transfer_id} pending: {response}"
+        try:
+            self.repository.apply_batch([], close_intent=transfer_id)
+        except BatchError:
+            pass  # Closed concurrently by recovery
+        with self._transfers_lock:
+            self._pending_transfers.pop(transfer_id, None)
+        self._acknowledge(send, destination, transfer_id)
+        self.metrics.counter("bank_transfers_total", outcome="committed").inc()
+        return "AT"
+
+    @staticmethod
+    def _acknowledge(send, destination: str, transfer_id: str):
+        """Tells the destination that no TC of the transfer follows (TA); best effort."""
+        try:
+            send(f"TA {destination} {transfer_id}")
+        except OSError:
+            pass  # The destination drops the outcome after its retention period
+
+    def _outcome_may_be_forgotten(self, details: str) -> bool:
+        """True if an "out" intent is older than the destination keeps transfer outcomes."""
+        parts = details.split()
+        if len(parts) < 5:
+            return True  # Opened before intents were timestamped: age unknown
+        return time.time() - int(parts[4]) > self.repository.intent_retention
+
+    @staticmethod
+    def _not_sent(error: OSError) -> bool:
+        """True if a failed send provably never reached the destination (sibling shards raise plain OSErrors)."""
+        if isinstance(error, PeerUnavailable):
+            return not error.sent
+        return isinstance(error, (ConnectionRefusedError, FileNotFoundError))
+
+    def _refund_transfer(self, transfer_id: str, source: int, amount: int, response: str) -> str:
+        """The destination refused the transfer: gives the money back and closes the intent."""
+        try:
+            self.repository.apply_batch([("deposit", source, amount)], close_intent=transfer_id, outcome="abort")
+        except BatchError as e:
+            logger.error("[ERROR] Refund of transfer %s failed: %s", transfer_id, e)
+            return f"ER Transfer {transfer_id} pending: refund failed ({str(e)})"
+        with self._transfers_lock:
+            self._pending_transfers.pop(transfer_id, None)
+        self._log_transaction("AD", source, amount)
+        self.metrics.counter("bank_transfers_total", outcome="refunded").inc()
+        return response if response.startswith("ER") else f"ER Transfer refused: {response}"
+
+    # --- TP: Transfer Prepare (sent by the bank of the source account) ---
+    # Format: TP <to>/<ip> <amount> <transfer id>
+    def _transfer_prepare(self, request: Request, client_ip: str) -> str:
+        if request.amount <= 0:
+            return "ER Amount must be positive"
+        transfer_id = request.args[0]
+        try:
+            # "balance" only checks that the account exists, under its lock
+            self.repository.apply_batch([("balance", request.account, None)],
+                                        open_intent=(transfer_id, f"in {request.account} {request.amount} "
+                                                                  f"{int(time.time())}"))
+        except BatchError as e:
+            if e.index != -1:
+                return f"ER {str(e)}"
+            outcome = self.repository.intent_outcome(transfer_id)
+            if outcome is None:
+                return "TP"  # Prepared before (retried request)
+            return "ER Transfer aborted" if outcome == "abort" else "ER Transfer already committed"
+        return "TP"
+
+    # --- TC: Transfer Commit (credits a prepared transfer) ---
+    # Format: TC <to>/<ip> <transfer id>
+    def _transfer_commit(self, request: Request, client_ip: str) -> str:
+        transfer_id = request.args[0]
+        details = self.repository.intents().get(transfer_id)
+        if details is None:
+            return self._transfer_outcome(transfer_id)  # Retried after a lost reply
+        _, number, amount = details.split()[:3]
+        try:
+            self.repository.apply_batch([("deposit", int(number), int(amount))], close_intent=transfer_id)
+        except BatchError as e:
+            if e.index == -1:
+                return self._transfer_outcome(transfer_id)  # Closed by a concurrent retry
+            # Account removed since the prepare: abort, the source refunds
+            try:
+                self.repository.apply_batch([], close_intent=transfer_id, outcome="abort")
+            except BatchError:
+                return self._transfer_outcome(transfer_id)
+            return f"ER Transfer aborted: {str(e)}"
+        self._log_transaction("AD", int(number), int(amount))
+        return "TC"
+
+    def _transfer_outcome(self, transfer_id: str) -> str:
+        """TC answer for an intent that is no longer open, from its recorded outcome."""
+        outcome = self.repository.intent_outcome(transfer_id)
+        if outcome == "commit":
+            return "TC"
+        if outcome == "abort":
+            return "ER Transfer aborted"
+        return "ER Unknown transfer"  # Never prepared here (or acknowledged / expired)
+
+    # --- TA: Transfer Acknowledge (the source got the final TC answer) ---
+    # Format: TA <to>/<ip> <transfer id>
+    def _transfer_acknowledge(self, request: Request, client_ip: str) -> str:
+        self.repository.forget_intent(request.args[0])
+        return "TA"
+
+    def _expire_incoming_transfers(self):
+        """Aborts prepared incoming transfers whose source sent no TC within incoming_transfer_ttl."""
+        oldest = time.time() - self.incoming_transfer_ttl
+        for transfer_id, details in self.repository.intents().items():
+            parts = details.split()
+            if parts[0] != "in" or (len(parts) > 3 and int(parts[3]) >= oldest):
+                continue
+            try:
+                self.repository.apply_batch([], close_intent=transfer_id, outcome="abort")
+            except BatchError:
+                continue  # Committed in the meantime
+            logger.info("[INFO] Incoming transfer %s expired without TC", transfer_id)
+
+    def recover_transfers(self) -> int:
+        """
+        Finishes outgoing transfers whose destination could not be reached
+        (or that were interrupted by a restart): TC is sent again, so a
+        prepared destination commits (or repeats its recorded outcome) and
+        one that never prepared answers "ER Unknown transfer", which refunds
+        the source. Transfers that are still being handled by a request are
+        skipped.
+
+        A transfer that stays unanswered is retried with a doubling delay (up
+        to transfer_retry_max). If no TC of it can have reached the
+        destination, it is refunded after transfer_abort_after seconds; the
+        destination expires its prepared side on its own. Transfers found
+        after a restart are assumed to have sent a TC. Prepared incoming
+        transfers without TC expire after incoming_transfer_ttl.
+
+        Returns:
+            int: Number of outgoing transfers that are still open.
+        """
+        pending = 0
+        if self.read_only:
+            return pending  # The leader finishes its transfers; a follower only after promotion
+        self._expire_incoming_transfers()
+        for transfer_id, details in self.repository.intents().items():
+            if not details.startswith("out "):
+                continue
+            now = time.monotonic()
+            with self._transfers_lock:
+                if transfer_id in self._transfers_in_flight:
+                    continue
+                state = self._pending_transfers.setdefault(transfer_id, _PendingTransfer(tc_sent=True))
+                if now < state.next_try:
+                    pending += 1
+                    continue
+                self._transfers_in_flight.add(transfer_id)
+            try:
+                if not state.tc_sent and now - state.since >= self.transfer_abort_after:
+                    _, source, destination, amount = details.split()[:4]
+                    response = self._refund_transfer(transfer_id, int(source), int(amount),
+                                                     f"ER Transfer {transfer_id} aborted: {destination} unreachable")
+                else:
+                    response = self._finish_transfer(transfer_id, details, prepare=False)
+            finally:
+                with self._transfers_lock:
+                    self._transfers_in_flight.discard(transfer_id)
+            if response.startswith(f"ER Transfer {transfer_id} pending"):
+                pending += 1
+                with self._transfers_lock:
+                    state.next_try = now + state.delay
+                    state.delay = min(state.delay * 2, self.transfer_retry_max)
+            else:
+                logger.info("[INFO] Transfer %s recovered: %s", transfer_id, response)
+        return pending
+
+    def start_transfer_recovery(self, interval: float = 5.0):
+        """Runs recover_transfers() now and then every `interval` seconds in the background."""
+        threading.Thread(target=self._run_transfer_recovery, args=(interval,), name="transfer-recovery",
+                         daemon=True).start()
+
+    def _run_transfer_recovery(self, interval: float):
+        while True:
+            try:
+                self.recover_transfers()
+            except Exception as e:
+                logger.warning("[WARN] Transfer recovery failed: %s", e)
+            if self._recovery_stop.wait(interval):
+                return
+
+    def stop_transfer_recovery(self):
+        self._recovery_stop.set()
+
+    # --- RL: Replication Lag ---
+    # Format: RL follower <applied change> <changes behind> <ms since the leader was heard>
+    #         RL leader <latest change> <connected followers>
+    def _replication_lag(self, request: Request, client_ip: str) -> str:
+        if self.replica is not None:
+            behind, silent = self.replica.lag()
+            return f"RL follower {self.replica.applied_seq} {behind} {int(silent * 1000)}"
+        log = self.repository.replication
+        if log is not None:
+            return f"RL leader {log.seq} {len(log.followers)}"
+        return "ER Replication is not enabled"
+
+    # --- RP: Promote a follower to leader (failover; operator only) ---
+    def _promote(self, request: Request, client_ip: str) -> str:
+        if not self._is_operator(client_ip):
+            return "ER Not allowed"
+        if self.replica is None:
+            return "ER Not a follower"
+        self.replica.stop(keep_position=False)
+        logger.info("[INFO] Promoted to leader at change %d (was following %s:%s)",
+                    self.replica.applied_seq, *self.replica.leader)
+        self.replica = None
+        self.read_only = False
+        return "RP"
+
+    # --- PF: Profile the running node (operator only) ---
+    # Format: PF <sample|cprofile> <seconds> [sample interval ms]  ->  PF <file>
+    #         PF  ->  PF running | PF idle [<last file>]
+    def _profile(self, request: Request, client_ip: str) -> str:
+        if not self._is_operator(client_ip):
+            return "ER Not allowed"
+        if self._profiling is None:
+            self._profiling = ProfileSession(self, self.repository.data_file.parent / "profiles")
+        if not request.args:
+            if self._profiling.running:
+                return "PF running"
+            last = self._profiling.last_file
+            return f"PF idle {last}" if last else "PF idle"
+        try:
+            seconds = float(request.args[1]) if len(request.args) > 1 else 10.0
+            interval = float(request.args[2]) / 1000 if len(request.args) > 2 else 0.005
+        except ValueError:
+            return "ER Invalid profile window"
+        try:
+            return f"PF {self._profiling.start(request.args[0].lower(), seconds, interval)}"
+        except ValueError as e:
+            return f"ER {str(e)}"
@@ -0,0 +1,204 @@
+import socket
+import struct
+from core.commands import DEFAULT_PARSERS, ParseError, Request, parse_command
+
+# Sent as a text line to switch a connection to binary frames; nodes without
+# binary support (or with the older "BP 1" frame layout) answer "ER Unknown
+# command" and the connection stays text. Matched exactly, case included.
+HELLO = "BP 2"
+# Answer to a hello that is followed by more data in the same read: frames sent
+# before the switch was confirmed cannot be told apart from text, so it stays text.
+HELLO_REJECTED = f"ER Nothing may follow {HELLO} until it is answered"
+
+# Opcodes of the fixed-width requests (0 = any other command, carried as text)
+OP_TEXT = 0
+OPCODES = {"AC": 1, "AD": 2, "AW": 3, "AB": 4, "AR": 5, "BA": 6, "BN": 7}
+COMMANDS = {code: command for command, code in OPCODES.items()}
+
+LENGTH = struct.Struct("<I")
+REQUEST = struct.Struct("<BI4sq")       # opcode (| FLAG_IP), account number, bank IPv4, amount
+FLAG_IP = 0x80                          # Set in the opcode byte when the account carries a bank IP
+RESPONSE = struct.Struct("<Bq4s")       # status, value (balance / total / count / account), IPv4 (AC)
+STATUS_OK = 0
+STATUS_TEXT = 1                         # Payload is a text response (errors, OP_TEXT commands)
+
+MAX_FRAME = 65536
+_NO_IP = bytes(4)
+_NO_ACCOUNT = {OPCODES["AC"], OPCODES["BA"], OPCODES["BN"]}
+_AMOUNT = {OPCODES["AD"], OPCODES["AW"]}
+_IP_CACHE = {}  # Both directions: "10.0.0.5" -> packed bytes, packed bytes -> "10.0.0.5"
+_new_request = tuple.__new__
+
+
+class FrameReader:
+    """
+    Incremental framer for the binary protocol: every frame is a 4-byte
+    little-endian payload length followed by the payload.
+
+    Attributes:
+        max_frame (int): Upper bound of a payload in bytes.
+    """
+
+    def __init__(self, max_frame: int = MAX_FRAME):
+        self.max_frame = max_frame
+        self._buffer = bytearray()
+
+    def feed(self, data: bytes) -> list:
+        """Adds received bytes and returns all complete payloads. Raises ValueError for oversized frames."""
+        self._buffer += data
+        payloads = []
+        offset = 0
+        while len(self._buffer) - offset >= LENGTH.size:
+            (size,) = LENGTH.unpack_from(self._buffer, offset)
+            if size > self.max_frame:
+                raise ValueError("Request too long")
+            end = offset + LENGTH.size + size
+            if len(self._buffer) < end:
+                break
+            payloads.append(bytes(self._buffer[offset + LENGTH.size:end]))
+            offset = end
+        del self._buffer[:offset]
+        return payloads
+
+    @property
+    def pending(self) -> int:
+        """Number of buffered bytes that do not form a complete frame yet."""
+        return len(self._buffer)
+
+
+def frame(payload: bytes) -> bytes:
+    return LENGTH.pack(len(payload)) + payload
+
+
+def encode_request(command) -> tuple:
+    """
+    Client side: turns a command into a request frame.
+    Commands without a fixed-width form (AH, BT, ..., IPv6 addresses,
+    out-of-range numbers) are sent as OP_TEXT frames.
+
+    Args:
+        command (Request | str): An already parsed request (no parsing needed) or a command line.
+
+    Returns:
+        tuple: (command code, frame bytes); the code is needed to decode the response.
+    """
+    if isinstance(command, Request):
+        request, line = command, command.raw
+    else:
+        line = command
+        try:
+            request = parse_command(line)
+        except ValueError:
+            return None, frame(b"\x00" + line.encode("utf-8"))
+    code = OPCODES.get(request.command)
+    if code is not None and not request.args:
+        try:
+            if request.target_ip:
+                code, ip = code | FLAG_IP, _ip_packed(request.target_ip)
+            else:
+                ip = _NO_IP
+            return request.command, frame(REQUEST.pack(code, request.account or 0, ip, request.amount or 0))
+        except (OSError, struct.error):
+            pass  # Not an IPv4 address / number out of range: use the text form
+    return request.command, frame(b"\x00" + line.encode("utf-8"))
+
+
+def _ip_packed(ip: str) -> bytes:
+    """inet_aton with a cache (a node forwards to a handful of bank IPs)."""
+    packed = _IP_CACHE.get(ip)
+    if packed is None:
+        if len(_IP_CACHE) >= 4096:
+            _IP_CACHE.clear()
+        packed = _IP_CACHE[ip] = socket.inet_aton(ip)
+    return packed
+
+
+def _ip_text(packed: bytes) -> str:
+    """inet_ntoa with a cache: peers send the same few bank IPs over and over."""
+    ip = _IP_CACHE.get(packed)
+    if ip is None:
+        if len(_IP_CACHE) >= 4096:
+            _IP_CACHE.clear()
+        ip = _IP_CACHE[packed] = socket.inet_ntoa(packed)
+    return ip
+
+
+def decode_request(payload: bytes, parsers: dict = DEFAULT_PARSERS) -> Request:
+    """
+    Server side: turns a request payload into a Request without any text parsing.
+    Raises ValueError (ParseError for OP_TEXT commands) if the payload is malformed.
+
+    Args:
+        payload (bytes): One frame payload.
+        parsers (dict): Parser table for OP_TEXT commands (the service's, which
+            may hold runtime-registered commands).
+    """
+    if payload[:1] == b"\x00":
+        return parse_command(payload[1:].decode("utf-8", errors="replace").strip(), parsers)
+    if len(payload) != REQUEST.size:
+        raise ValueError("Invalid frame")
+    code, account, ip, amount = REQUEST.unpack(payload)
+    has_ip = code & FLAG_IP
+    code &= ~FLAG_IP
+    command = COMMANDS.get(code)
+    if command is None:
+        raise ValueError("Unknown opcode")
+    if code in _NO_ACCOUNT:
+        return _new_request(Request, (command, None, None, None, (), command))
+    if not has_ip:
+        if code in _AMOUNT:
+            raise ParseError("Invalid account format")  # Same rule as the text protocol
+        return _new_request(Request, (command, account, None, None, (), f"{command} {account}"))
+    # The text form (raw) is only used if the request has to be forwarded to another bank
+    target_ip = _ip_text(ip)
+    if code in _AMOUNT:
+        return _new_request(Request, (command, account, target_ip, amount, (),
+                                      f"{command} {account}/{target_ip} {amount}"))
+    return _new_request(Request, (command, account, target_ip, None, (), f"{command} {account}/{target_ip}"))
+
+
+def encode_response(command: str, response: str) -> bytes:
+    """Server side: packs the response of a command into a response frame."""
+    if command in OPCODES and not response.startswith("ER"):
+        try:
+            if command == "AC":
+                number, _, ip = response[3:].partition("/")
+                return frame(RESPONSE.pack(STATUS_OK, int(number), socket.inet_aton(ip)))
+            value = int(response.split()[1]) if command in ("AB", "BA", "BN") else 0
+            return frame(RESPONSE.pack(STATUS_OK, value, _NO_IP))
+        except (ValueError, IndexError, OSError, struct.error):
+            pass  # Unexpected shape (e.g. an IPv6 client address): send it as text
+    return frame(bytes([STATUS_TEXT]) + response.encode("utf-8"))
+
+
+def decode_response(command: str, payload: bytes) -> str:
+    """Client side: turns a response payload back into the text response of the command."""
+    if not payload:
+        raise ValueError("Invalid frame")
+    if payload[0] == STATUS_TEXT:
+        return payload[1:].decode("utf-8", errors="replace")
+    _, value, ip = RESPONSE.unpack(payload)
+    if command == "AC":
+        return f"AC {value}/{socket.inet_ntoa(ip)}"
+    if command in ("AB", "BA", "BN"):
+        return f"{command} {value}"
+    return command
+
+
+def execute_frames(service, payloads: list, client_ip: str) -> bytes:
+    """
+    Executes request payloads in order and returns all response frames as one
+    buffer (for a single sendall()). Requests go through the same dispatch,
+    P2P forwarding and metrics as text commands; OP_TEXT commands are parsed
+    with the service's parser table.
+    """
+    out = []
+    parsers = service.parsers
+    for payload in payloads:
+        try:
+            request = decode_request(payload, parsers)
+        except ValueError as e:
+            out.append(encode_response(None, f"ER {e}"))
+            continue
+        out.append(encode_response(request.command, service.execute_parsed(request, client_ip)))
+    return b"".join(out)
@@ -0,0 +1,157 @@
+import time
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half-open"
+
+# Seconds after which an unanswered half-open trial counts as failed
+TRIAL_TIMEOUT = 60.0
+# Most peers tracked at once; a closed circuit (nothing to remember) makes room first
+MAX_BREAKERS = 1024
+
+
+class CircuitBreaker:
+    """
+    Failure tracking for one peer bank.
+
+    closed:    requests go through; `failure_threshold` consecutive connection
+               failures open the circuit.
+    open:      requests fail immediately (no connect, no timeout wait) until
+               `reset_timeout` has passed or a background probe succeeds.
+    half-open: one trial request is let through; success closes the circuit,
+               failure opens it again. A trial whose outcome was never
+               recorded counts as failed after `trial_timeout`.
+
+    Attributes:
+        failure_threshold (int): Consecutive failures that open the circuit.
+        reset_timeout (float): Seconds an open circuit waits before a trial request.
+        trial_timeout (float): Seconds a half-open trial may run without an outcome.
+        state (str): CLOSED, OPEN or HALF_OPEN.
+        failures (int): Consecutive failures so far.
+        endpoint (tuple): Last (ip, port) used for the peer (probed while open).
+    """
+
+    def __init__(self, failure_threshold: int = 3, reset_timeout: float = 10.0,
+                 trial_timeout: float = TRIAL_TIMEOUT):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.trial_timeout = trial_timeout
+        self.state = CLOSED
+        self.failures = 0
+        self.endpoint = None
+        self._opened_at = 0.0
+        self._trial_running = False
+        self._trial_started = 0.0
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """True if a request may be sent now (in half-open state only one at a time)."""
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            now = time.monotonic()
+            if self.state == OPEN and now - self._opened_at >= self.reset_timeout:
+                self.state = HALF_OPEN
+            if self.state == HALF_OPEN and self._trial_running and now - self._trial_started >= self.trial_timeout:
+                # The trial never reported back (e.g. its caller failed in between): try again
+                self.failures += 1
+                self._trial_running = False
+            if self.state == HALF_OPEN and not self._trial_running:
+                self._trial_running = True
+                self._trial_started = now
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            if self.state != CLOSED:
+                logger.info("[P2P] Peer %s is reachable again, circuit closed", self.endpoint)
+            self.state = CLOSED
+            self.failures = 0
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._trial_running = False
+            if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != OPEN:
+                    logger.warning("[WARN] Peer %s failed %d times, circuit opened", self.endpoint, self.failures)
+                self.state = OPEN
+                self._opened_at = time.monotonic()
+
+
+class CircuitBreakerRegistry:
+    """
+    One CircuitBreaker per peer bank IP, plus a background prober.
+
+    While a circuit is open, the prober checks the peer every `probe_interval`
+    seconds (e.g. a BC round trip) and closes the circuit as soon as the peer
+    answers, so recovery does not have to wait for a client request.
+
+    Attributes:
+        failure_threshold (int): Passed to new breakers.
+        reset_timeout (float): Passed to new breakers.
+        probe (callable): probe(endpoint) -> bool, True if the peer answers.
+        probe_interval (float): Seconds between background probes of open circuits.
+        max_breakers (int): Most peers with a breaker at once.
+    """
+
+    def __init__(self, failure_threshold: int = 3, reset_timeout: float = 10.0, probe=None,
+                 probe_interval: float = 2.0, max_breakers: int = MAX_BREAKERS):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.probe = probe
+        self.probe_interval = probe_interval
+        self.max_breakers = max_breakers
+        self._breakers = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+
+    def get(self, peer: str) -> CircuitBreaker:
+        breaker = self._breakers.get(peer)
+        if breaker is None:
+            with self._lock:
+                breaker = self._breakers.get(peer)
+                if breaker is None:
+                    if len(self._breakers) >= self.max_breakers:
+                        self._evict_locked()
+                    breaker = self._breakers[peer] = CircuitBreaker(self.failure_threshold, self.reset_timeout)
+        return breaker
+
+    def _evict_locked(self):
+        """Drops a closed breaker (the fewest failures first), else the one opened longest ago."""
+        peer = min(self._breakers, key=lambda p: (self._breakers[p].state != CLOSED, self._breakers[p].failures,
+                                                   self._breakers[p]._opened_at))
+        del self._breakers[peer]
+
+    def items(self) -> list:
+        """[(peer, CircuitBreaker), ...] sorted by peer."""
+        with self._lock:
+            return sorted(self._breakers.items())
+
+    def probe_open(self):
+        """Probes every peer with an open circuit once."""
+        for peer, breaker in self.items():
+            if breaker.state == CLOSED or breaker.endpoint is None or self.probe is None:
+                continue
+            if self.probe(breaker.endpoint):
+                breaker.record_success()
+
+    def start(self):
+        """Starts the background prober thread."""
+        threading.Thread(target=self._run, name="circuit-prober", daemon=True).start()
+
+    def _run(self):
+        while not self._stop.wait(self.probe_interval):
+            try:
+                self.probe_open()
+            except Exception as e:
+                logger.warning("[WARN] Peer probe failed: %s", e)
+
+    def stop(self):
+        self._stop.set()
@@ -0,0 +1,210 @@
+import os
+import socket
+import logging
+import threading
+import multiprocessing
+from pathlib import Path
+from core.bank_service import BankService
+from core.commands import COMMAND_SPECS, Request
+from core.framing import LineReader, encode_responses
+from core.peer_pool import PeerConnectionPool
+
+logger = logging.getLogger(__name__)
+
+
+def shard_of(number: int, shards: int) -> int:
+    """Index of the shard that owns an account number."""
+    return number % shards
+
+
+def shard_data_file(data_file: str, index: int) -> Path:
+    """Each shard keeps its own snapshot + WAL: data/accounts.json -> data/shard-0/accounts.json."""
+    path = Path(data_file)
+    return path.parent / f"shard-{index}" / path.name
+
+
+def check_unsharded_data(data_file: str):
+    """
+    Refuses to start shards next to the data of a single-process node: the
+    shards only read data/shard-<i>/, so they would come up empty.
+
+    Raises:
+        RuntimeError: The unsharded snapshot or a non-empty WAL exists.
+    """
+    path = Path(data_file)
+    for existing in (path, path.with_suffix(".bin"), path.with_suffix(".wal")):
+        if existing.exists() and existing.stat().st_size > 0:
+            raise RuntimeError(f"{existing} holds the data of an unsharded node; sharded mode would not "
+                               f"see it. Start without --shards or move the data away first.")
+
+
+def shard_socket_path(data_file: str, index: int) -> str:
+    """Unix socket on which a shard accepts requests routed from its siblings."""
+    return str(Path(data_file).parent / f"shard-{index}.sock")
+
+
+class ShardRouter:
+    """
+    Routes commands between the shard processes of one node.
+
+    Accounts are partitioned by number (owner = number % shards). A client
+    may reach any shard (the kernel balances connections on the shared port),
+    so a command for an account of another shard is passed to the owner over
+    its unix socket instead of going back out through _forward_command.
+    BA and BN are answered with the sum over all shards.
+
+    Attributes:
+        index (int): Shard index of this process.
+        shards (int): Number of shards of the node.
+        socket_paths (list): Unix socket path of every shard (by index).
+        pool (PeerConnectionPool): Warm connections to the sibling shards.
+    """
+
+    def __init__(self, index: int, shards: int, socket_paths: list, pool: PeerConnectionPool = None):
+        self.index = index
+        self.shards = shards
+        self.socket_paths = socket_paths
+        self.pool = pool or PeerConnectionPool(max_idle_per_peer=32)
+
+    def attach(self, service: BankService):
+        """Installs the router into the service and replaces BA/BN with cluster-wide versions."""
+        service.shard_router = self
+        repository = service.repository
+        service.register_command(
+            "BA", lambda request, client_ip: self._aggregate("BA", repository.total_balance()),
+            COMMAND_SPECS["BA"])
+        service.register_command(
+            "BN", lambda request, client_ip: self._aggregate("BN", repository.count()),
+            COMMAND_SPECS["BN"])
+
+    def owner(self, number: int) -> int:
+        """Index of the shard that owns the account number."""
+        return shard_of(number, self.shards)
+
+    def route(self, request: Request):
+        """
+        Sends the command to the owning shard.
+
+        Returns:
+            str: The owner's response, or None if this shard owns the account.
+        """
+        owner = self.owner(request.account)
+        if owner == self.index:
+            return None
+        try:
+            return self.pool.request(self.socket_paths[owner], request.raw)
+        except Exception as e:
+            return f"ER Shard {owner} unavailable: {str(e)}"
+
+    def _aggregate(self, command: str, local_value: int) -> str:
+        total = local_value
+        for index, path in enumerate(self.socket_paths):
+            if index == self.index:
+                continue
+            try:
+                response = self.pool.request(path, command)
+            except Exception as e:
+                return f"ER Shard {index} unavailable: {str(e)}"
+            parts = response.split()
+            if len(parts) != 2 or parts[0] != command:
+                return f"ER Shard {index} error: {response}"
+            total += int(parts[1])
+        return f"{command} {total}"
+
+
+class ShardChannel:
+    """
+    Unix socket listener for requests routed from sibling shards.
+
+    Commands arriving here are executed locally only (internal=True), so a
+    request is never routed twice; BA/BN return this shard's own values,
+    which the asking shard adds up.
+
+    Attributes:
+        path (str): The unix socket path.
+        service (BankService): The shard's business logic controller.
+    """
+
+    def __init__(self, path: str, service: BankService):
+        self.path = path
+        self.service = service
+        self._sock = None
+
+    def start(self):
+        """Binds the socket and serves sibling connections in a daemon thread."""
+        if os.path.exists(self.path):
+            os.unlink(self.path)  # Left over from a previous run
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._sock.bind(self.path)
+        self._sock.listen(64)
+        threading.Thread(target=self._accept_loop, name="shard-channel", daemon=True).start()
+
+    def stop(self):
+        if self._sock is not None:
+            self._sock.close()
+            try:
+                os.unlink(self.path)
+            except OSError:
+                pass
+
+    def _accept_loop(self):
+        while True:
+            try:
+                conn, _ = self._sock.accept()
+            except OSError:
+                return  # Closed by stop()
+            threading.Thread(target=self._handle, args=(conn,), daemon=True).start()
+
+    def _handle(self, conn: socket.socket):
+        reader = LineReader()
+        try:
+            while True:
+                data = conn.recv(4096)
+                if not data:
+                    break
+                responses = [self._execute(line.strip()) for line in reader.feed(data) if line.strip()]
+                if responses:
+                    conn.sendall(encode_responses(responses))
+        except (OSError, ValueError) as e:
+            logger.info("[DISCONNECT] Shard channel connection closed: %s", e)
+        finally:
+            conn.close()
+
+    def _execute(self, line: str) -> str:
+        command = line.split(None, 1)[0].upper()
+        if command == "BA":
+            return f"BA {self.service.repository.total_balance()}"
+        if command == "BN":
+            return f"BN {self.service.repository.count()}"
+        return self.service.execute_command(line, "127.0.0.1", internal=True)
+
+
+def run_cluster(shards: int, target, args):
+    """
+    Starts `shards` processes of target(args, index) and waits for them.
+    Every process binds the same port with SO_REUSEPORT, so the kernel spreads
+    client connections across them and each one uses its own CPU core.
+
+    Args:
+        shards (int): Number of shard processes.
+        target (callable): Entry point of one shard, target(args, index).
+        args (argparse.Namespace): The parsed command line.
+    """
+    if not hasattr(socket, "SO_REUSEPORT"):
+        raise RuntimeError("Sharded mode needs SO_REUSEPORT (Linux, macOS, BSD)")
+
+    processes = [multiprocessing.Process(target=target, args=(args, index), name=f"shard-{index}")
+                 for index in range(shards)]
+    for process in processes:
+        process.start()
+    logger.info("[SERVER] Started %d shard processes on port %s", shards, args.port)
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        # Ctrl+C reaches the whole process group: give the shards time to flush
+        logger.info("[STOP] Stopping shard processes...")
+        for process in processes:
+            process.join(10)
+            if process.is_alive():
+                process.terminate()
@@ -0,0 +1,209 @@
+import re
+import sys
+from typing import NamedTuple, Optional
+
+
+class ParseError(ValueError):
+    """Raised when a command line does not match the shape of its command."""
+
+
+class CommandSpec(NamedTuple):
+    """
+    Shape of a protocol command, used by the parser instead of per-command code.
+
+    Attributes:
+        min_args (int): Minimum number of arguments after the command code.
+        max_args (int): Maximum number of arguments (None = ignore extra arguments).
+        account (bool): The first argument is an account "<number>[/<ip>]".
+        require_ip (bool): The account must carry the "/<ip>" suffix.
+        amount (bool): The second argument is an integer amount.
+        forward (bool): Requests for accounts on other nodes are forwarded as-is.
+    """
+    min_args: int = 0
+    max_args: Optional[int] = None
+    account: bool = False
+    require_ip: bool = False
+    amount: bool = False
+    forward: bool = False
+
+
+class Request(NamedTuple):
+    """
+    A parsed protocol command.
+
+    Attributes:
+        command (str): Upper-case command code (e.g. "AD").
+        account (int): Account number, if the command takes one.
+        target_ip (str): Bank IP of the account ("<number>/<ip>"), if given.
+        amount (int): Amount, if the command takes one.
+        args (tuple): Remaining arguments as strings (e.g. AH paging).
+        raw (str): The original command line (used for P2P forwarding).
+    """
+    command: str
+    account: Optional[int] = None
+    target_ip: Optional[str] = None
+    amount: Optional[int] = None
+    args: tuple = ()
+    raw: str = ""
+
+
+# Shapes of the built-in commands (see README, "Protocol")
+COMMAND_SPECS = {
+    "BC": CommandSpec(),
+    "AC": CommandSpec(),
+    "AD": CommandSpec(2, 2, account=True, require_ip=True, amount=True, forward=True),
+    "AW": CommandSpec(2, 2, account=True, require_ip=True, amount=True, forward=True),
+    "AB": CommandSpec(1, 1, account=True, forward=True),
+    "AR": CommandSpec(1, None, account=True),
+    "AH": CommandSpec(1, 3, account=True, forward=True),
+    "BA": CommandSpec(),
+    "BN": CommandSpec(),
+    "BM": CommandSpec(),
+    "NA": CommandSpec(),
+    "NN": CommandSpec(),
+    "PS": CommandSpec(),
+    "BT": CommandSpec(1, None),
+    "AT": CommandSpec(3, 3, account=True, require_ip=True, forward=True),
+    # Node-to-node steps of a transfer; routed to the shard owning the destination account
+    "TP": CommandSpec(3, 3, account=True, require_ip=True, amount=True),
+    "TC": CommandSpec(2, 2, account=True, require_ip=True),
+    "TA": CommandSpec(2, 2, account=True, require_ip=True),
+    "RL": CommandSpec(),
+    "RP": CommandSpec(),
+    "PF": CommandSpec(0, 3),
+}
+
+# Commands that change data; a read-only follower rejects them (unless they are forwarded to another bank)
+WRITE_COMMANDS = frozenset({"AC", "AD", "AW", "AR", "BT", "AT", "TP", "TC"})
+
+# Operations allowed inside a BT batch
+BATCH_COMMANDS = ("AD", "AW", "AB")
+
+
+_new_request = tuple.__new__  # Positional construction, skips the keyword handling of Request()
+
+# Dotted-quad IPv4 address in canonical form (no leading zeros), so one bank has exactly one key
+_OCTET = r"(?:25[0-5]|2[0-4][0-9]|1[0-9][0-9]|[1-9]?[0-9])"
+_BANK_IP = re.compile(rf"{_OCTET}(?:\.{_OCTET}){{3}}")
+
+
+def is_bank_ip(text: str) -> bool:
+    """True if `text` is a bank IP as used in account numbers (canonical IPv4)."""
+    return _BANK_IP.fullmatch(text) is not None
+
+
+def _parse_int(text: str, what: str) -> int:
+    try:
+        return int(text)
+    except ValueError:
+        raise ParseError(f"Invalid {what}") from None
+
+
+def compile_parser(spec: CommandSpec):
+    """
+    Turns a CommandSpec into a parser function specialised for that shape,
+    so the per-request work is only what the command actually needs
+    (no generic checks for flags that are off).
+
+    Args:
+        spec (CommandSpec): The argument shape.
+
+    Returns:
+        callable: parser(command, args, line) -> Request; raises ParseError.
+    """
+    min_args = spec.min_args
+    max_args = sys.maxsize if spec.max_args is None else spec.max_args
+
+    if not spec.account:
+        def parse_plain(command, args, line):
+            if not min_args <= len(args) <= max_args:
+                raise ParseError("Invalid format")
+            return _new_request(Request, (command, None, None, None, tuple(args), line))
+        return parse_plain
+
+    require_ip, has_amount = spec.require_ip, spec.amount
+
+    def parse_account(command, args, line):
+        if not min_args <= len(args) <= max_args:
+            raise ParseError("Invalid format")
+        number, sep, target_ip = args[0].partition("/")
+        if not sep:
+            if require_ip:
+                raise ParseError("Invalid account format")
+            target_ip = None
+        elif _BANK_IP.fullmatch(target_ip) is None:
+            raise ParseError("Invalid account format")
+        try:
+            account = int(number)
+        except ValueError:
+            raise ParseError("Invalid account number") from None
+        if has_amount:
+            amount = _parse_int(args[1], "amount")
+            rest = tuple(args[2:])
+        else:
+            amount = None
+            rest = tuple(args[1:])
+        return _new_request(Request, (command, account, target_ip, amount, rest, line))
+    return parse_account
+
+
+# Parsers of the built-in commands, compiled once at import
+DEFAULT_PARSERS = {command: compile_parser(spec) for command, spec in COMMAND_SPECS.items()}
+
+
+def parse_command(line: str, parsers: dict = DEFAULT_PARSERS) -> Request:
+    """
+    Splits a command line once and hands the arguments to the compiled
+    parser of its command. Unknown commands are returned unparsed (the
+    dispatcher answers them), so parsing never needs to know the handlers.
+
+    Args:
+        line (str): The raw command line (without the line terminator).
+        parsers (dict): Command code -> parser from compile_parser().
+
+    Returns:
+        Request: The typed request.
+
+    Raises:
+        ParseError: The line is empty or does not match the command's shape.
+    """
+    parts = line.split()
+    if not parts:
+        raise ParseError("Empty command")
+    command = parts[0].upper()
+    parser = parsers.get(command)
+    if parser is None:
+        return _new_request(Request, (command, None, None, None, tuple(parts[1:]), line))
+    return parser(command, parts[1:], line)
+
+
+def parse_batch(line: str, parsers: dict = DEFAULT_PARSERS) -> list:
+    """
+    Parses the operations of a batch line "BT <op>;<op>;...", e.g.
+    "BT AD 10001/10.0.0.1 500;AW 10002/10.0.0.1 20;AB 10001/10.0.0.1".
+    Empty operations (e.g. after a trailing ';') are ignored.
+
+    Returns:
+        list: One Request per operation, in order.
+
+    Raises:
+        ParseError: An operation is malformed or not allowed in a batch
+            (the message names its position, e.g. "Op 2: Invalid amount").
+    """
+    parts = line.split(None, 1)
+    body = parts[1] if len(parts) == 2 else ""
+    requests = []
+    for text in body.split(";"):
+        if not text.strip():
+            continue
+        position = len(requests) + 1
+        try:
+            request = parse_command(text.strip(), parsers)
+        except ParseError as e:
+            raise ParseError(f"Op {position}: {e}") from None
+        if request.command not in BATCH_COMMANDS:
+            raise ParseError(f"Op {position}: {request.command} is not allowed in a batch")
+        requests.append(request)
+    if not requests:
+        raise ParseError("Invalid format")
+    return requests
@@ -1,3 +1,8 @@
+# Account numbers are 5-digit integers (protocol: AC returns 10000-99999)
+ACCOUNT_MIN = 10000
+ACCOUNT_MAX = 99999
+
+
 class Account:
     """
     Represents a domain entity for a Bank Account.
@@ -7,6 +12,9 @@ class Account:
         number (int): Unique account identifier.
         balance (int): Current funds available in the account.
     """
+    # No per-instance __dict__: keeps tens of thousands of accounts small in memory
+    __slots__ = ("number", "balance")
+
     def __init__(self, number: int, balance: int = 0):
         self.number = number
         self.balance = balance
@@ -0,0 +1,45 @@
+class LineReader:
+    """
+    Incremental line framer for the text protocol.
+
+    TCP is a byte stream: one recv() can contain several commands (pipelining)
+    or only half of one (segmentation). LineReader keeps the unfinished tail in
+    a buffer and returns every complete `\\n` or `\\r\\n` terminated line.
+
+    Attributes:
+        max_line_length (int): Upper bound for a single unterminated line in bytes.
+    """
+
+    def __init__(self, max_line_length: int = 65536):
+        self.max_line_length = max_line_length
+        self._buffer = bytearray()
+
+    def feed(self, data: bytes) -> list:
+        """
+        Adds received bytes and returns all complete lines (decoded, without
+        the line terminator). Raises ValueError if a line exceeds max_line_length.
+        """
+        self._buffer += data
+        end = self._buffer.rfind(b"\n")
+        if end == -1:
+            if len(self._buffer) > self.max_line_length:
+                raise ValueError("Request too long")
+            return []
+
+        complete = bytes(self._buffer[:end])
+        del self._buffer[:end + 1]
+        if len(self._buffer) > self.max_line_length:
+            raise ValueError("Request too long")
+
+        lines = complete.decode("utf-8", errors="replace").split("\n")
+        return [line[:-1] if line.endswith("\r") else line for line in lines]
+
+    @property
+    def pending(self) -> int:
+        """Number of buffered bytes that do not form a complete line yet."""
+        return len(self._buffer)
+
+
+def encode_responses(responses: list) -> bytes:
+    """Joins protocol responses into one CRLF-terminated payload for a single sendall()."""
+    return "".join(f"{response}\r\n" for response in responses).encode("utf-8")
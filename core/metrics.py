@@ -0,0 +1,228 @@
+import time
+import bisect
+import logging
+import threading
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger(__name__)
+
+# Latency bucket upper bounds in seconds (50 us .. 10 s, roughly x2.5 per step)
+DEFAULT_BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01,
+                   0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Counter:
+    """A monotonically increasing count."""
+
+    def __init__(self):
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: int = 1):
+        with self._lock:
+            self.value += amount
+
+
+class Gauge:
+    """A value that can go up and down (e.g. active connections)."""
+
+    def __init__(self):
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def set(self, value):
+        self.value = value
+
+    def inc(self, amount: int = 1):
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount: int = 1):
+        with self._lock:
+            self.value -= amount
+
+
+class Histogram:
+    """
+    Fixed-bucket latency histogram.
+
+    Recording is one bisect + three additions under a lock, so it is cheap
+    enough for every request. Percentiles are estimated from the buckets.
+
+    Attributes:
+        buckets (tuple): Upper bounds of the buckets in seconds.
+        counts (list): Observations per bucket (last slot = above the largest bound).
+        total (float): Sum of all observations.
+        count (int): Number of observations.
+    """
+
+    def __init__(self, buckets: tuple = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.total = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float):
+        index = bisect.bisect_left(self.buckets, seconds)
+        with self._lock:
+            self.counts[index] += 1
+            self.total += seconds
+            self.count += 1
+
+    def percentile(self, pct: float) -> float:
+        """Upper bound of the bucket containing the given percentile (seconds)."""
+        with self._lock:
+            counts = list(self.counts)
+            count = self.count
+        if not count:
+            return 0.0
+        rank = pct / 100 * count
+        seen = 0
+        for index, bucket_count in enumerate(counts):
+            seen += bucket_count
+            if seen >= rank:
+                return self.buckets[index] if index < len(self.buckets) else float("inf")
+        return float("inf")
+
+
+class MetricsRegistry:
+    """
+    Collection of named, labelled metrics with Prometheus-style text output.
+
+    Metrics are created on first use: registry.counter("bank_commands_total",
+    command="AD") always returns the same Counter for the same name + labels.
+    Collectors are callbacks that return extra (name, labels, value) samples
+    at render time (e.g. peer pool counters owned by another object).
+    """
+
+    def __init__(self):
+        self._metrics = {}
+        self._collectors = []
+        self._lock = threading.Lock()
+
+    def _get(self, kind, name: str, labels: dict):
+        key = (name, tuple(sorted(labels.items())))
+        metric = self._metrics.get(key)
+        if metric is None:
+            with self._lock:
+                metric = self._metrics.get(key)
+                if metric is None:
+                    metric = kind()
+                    self._metrics[key] = metric
+        return metric
+
+    def counter(self, name: str, **labels) -> Counter:
+        return self._get(Counter, name, labels)
+
+    def gauge(self, name: str, **labels) -> Gauge:
+        return self._get(Gauge, name, labels)
+
+    def histogram(self, name: str, **labels) -> Histogram:
+        return self._get(Histogram, name, labels)
+
+    @contextmanager
+    def timer(self, name: str, **labels):
+        """Context manager that records the duration of the block in a histogram."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.histogram(name, **labels).observe(time.perf_counter() - start)
+
+    def add_collector(self, collector):
+        """Registers a callable returning [(name, labels_dict, value), ...] at render time."""
+        self._collectors.append(collector)
+
+    def items(self) -> list:
+        """Returns [((name, labels), metric), ...] sorted by name."""
+        with self._lock:
+            return sorted(self._metrics.items(), key=lambda kv: kv[0])
+
+    @staticmethod
+    def _labels(labels, extra: dict = None) -> str:
+        pairs = list(labels) + sorted((extra or {}).items())
+        if not pairs:
+            return ""
+        return "{" + ",".join(f'{k}="{v}"' for k, v in pairs) + "}"
+
+    def render(self) -> str:
+        """Renders all metrics in the Prometheus text exposition format."""
+        lines = []
+        for (name, labels), metric in self.items():
+            if isinstance(metric, Histogram):
+                cumulative = 0
+                for bound, bucket_count in zip(metric.buckets + (float("inf"),), metric.counts):
+                    cumulative += bucket_count
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    lines.append(f"{name}_bucket{self._labels(labels, {'le': le})} {cumulative}")
+                lines.append(f"{name}_sum{self._labels(labels)} {metric.total:.6f}")
+                lines.append(f"{name}_count{self._labels(labels)} {metric.count}")
+            else:
+                lines.append(f"{name}{self._labels(labels)} {metric.value}")
+        for collector in self._collectors:
+            try:
+                for name, labels, value in collector():
+                    lines.append(f"{name}{self._labels(sorted(labels.items()))} {value}")
+            except Exception as e:
+                logger.warning("[WARN] Metrics collector failed: %s", e)
+        return "\n".join(lines) + "\n"
+
+    def summary(self) -> str:
+        """
+        One-line overview for the BM protocol command:
+        per command count, p50 and p99 (milliseconds, bucket upper bounds).
+        """
+        parts = []
+        for (name, labels), metric in self.items():
+            if name == "bank_command_seconds" and metric.count:
+                command = dict(labels).get("command", "?")
+                parts.append(f"{command}:n={metric.count},p50={metric.percentile(50) * 1000:g}ms,"
+                             f"p99={metric.percentile(99) * 1000:g}ms")
+        active = self.gauge("bank_active_connections").value
+        parts.append(f"conn={active}")
+        return " ".join(parts)
+
+
+# Default process-wide registry (same idea as the default registry of Prometheus clients)
+METRICS = MetricsRegistry()
+
+
+class MetricsServer:
+    """
+    Plain-text metrics listener on a separate port (GET /metrics, Prometheus format).
+    Runs in a daemon thread, so scraping never competes with the banking port.
+    """
+
+    def __init__(self, ip: str, port: int, registry: MetricsRegistry = METRICS):
+        self.registry = registry
+        registry_ref = registry
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] not in ("/", "/metrics"):
+                    self.send_error(404)
+                    return
+                body = registry_ref.render().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass  # Scrapes are not worth a log line
+
+        self._httpd = ThreadingHTTPServer((ip, port), Handler)
+        self._httpd.daemon_threads = True
+        self.port = self._httpd.server_address[1]
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="metrics", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        logger.info("[SERVER] Metrics available on http://%s:%s/metrics", self._httpd.server_address[0], self.port)
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
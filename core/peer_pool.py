@@ -0,0 +1,278 @@
+import time
+import select
+import socket
+import threading
+from collections import deque
+from core.framing import LineReader
+from core.binary_protocol import HELLO, FrameReader, decode_response, encode_request
+from core.commands import Request
+
+
+def parse_endpoint(text: str, default_port: int) -> tuple:
+    """Parses "ip" or "ip:port" into an (ip, port) tuple."""
+    ip, sep, port = text.rpartition(":")
+    if not sep:
+        return text, default_port
+    return ip, int(port)
+
+
+class PeerConnection:
+    """
+    A persistent TCP connection to another Bank Node.
+
+    Responses are read line-framed (the remote node answers with `\\r\\n`
+    terminated lines), so the same socket can carry many request/response
+    pairs one after another. After a successful negotiate() the connection
+    uses length-prefixed binary frames instead (see core.binary_protocol);
+    callers still pass and get text lines.
+
+    Attributes:
+        endpoint (tuple | str): The (ip, port) of the remote node, or a unix socket path.
+        sock (socket): The connected socket.
+        last_used (float): Monotonic timestamp of the last completed request.
+        binary (bool): The connection speaks the binary protocol.
+    """
+
+    def __init__(self, endpoint: tuple, sock: socket.socket):
+        self.endpoint = endpoint
+        self.sock = sock
+        self.last_used = time.monotonic()
+        self.binary = False
+        self._reader = LineReader()
+        self._lines = deque()
+        self._frames = None
+
+    def negotiate(self) -> bool:
+        """Offers the binary protocol; True if the peer switched (older nodes answer ER)."""
+        if self.request(HELLO) == HELLO:
+            self.binary = True
+            self._frames = FrameReader()
+        return self.binary
+
+    def request(self, line, timeout: float = None) -> str:
+        """
+        Sends one command and waits for exactly one response line.
+        Raises ConnectionResetError if the peer closed the socket before answering.
+
+        Args:
+            line (str | Request): The command (a parsed Request is sent without re-parsing).
+            timeout (float): Read timeout for this request (None = keep the socket's timeout).
+        """
+        if timeout is not None:
+            self.sock.settimeout(timeout)
+        if self.binary:
+            return self._request_binary(line)
+        if isinstance(line, Request):
+            line = line.raw
+        self.sock.sendall(f"{line}\n".encode("utf-8"))
+        while not self._lines:
+            data = self.sock.recv(4096)
+            if not data:
+                raise ConnectionResetError("Peer closed the connection")
+            self._lines.extend(self._reader.feed(data))
+        self.last_used = time.monotonic()
+        return self._lines.popleft().strip()
+
+    def _request_binary(self, line) -> str:
+        command, data = encode_request(line)
+        self.sock.sendall(data)
+        while not self._lines:
+            data = self.sock.recv(4096)
+            if not data:
+                raise ConnectionResetError("Peer closed the connection")
+            self._lines.extend(self._frames.feed(data))
+        self.last_used = time.monotonic()
+        return decode_response(command, self._lines.popleft())
+
+    def is_healthy(self) -> bool:
+        """
+        Non-blocking check that the idle socket is still usable.
+        An idle connection must not be readable: readable means either EOF
+        (peer closed it, e.g. its idle timeout fired) or unexpected stray data.
+        """
+        if self._lines or self._reader.pending or (self._frames is not None and self._frames.pending):
+            return False
+        try:
+            readable, _, _ = select.select([self.sock], [], [], 0)
+        except (OSError, ValueError):
+            return False
+        return not readable
+
+    def close(self):
+        try:
+            self.sock.close()
+        except OSError:
+            pass
+
+
+class PeerConnectionPool:
+    """
+    Keeps warm, reusable TCP connections to peer Bank Nodes.
+
+    Instead of a fresh handshake + teardown for every forwarded command,
+    connections are checked out, used for one request/response and returned.
+    Idle connections are health-checked before reuse and evicted after
+    `idle_timeout` seconds (well below the 300 s idle timeout of the remote
+    server). At most `max_idle_per_peer` idle sockets are kept per peer.
+
+    Attributes:
+        max_idle_per_peer (int): Upper bound of idle connections kept per peer.
+        idle_timeout (float): Seconds after which an idle connection is closed.
+        timeout (float): Read timeout: how long to wait for a peer's response.
+        connect_timeout (float): How long to wait for a connection to be accepted
+            (kept short, so an offline peer is detected quickly).
+        binary (bool): Offer the binary protocol on new TCP connections (one extra
+            round trip per connection; peers that do not support it stay on text).
+        hits (int): Requests served on a reused (warm) connection.
+        misses (int): Requests that had to open a new connection.
+        reconnects (int): Reused connections found dead mid-request and replaced.
+        evictions (int): Idle connections closed by health check or idle timeout.
+    """
+
+    def __init__(self, max_idle_per_peer: int = 8, idle_timeout: float = 60.0, timeout: float = 5.0,
+                 connect_timeout: float = None, binary: bool = False):
+        self.max_idle_per_peer = max_idle_per_peer
+        self.idle_timeout = idle_timeout
+        self.timeout = timeout
+        self.connect_timeout = connect_timeout or timeout
+        self.binary = binary
+
+        self.hits = 0
+        self.misses = 0
+        self.reconnects = 0
+        self.evictions = 0
+
+        self._idle = {}  # endpoint -> deque[PeerConnection] (most recently used on the right)
+        self._text_only = set()  # Endpoints that declined the binary protocol
+        self._lock = threading.Lock()
+
+    def _connect(self, endpoint, timeout: float = None) -> PeerConnection:
+        timeout = timeout or self.connect_timeout
+        if isinstance(endpoint, str):
+            # Unix socket path (shards of the same node, see core.cluster)
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(timeout)
+            try:
+                sock.connect(endpoint)
+            except OSError:
+                sock.close()
+                raise
+            return PeerConnection(endpoint, sock)
+        sock = socket.create_connection(endpoint, timeout=timeout)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+        conn = PeerConnection(endpoint, sock)
+        if self.binary and endpoint not in self._text_only:
+            try:
+                if not conn.negotiate():
+                    self._text_only.add(endpoint)  # Older node: do not ask again
+            except Exception:
+                conn.close()
+                raise
+        return conn
+
+    def acquire(self, endpoint: tuple, timeout: float = None):
+        """
+        Checks out a connection to the endpoint (`timeout` applies to a new connect).
+
+        Returns:
+            tuple: (PeerConnection, reused) where reused tells if it was a warm socket.
+        """
+        now = time.monotonic()
+        stale = []
+        conn = None
+        with self._lock:
+            idle = self._idle.get(endpoint)
+            while idle:
+                candidate = idle.pop()
+                if now - candidate.last_used > self.idle_timeout or not candidate.is_healthy():
+                    stale.append(candidate)
+                    continue
+                conn = candidate
+                break
+            self.evictions += len(stale)
+            if conn is not None:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+        for candidate in stale:
+            candidate.close()
+        if conn is not None:
+            return conn, True
+        return self._connect(endpoint, timeout), False
+
+    def release(self, conn: PeerConnection):
+        """Returns a healthy connection to the pool (or closes it if the pool is full)."""
+        with self._lock:
+            idle = self._idle.setdefault(conn.endpoint, deque())
+            if len(idle) < self.max_idle_per_peer:
+                idle.append(conn)
+                return
+        conn.close()
+
+    def request(self, endpoint: tuple, line, timeout: float = None) -> str:
+        """
+        Sends one command to the endpoint over a pooled connection and returns the response line.
+        `timeout` overrides both the connect and the read timeout for this request only.
+
+        If a reused connection turns out to be closed by the peer before the
+        command could be written (broken pipe), the command is retried once on
+        a fresh connection. Once it was written, nothing is retried (a reset,
+        EOF or timeout is raised), since the peer may already have executed it.
+        """
+        read_timeout = timeout or self.timeout
+        conn, reused = self.acquire(endpoint, timeout)
+        try:
+            response = conn.request(line, read_timeout)
+        except BrokenPipeError:  # Only raised by sendall: the command never reached the peer
+            conn.close()
+            if not reused:
+                raise
+            with self._lock:
+                self.reconnects += 1
+            conn = self._connect(endpoint, timeout)
+            try:
+                response = conn.request(line, read_timeout)
+            except Exception:
+                conn.close()
+                raise
+        except Exception:
+            conn.close()
+            raise
+        self.release(conn)
+        return response
+
+    def evict_idle(self):
+        """Closes all idle connections that exceeded idle_timeout."""
+        now = time.monotonic()
+        expired = []
+        with self._lock:
+            for idle in self._idle.values():
+                keep = deque(c for c in idle if now - c.last_used <= self.idle_timeout)
+                expired.extend(c for c in idle if now - c.last_used > self.idle_timeout)
+                idle.clear()
+                idle.extend(keep)
+            self.evictions += len(expired)
+        for conn in expired:
+            conn.close()
+
+    def close_all(self):
+        """Closes every idle connection (used on shutdown)."""
+        with self._lock:
+            conns = [c for idle in self._idle.values() for c in idle]
+            self._idle.clear()
+        for conn in conns:
+            conn.close()
+
+    def stats(self) -> dict:
+        """Returns the pool counters as a dictionary."""
+        with self._lock:
+            idle = sum(len(q) for q in self._idle.values())
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "reconnects": self.reconnects,
+                "evictions": self.evictions,
+                "idle": idle,
+            }
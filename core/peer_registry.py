@@ -0,0 +1,180 @@
+import time
+import socket
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import NamedTuple, Optional
+
+logger = logging.getLogger(__name__)
+
+# Ports a Bank Node may listen on (see README, --port)
+PORT_RANGE = range(65525, 65536)
+
+# Most bank IPs remembered at once; the stalest entry (a missing bank first) makes room
+MAX_PEERS = 1024
+
+
+class PeerEntry(NamedTuple):
+    """What the registry knows about one bank IP."""
+    ip: str
+    endpoint: Optional[tuple]   # (ip, port) that answered, None = no bank found
+    healthy: bool
+    failures: int               # Consecutive failed requests/probes
+    checked: float              # Monotonic time of the last scan or probe
+
+
+class PeerRegistry:
+    """
+    Routing table: bank IP -> (ip, port) of the node that serves it.
+
+    A bank is identified only by its IP (accounts look like 12345/10.0.0.5),
+    but nodes may listen on any port of 65525-65535. The first request for an
+    IP scans the whole range concurrently with a short BC probe and caches the
+    port that answered. Failed requests mark the peer unhealthy; a background
+    thread re-probes known peers and rescans unhealthy ones, so forwarding goes
+    straight to the right endpoint instead of retrying refused ports.
+    An IP where no bank was found is cached too (negative cache), so
+    repeated requests for it fail immediately until the next rescan.
+
+    Attributes:
+        ports (range): Ports that are scanned.
+        probe_timeout (float): Connect/read timeout of one probe in seconds.
+        refresh_interval (float): Seconds between background refreshes.
+        negative_ttl (float): Seconds an IP without a bank stays cached as missing.
+        max_entries (int): Most IPs in the routing table (client-supplied IPs cannot grow it without bound).
+        own_endpoints (set): (ip, port) of this node, never used as a peer
+            (("0.0.0.0", port) covers every loopback address on that port).
+    """
+
+    def __init__(self, ports: range = PORT_RANGE, probe_timeout: float = 0.5, refresh_interval: float = 30.0,
+                 negative_ttl: float = 10.0, max_entries: int = MAX_PEERS):
+        self.ports = ports
+        self.probe_timeout = probe_timeout
+        self.refresh_interval = refresh_interval
+        self.negative_ttl = negative_ttl
+        self.max_entries = max_entries
+        self.own_endpoints = set()
+
+        self._entries = {}
+        self._lock = threading.Lock()
+        self._scan_locks = {}
+        self._executor = ThreadPoolExecutor(max_workers=len(ports), thread_name_prefix="peer-scan")
+        self._stop = threading.Event()
+        self._thread = None
+
+    def probe(self, endpoint: tuple) -> bool:
+        """True if a Bank Node (other than this one) answers BC on the endpoint."""
+        if self._is_own(endpoint):
+            return False
+        try:
+            with socket.create_connection(endpoint, timeout=self.probe_timeout) as sock:
+                sock.sendall(b"BC\n")
+                return sock.recv(64).startswith(b"BC")
+        except OSError:
+            return False
+
+    def check(self, endpoint: tuple) -> bool:
+        """Probes the endpoint and, if a bank answers, records it as the healthy route for its IP."""
+        if not self.probe(endpoint):
+            return False
+        self._set(PeerEntry(endpoint[0], endpoint, True, 0, time.monotonic()))
+        return True
+
+    def _is_own(self, endpoint: tuple) -> bool:
+        ip, port = endpoint
+        return endpoint in self.own_endpoints or (
+            ip.startswith("127.") and ("0.0.0.0", port) in self.own_endpoints)
+
+    def scan(self, ip: str) -> Optional[tuple]:
+        """Probes every port of the range at once; returns the lowest endpoint that answered."""
+        endpoints = [(ip, port) for port in self.ports]
+        for endpoint, alive in zip(endpoints, self._executor.map(self.probe, endpoints)):
+            if alive:
+                return endpoint
+        return None
+
+    def _is_fresh(self, entry: PeerEntry) -> bool:
+        if entry is None:
+            return False
+        if entry.endpoint is not None:
+            return entry.healthy  # A failed peer is rescanned on its next use
+        # No bank found: rescanned at most every negative_ttl seconds
+        return time.monotonic() - entry.checked < self.negative_ttl
+
+    def resolve(self, ip: str) -> Optional[tuple]:
+        """
+        Returns the (ip, port) serving the bank IP, scanning on a cache miss
+        or after a failure. Returns None if no bank answers (cached for
+        negative_ttl seconds).
+        """
+        entry = self._entries.get(ip)
+        if self._is_fresh(entry):
+            return entry.endpoint
+
+        # One scan per IP at a time; concurrent requests wait for its result
+        with self._lock:
+            scan_lock = self._scan_locks.setdefault(ip, threading.Lock())
+        with scan_lock:
+            entry = self._entries.get(ip)
+            if self._is_fresh(entry):
+                return entry.endpoint  # Scanned by another thread meanwhile
+            return self._rescan(ip)
+
+    def _rescan(self, ip: str) -> Optional[tuple]:
+        endpoint = self.scan(ip)
+        previous = self._entries.get(ip)
+        failures = 0 if endpoint else (previous.failures + 1 if previous else 1)
+        self._set(PeerEntry(ip, endpoint, endpoint is not None, failures, time.monotonic()))
+        if endpoint:
+            logger.info("[P2P] Bank %s found on port %s", ip, endpoint[1])
+        else:
+            logger.warning("[WARN] No bank answers on %s ports %s-%s", ip, self.ports[0], self.ports[-1])
+        return endpoint
+
+    def mark_failed(self, ip: str):
+        """A request to the peer failed: the next resolve() or background refresh rescans it."""
+        with self._lock:
+            entry = self._entries.get(ip)
+            if entry is not None:
+                self._entries[ip] = entry._replace(healthy=False, failures=entry.failures + 1)
+
+    def _set(self, entry: PeerEntry):
+        with self._lock:
+            if entry.ip not in self._entries and len(self._entries) >= self.max_entries:
+                self._evict_locked()
+            self._entries[entry.ip] = entry
+
+    def _evict_locked(self):
+        """Drops the entry checked longest ago, preferring IPs where no bank was found."""
+        victim = min(self._entries.values(), key=lambda e: (e.endpoint is not None, e.checked))
+        del self._entries[victim.ip]
+        self._scan_locks.pop(victim.ip, None)
+
+    def entries(self) -> list:
+        """Snapshot of the routing table, sorted by IP."""
+        with self._lock:
+            return sorted(self._entries.values())
+
+    def refresh(self):
+        """Re-probes healthy peers on their known port and rescans the others."""
+        for entry in self.entries():
+            if entry.healthy and entry.endpoint and self.probe(entry.endpoint):
+                self._set(entry._replace(checked=time.monotonic()))
+            else:
+                self._rescan(entry.ip)
+
+    def start(self):
+        """Starts the background refresh thread."""
+        self._thread = threading.Thread(target=self._run, name="peer-registry", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.refresh_interval):
+            try:
+                self.refresh()
+            except Exception as e:
+                logger.warning("[WARN] Peer refresh failed: %s", e)
+
+    def stop(self):
+        self._stop.set()
+        self._executor.shutdown(wait=False)
@@ -0,0 +1,359 @@
+import time
+import socket
+import logging
+import selectors
+import threading
+from collections import deque
+from core.bank_service import BankService
+from core.binary_protocol import HELLO, HELLO_REJECTED, FrameReader, encode_response, execute_frames
+from core.framing import LineReader, encode_responses
+from core.worker_pool import WorkerPool
+from shared.logger import REQUEST_LOGGER
+from core.metrics import METRICS
+
+logger = logging.getLogger(__name__)
+request_log = logging.getLogger(REQUEST_LOGGER)
+
+IDLE_TIMEOUT = 300      # Same idle timeout as the other engines (manual testing friendly)
+SEND_TIMEOUT = 30
+
+
+class _Reply(str):
+    """A response decided by the I/O thread (the answer to a BP hello): queued in order, nothing is executed."""
+
+
+class _Connection:
+    """
+    State of one client socket: framing buffer and commands waiting for a worker
+    (text lines as str, binary protocol payloads as bytes).
+    """
+    __slots__ = ("sock", "addr", "reader", "frames", "pending", "scheduled", "closing", "farewell", "last_active",
+                 "lock")
+
+    def __init__(self, sock: socket.socket, addr):
+        self.sock = sock
+        self.addr = addr
+        self.reader = LineReader()
+        self.frames = None          # FrameReader once the client switched to the binary protocol
+        self.pending = deque()
+        self.scheduled = False      # A drain job for this connection is queued or running
+        self.closing = False        # Client sent EOF; close once pending commands are answered
+        self.farewell = None        # Last bytes sent before closing (e.g. "ER Request too long")
+        self.last_active = time.monotonic()
+        self.lock = threading.Lock()
+
+
+class PooledBankNode:
+    """
+    Network Layer with a fixed-size worker pool (selected with `--engine pool`).
+
+    One I/O thread watches all client sockets with a selector, frames the
+    received bytes into commands and queues them on their connection. A
+    connection with pending commands gets one drain job in the bounded
+    WorkerPool queue; the job executes that connection's commands in order and
+    sends the responses. The number of threads is therefore fixed
+    (1 + workers), no matter how many clients connect. Like the other
+    engines it switches a connection to the binary protocol after "BP 2".
+
+    When the queue is full the overload policy applies: 'reject' and
+    'shed-oldest' answer the affected commands with `ER Busy`, 'block' stops
+    reading from the affected sockets until a worker frees a slot (TCP
+    backpressure); the I/O thread itself never waits for the pool.
+
+    Only the I/O thread touches the selector and the connection table.
+    Workers hand connections they are done with back through a queue and
+    wake the I/O thread up with a byte on a socket pair.
+
+    Attributes:
+        ip (str): The IP address to bind to.
+        port (int): The TCP port to listen on.
+        service (BankService): The business logic controller.
+        backlog (int): Size of the kernel accept queue.
+        reuse_port (bool): Share the port with other processes (SO_REUSEPORT, sharded mode).
+        max_connections (int): Connections above this limit are refused with an ER message.
+        pool (WorkerPool): Executes the commands (created in start_server).
+        ready (threading.Event): Set once the server is listening.
+    """
+
+    def __init__(self, ip: str, port: int, service: BankService = None, backlog: int = 1024,
+                 max_connections: int = 10000, workers: int = 16, queue_size: int = 1024,
+                 overload: str = "reject", reuse_port: bool = False):
+        self.ip = ip
+        self.port = port
+        self.service = service or BankService()
+        self.backlog = backlog
+        self.reuse_port = reuse_port
+        self.max_connections = max_connections
+        self.workers = workers
+        self.queue_size = queue_size
+        self.overload = overload
+        self.running = True
+        self.ready = threading.Event()
+        self.pool = None
+
+        self._selector = None
+        self._server_socket = None
+        self._connections = {}
+        self._wakeup_r, self._wakeup_w = None, None
+        self._to_close = deque()   # Connections workers finished with, closed by the I/O thread
+        self._stalled = deque()    # 'block' policy: connections waiting for a queue slot, not read meanwhile
+        self._active = METRICS.gauge("bank_active_connections")
+        self._busy = METRICS.counter("bank_busy_responses_total")
+
+    def start_server(self):
+        """Binds the socket and runs the I/O loop until stop() is called (Blocking call)."""
+        server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        if self.reuse_port:
+            # Several shard processes accept on the same port; the kernel balances connections
+            server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        self._server_socket = server_socket
+        self._selector = selectors.DefaultSelector()
+        self._wakeup_r, self._wakeup_w = socket.socketpair()
+        self._wakeup_r.setblocking(False)
+        self._wakeup_w.setblocking(False)
+        self.pool = WorkerPool(self.workers, self.queue_size, self.overload, self.service.metrics)
+
+        try:
+            server_socket.bind((self.ip, self.port))
+            server_socket.listen(self.backlog)
+            server_socket.setblocking(False)
+            self.port = server_socket.getsockname()[1]  # Resolves port 0 to the real port
+            self._selector.register(server_socket, selectors.EVENT_READ)
+            self._selector.register(self._wakeup_r, selectors.EVENT_READ)
+            logger.info("[SERVER] Bank Node (worker pool) running on %s:%s", self.ip, self.port)
+            logger.info("[SERVER] %d workers, queue size %d, overload policy '%s'",
+                        self.workers, self.queue_size, self.overload)
+            self.ready.set()
+
+            next_idle_check = time.monotonic() + 5
+            while self.running:
+                for key, _ in self._selector.select(timeout=1):
+                    if key.fileobj is server_socket:
+                        self._accept()
+                    elif key.fileobj is self._wakeup_r:
+                        self._handle_wakeup()
+                    else:
+                        self._read(key.data)
+                if self._stalled:
+                    self._resume_stalled()
+                if time.monotonic() >= next_idle_check:
+                    self._close_idle()
+                    next_idle_check = time.monotonic() + 5
+
+        except Exception as e:
+            if self.running:
+                logger.critical("[CRITICAL] Server failed: %s", e)
+        finally:
+            for conn in list(self._connections.values()):
+                self._close(conn)
+            self._selector.close()
+            server_socket.close()
+            self.pool.shutdown()
+            while self._to_close:
+                self._close(self._to_close.popleft())
+            self._wakeup_r.close()
+            self._wakeup_w.close()
+
+    def stop(self):
+        """Stops the I/O loop from any thread."""
+        self.running = False
+
+    def _accept(self):
+        try:
+            sock, addr = self._server_socket.accept()
+        except (BlockingIOError, InterruptedError):
+            return
+        if len(self._connections) >= self.max_connections:
+            try:
+                sock.sendall(b"ER Too many connections\r\n")
+            except OSError:
+                pass
+            sock.close()
+            return
+
+        # Blocking with a timeout: reads only happen once the selector reports
+        # data, sends from worker threads may wait for a slow client.
+        sock.settimeout(SEND_TIMEOUT)
+        conn = _Connection(sock, addr)
+        self._connections[sock.fileno()] = conn
+        self._selector.register(sock, selectors.EVENT_READ, conn)
+        self._active.inc()
+        request_log.info("[CONN] %s connected. Active connections: %d", addr[0], len(self._connections))
+
+    def _read(self, conn: _Connection):
+        try:
+            data = conn.sock.recv(4096)
+        except (socket.timeout, BlockingIOError):
+            return
+        except OSError:
+            data = b""
+        if not data:
+            self._finish(conn)  # Connection closed by client
+            return
+
+        conn.last_active = time.monotonic()
+        if conn.frames is not None:
+            try:
+                payloads = conn.frames.feed(data)
+            except ValueError as e:
+                conn.farewell = encode_response(None, f"ER {e}")
+                self._finish(conn)
+                return
+            if payloads:
+                self._enqueue(conn, payloads)
+            return
+
+        try:
+            lines = conn.reader.feed(data)
+        except ValueError as e:
+            conn.farewell = encode_responses([f"ER {e}"])
+            self._finish(conn)
+            return
+
+        commands = []
+        for index, line in enumerate(lines):
+            command_str = line.strip()
+            if not command_str:
+                continue
+            request_log.info("[RECV] %s", command_str)
+            if command_str == HELLO:
+                if conn.reader.pending or any(rest.strip() for rest in lines[index + 1:]):
+                    commands.append(_Reply(HELLO_REJECTED))
+                    continue
+                # Binary from the next packet on (the client waits for this answer)
+                commands.append(_Reply(HELLO))
+                conn.frames = FrameReader()
+                break
+            commands.append(command_str)
+        if commands:
+            self._enqueue(conn, commands)
+
+    def _enqueue(self, conn: _Connection, commands: list):
+        with conn.lock:
+            conn.pending.extend(commands)
+            if conn.scheduled or not conn.pending:
+                return  # The running/queued drain job picks them up
+            conn.scheduled = True
+        if self.overload == "block" and (self._stalled or self.pool.depth >= self.pool.queue_size):
+            self._stall(conn)
+            return
+        self.pool.submit(self._drain, conn, on_reject=self._reject)
+
+    def _stall(self, conn: _Connection):
+        """'block' policy: stops reading from the connection until the queue has room for its job."""
+        try:
+            self._selector.unregister(conn.sock)
+        except (KeyError, ValueError):
+            pass
+        self._stalled.append(conn)
+
+    def _resume_stalled(self):
+        """Queues the jobs of stalled connections (oldest first) while there is room, and reads from them again."""
+        while self._stalled and self.pool.depth < self.pool.queue_size:
+            conn = self._stalled.popleft()
+            if conn.sock.fileno() in self._connections:
+                self._selector.register(conn.sock, selectors.EVENT_READ, conn)
+            self.pool.submit(self._drain, conn, on_reject=self._reject)
+
+    def _wake(self):
+        try:
+            self._wakeup_w.send(b"\0")
+        except OSError:
+            pass  # Buffer full: the I/O thread is woken up already
+
+    def _handle_wakeup(self):
+        try:
+            while self._wakeup_r.recv(4096):
+                pass
+        except OSError:
+            pass
+        while self._to_close:
+            self._close(self._to_close.popleft())
+
+    def _drain(self, conn: _Connection):
+        """Worker job: executes the connection's pending commands in order."""
+        if self._stalled:
+            self._wake()  # Taking this job freed a queue slot
+        while True:
+            with conn.lock:
+                batch = list(conn.pending)
+                conn.pending.clear()
+                if not batch:
+                    conn.scheduled = False
+                    close = conn.closing
+                    break
+            self._send(conn, self._execute(batch, conn.addr[0]))
+        if close:
+            self._to_close.append(conn)
+            self._wake()
+
+    def _execute(self, batch: list, client_ip: str) -> bytes:
+        """Executes text commands and binary payloads in order; returns all responses as one buffer."""
+        out, text = [], []
+        for item in batch:
+            if isinstance(item, bytes):
+                if text:
+                    out.append(encode_responses(text))
+                    text = []
+                out.append(execute_frames(self.service, [item], client_ip))
+            elif isinstance(item, _Reply):
+                text.append(item)
+            else:
+                text.append(self.service.execute_command(item, client_ip))
+        if text:
+            out.append(encode_responses(text))
+        return b"".join(out)
+
+    def _reject(self, conn: _Connection):
+        """Overload: answers every pending command of the connection with ER Busy (runs on the I/O thread)."""
+        with conn.lock:
+            batch = list(conn.pending)
+            conn.pending.clear()
+            conn.scheduled = False
+            close = conn.closing
+        if batch:
+            self._busy.inc(sum(1 for item in batch if not isinstance(item, _Reply)))
+            self._send(conn, b"".join(
+                encode_response(None, "ER Busy") if isinstance(item, bytes)
+                else encode_responses([item if isinstance(item, _Reply) else "ER Busy"]) for item in batch))
+        if close:
+            self._close(conn)
+
+    def _send(self, conn: _Connection, payload: bytes):
+        try:
+            conn.sock.sendall(payload)
+        except OSError as e:
+            logger.info("[DISCONNECT] Could not answer %s: %s", conn.addr[0], e)
+
+    def _finish(self, conn: _Connection):
+        """Stops reading; the socket is closed once all pending commands are answered."""
+        self._unregister(conn)
+        with conn.lock:
+            conn.closing = True
+            close = not conn.scheduled
+        if close:
+            self._close(conn)
+
+    def _close_idle(self):
+        deadline = time.monotonic() - IDLE_TIMEOUT
+        for conn in list(self._connections.values()):
+            if conn.last_active < deadline and not conn.scheduled:
+                logger.info("[TIMEOUT] Client %s was idle for too long.", conn.addr[0])
+                self._finish(conn)
+
+    def _unregister(self, conn: _Connection):
+        if self._connections.pop(conn.sock.fileno(), None) is not None:
+            try:
+                self._selector.unregister(conn.sock)
+            except (KeyError, ValueError):
+                pass
+            self._active.dec()
+
+    def _close(self, conn: _Connection):
+        if conn.sock.fileno() in self._connections:
+            self._unregister(conn)
+        if conn.farewell is not None:
+            self._send(conn, conn.farewell)
+        conn.sock.close()
+        request_log.info("[CLOSED] Connection with %s closed.", conn.addr[0])
@@ -0,0 +1,221 @@
+"""
+On-demand profiling of a running node (PF command).
+
+Two modes, both limited to a fixed window and written to the profile directory:
+    sample    A background thread takes the stacks of all threads every
+              `interval` seconds (sys._current_frames) and writes them as
+              collapsed stacks: "<thread>;<outer frame>;...;<inner frame> <count>"
+              per line, ready for flamegraph.pl / speedscope.
+    cprofile  Deterministic profiling of every command executed in the window
+              (execute_command / execute_parsed on all client threads), merged
+              into one pstats file (python -m pstats <file>).
+
+Nothing is hooked while no profile runs: the service methods are only
+shadowed by profiled wrappers for the duration of a cprofile window.
+"""
+import os
+import re
+import sys
+import time
+import pstats
+import cProfile
+import logging
+import itertools
+import threading
+from pathlib import Path
+from collections import Counter
+
+logger = logging.getLogger(__name__)
+
+PROFILE_MODES = ("sample", "cprofile")
+MAX_SECONDS = 300
+_THREAD_NUMBER = re.compile(r"[-_]\d+")
+
+
+class StackSampler:
+    """
+    Samples the stacks of all other threads at a fixed interval.
+
+    Attributes:
+        interval (float): Seconds between two samples.
+        samples (int): Number of samples taken so far.
+    """
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.samples = 0
+        self._stacks = Counter()
+
+    def begin(self):
+        pass  # Nothing to hook: sampling happens in run()
+
+    def run(self, seconds: float):
+        """Samples for `seconds` in the calling thread."""
+        me = threading.get_ident()
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline:
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident != me:
+                    self._stacks[self._collapse(names.get(ident, "unknown"), frame)] += 1
+            self.samples += 1
+            time.sleep(self.interval)
+
+    @staticmethod
+    def _collapse(thread_name: str, frame) -> str:
+        frames = []
+        while frame is not None:
+            code = frame.f_code
+            frames.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+            frame = frame.f_back
+        # Threads of one kind (Thread-12 (handle_client), bank-worker_3, ...) share one root
+        frames.append(_THREAD_NUMBER.sub("", thread_name))
+        return ";".join(reversed(frames))
+
+    def write(self, path: Path):
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in self._stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+class CommandProfiler:
+    """
+    Deterministic profiling of the command entry points of a BankService.
+
+    Every client thread gets its own cProfile.Profile (a profiler only sees
+    its own thread); the profiles are merged when the window ends.
+    """
+
+    ENTRY_POINTS = ("execute_command", "execute_parsed")
+
+    def __init__(self, service):
+        self.service = service
+        self._local = threading.local()
+        self._profiles = []
+        self._lock = threading.Lock()
+
+    def _profile(self) -> cProfile.Profile:
+        profile = getattr(self._local, "profile", None)
+        if profile is None:
+            profile = self._local.profile = cProfile.Profile()
+            with self._lock:
+                self._profiles.append(profile)
+        return profile
+
+    def _wrap(self, method):
+        def profiled(*args, **kwargs):
+            profile = self._profile()
+            try:
+                profile.enable()
+            except ValueError:
+                return method(*args, **kwargs)  # Another profiler is active in this thread
+            try:
+                return method(*args, **kwargs)
+            finally:
+                profile.disable()
+        return profiled
+
+    def begin(self):
+        """Shadows the entry points with profiled wrappers (until run() ends)."""
+        for name in self.ENTRY_POINTS:
+            setattr(self.service, name, self._wrap(getattr(self.service, name)))
+
+    def run(self, seconds: float):
+        try:
+            time.sleep(seconds)
+        finally:
+            for name in self.ENTRY_POINTS:
+                delattr(self.service, name)  # The class methods are visible again
+
+    def write(self, path: Path) -> bool:
+        """Writes the merged pstats file; False if no command ran in the window."""
+        with self._lock:
+            profiles = list(self._profiles)
+        stats = None
+        for profile in profiles:
+            try:
+                stats = pstats.Stats(profile) if stats is None else stats.add(profile)
+            except TypeError:
+                continue  # Profile of a thread that has not finished a call yet
+        if stats is None:
+            return False
+        stats.dump_stats(str(path))
+        return True
+
+
+class ProfileSession:
+    """
+    Runs at most one profile at a time in a background thread and writes
+    the result to `directory`.
+
+    Attributes:
+        directory (Path): Where profiles are written (created on first use).
+        last_file (Path): Result of the last finished profile (None = none yet).
+    """
+
+    def __init__(self, service, directory):
+        self.service = service
+        self.directory = Path(directory)
+        self.last_file = None
+        self._running = threading.Lock()
+
+    def start(self, mode: str, seconds: float, interval: float = 0.005) -> Path:
+        """
+        Starts a profile window.
+
+        Returns:
+            Path: The file the result will be written to.
+
+        Raises:
+            ValueError: Unknown mode, invalid window or a profile is already running.
+        """
+        if mode not in PROFILE_MODES:
+            raise ValueError(f"Unknown profile mode: {mode}")
+        if not 0 < seconds <= MAX_SECONDS or not 0 < interval <= 1:
+            raise ValueError("Invalid profile window")
+        self.directory.mkdir(parents=True, exist_ok=True)
+        if not self._running.acquire(blocking=False):
+            raise ValueError("A profile is already running")
+        try:
+            path = self._reserve_file(mode)
+        except OSError:
+            self._running.release()
+            raise
+        profiler = StackSampler(interval) if mode == "sample" else CommandProfiler(self.service)
+        profiler.begin()  # Commands sent right after the PF answer are already profiled
+        threading.Thread(target=self._run, args=(profiler, seconds, path), name="profiler", daemon=True).start()
+        logger.info("[INFO] Profiling (%s) for %ss -> %s", mode, seconds, path)
+        return path
+
+    def _reserve_file(self, mode: str) -> Path:
+        """
+        Creates the result file under a new name: runs started in the same second
+        (or by another shard process in the same directory) get a counter suffix.
+        """
+        suffix = "folded" if mode == "sample" else "pstats"
+        stem = f"{time.strftime('%Y%m%d-%H%M%S')}-{mode}"
+        for attempt in itertools.count():
+            path = self.directory / (f"{stem}.{suffix}" if not attempt else f"{stem}-{attempt}.{suffix}")
+            try:
+                open(path, "x").close()
+                return path
+            except FileExistsError:
+                continue
+
+    def _run(self, profiler, seconds: float, path: Path):
+        try:
+            profiler.run(seconds)
+            if profiler.write(path) is False:
+                path.unlink()  # Drop the reserved, empty file
+                logger.info("[INFO] Profile %s is empty (no commands in the window)", path)
+            else:
+                self.last_file = path
+                logger.info("[INFO] Profile written: %s", path)
+        except Exception as e:
+            logger.warning("[WARN] Profiling failed: %s", e)
+        finally:
+            self._running.release()
+
+    @property
+    def running(self) -> bool:
+        return self._running.locked()
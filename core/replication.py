@@ -0,0 +1,308 @@
+"""
+Leader/follower replication of the account data.
+
+The leader publishes every change its repository writes to the WAL (one
+mutation or one whole batch) into a ReplicationLog with a sequence number,
+once the change is durable and in log order: a follower never gets a change
+the leader could still lose in a crash.
+Followers keep a TCP connection to the leader's replication port, apply the
+changes to their own AccountRepository (and their own WAL/snapshot) and
+serve read-only commands locally.
+
+Protocol (text lines on the replication port):
+    follower -> leader:
+        RF <epoch> <seq>            follow, resuming after change <seq> of leader run <epoch>
+                                    ("RF - 0" for a follower without data)
+    leader -> follower:
+        RS <epoch> <seq> <count>    full state as of change <seq>; <count> log records follow
+        RC <seq> <record>;<record>  one change (log records, see WriteAheadLog)
+        RH <seq>                    heartbeat with the leader's latest change (sent when idle)
+
+A follower that reconnects within the backlog only receives the changes it
+missed; after a leader restart (new epoch) or a longer outage it gets the
+full state again. The follower keeps its position (epoch and last applied
+change) in a small file next to its data, so a follower restart resumes
+there too.
+"""
+import os
+import time
+import uuid
+import socket
+import logging
+import threading
+import itertools
+from collections import deque
+from shared.persistence.repository import AccountRepository
+
+logger = logging.getLogger(__name__)
+
+# Default port of the replication listener (below the bank port range 65525-65535)
+REPLICATION_PORT = 65524
+# Seconds between two saves of the follower's position while changes stream in
+POSITION_SAVE_INTERVAL = 1.0
+
+
+class ReplicationLog:
+    """
+    Leader side: bounded in-memory backlog of the latest changes.
+
+    Attributes:
+        epoch (str): Random id of this leader run (sequence numbers restart with it).
+        seq (int): Sequence number of the latest change.
+        followers (dict): "ip:port" of connected followers -> last change sent to them.
+    """
+
+    def __init__(self, backlog: int = 100000):
+        self.epoch = uuid.uuid4().hex[:8]
+        self.seq = 0
+        self.followers = {}
+        self._changes = deque(maxlen=backlog)
+        self._cond = threading.Condition(threading.Lock())
+
+    def publish(self, lines: list):
+        """Records one change. Called by the repository's WAL once the change is durable, in log order."""
+        with self._cond:
+            self.seq += 1
+            self._changes.append((self.seq, lines))
+            self._cond.notify_all()
+
+    def reset(self):
+        """The state was replaced as a whole (a follower loaded its leader's state): followers resync."""
+        with self._cond:
+            self.epoch = uuid.uuid4().hex[:8]
+            self.seq += 1
+            self._changes.clear()
+            self._cond.notify_all()
+
+    def changes_after(self, seq: int, timeout: float = 0.0):
+        """
+        Returns the changes after `seq` as [(seq, lines), ...], waiting up to
+        `timeout` seconds if there is none yet. Returns None if `seq` is no
+        longer covered by the backlog (the follower needs the full state).
+        """
+        with self._cond:
+            if seq == self.seq and timeout:
+                self._cond.wait(timeout)
+            first = self._changes[0][0] if self._changes else self.seq + 1
+            if seq > self.seq or seq + 1 < first:
+                return None
+            return list(itertools.islice(self._changes, seq + 1 - first, None))
+
+
+class ReplicationServer:
+    """
+    Leader side: streams the ReplicationLog of a repository to followers,
+    one thread per follower connection.
+
+    Attributes:
+        host (str): Address of the replication listener.
+        port (int): Port of the replication listener (0 = pick a free one).
+        repository (AccountRepository): The replicated data; gets a ReplicationLog if it has none.
+        heartbeat (float): Seconds of inactivity after which an RH line is sent.
+    """
+
+    def __init__(self, host: str, port: int, repository: AccountRepository, heartbeat: float = 1.0):
+        self.host = host
+        self.port = port
+        self.repository = repository
+        self.heartbeat = heartbeat
+        if repository.replication is None:
+            repository.replication = ReplicationLog()
+        self.log = repository.replication
+        self._socket = None
+        self._stop = threading.Event()
+
+    def start(self):
+        """Binds the listener and accepts followers in a background thread."""
+        self._socket = socket.create_server((self.host, self.port))
+        self.port = self._socket.getsockname()[1]
+        threading.Thread(target=self._accept_loop, name="replication", daemon=True).start()
+        logger.info("[SERVER] Replication listener on %s:%s", self.host, self.port)
+
+    def _accept_loop(self):
+        while not self._stop.is_set():
+            try:
+                conn, addr = self._socket.accept()
+            except OSError:
+                return
+            threading.Thread(target=self._serve, args=(conn, f"{addr[0]}:{addr[1]}"), daemon=True).start()
+
+    def _serve(self, conn: socket.socket, follower: str):
+        try:
+            with conn, conn.makefile("r", encoding="utf-8") as reader:
+                parts = reader.readline().split()
+                if len(parts) != 3 or parts[0] != "RF" or not parts[2].isdigit():
+                    conn.sendall(b"ER Invalid replication request\n")
+                    return
+                epoch, seq = parts[1], int(parts[2])
+                changes = self.log.changes_after(seq) if epoch == self.log.epoch else None
+                if changes is None:
+                    seq = self._send_state(conn)
+                logger.info("[INFO] Follower %s connected (from change %d)", follower, seq)
+                while not self._stop.is_set():
+                    changes = self.log.changes_after(seq, self.heartbeat)
+                    if changes is None:
+                        seq = self._send_state(conn)  # Fell behind the backlog
+                    elif changes:
+                        conn.sendall("".join(f"RC {s} {';'.join(lines)}\n" for s, lines in changes).encode("utf-8"))
+                        seq = changes[-1][0]
+                    else:
+                        conn.sendall(f"RH {self.log.seq}\n".encode("utf-8"))
+                    self.log.followers[follower] = seq
+        except OSError as e:
+            logger.info("[DISCONNECT] Follower %s disconnected: %s", follower, e)
+        finally:
+            self.log.followers.pop(follower, None)
+
+    def _send_state(self, conn: socket.socket) -> int:
+        seq, records = self.repository.replication_state()
+        header = f"RS {self.log.epoch} {seq} {len(records)}\n"
+        conn.sendall((header + "".join(f"{record}\n" for record in records)).encode("utf-8"))
+        return seq
+
+    def stop(self):
+        self._stop.set()
+        if self._socket is not None:
+            self._socket.close()
+
+
+class ReplicationFollower:
+    """
+    Follower side: keeps a connection to the leader, applies its changes to
+    the local repository and reconnects (resuming where it stopped) when the
+    connection breaks.
+
+    Attributes:
+        leader (tuple): (ip, port) of the leader's replication listener.
+        repository (AccountRepository): The local copy of the data.
+        retry_interval (float): Seconds between reconnect attempts.
+        timeout (float): Seconds without any line from the leader before reconnecting.
+        epoch (str): Leader run the local data belongs to ("-" = none yet).
+        applied_seq (int): Last change applied locally.
+        leader_seq (int): Latest change the leader reported.
+        connected (bool): Whether the stream is currently up.
+        position_file (Path): "<epoch> <seq>" of the local data (next to the repository's
+            snapshot). It may lag behind the data, never lead it: changes carry resulting
+            balances, so applying a few of them twice after a restart is harmless.
+    """
+
+    def __init__(self, leader: tuple, repository: AccountRepository, retry_interval: float = 1.0,
+                 timeout: float = 5.0):
+        self.leader = leader
+        self.repository = repository
+        self.retry_interval = retry_interval
+        self.timeout = timeout
+        self.position_file = repository.data_file.with_suffix(".replica")
+        self.epoch, self.applied_seq = self._load_position()
+        self.leader_seq = self.applied_seq
+        self.connected = False
+        self._last_contact = time.monotonic()
+        self._socket = None
+        self._stop = threading.Event()
+        self._saved = (self.epoch, self.applied_seq)
+        self._next_save = 0.0
+        self._position_lock = threading.Lock()
+        self._position_valid = True  # False once the local data left the leader's history (promotion)
+
+    def _load_position(self) -> tuple:
+        try:
+            epoch, seq = self.position_file.read_text(encoding="utf-8").split()
+            return epoch, int(seq)
+        except (OSError, ValueError):
+            return "-", 0  # No (readable) position: the leader sends the full state
+
+    def _save_position(self, force: bool = False):
+        """Writes (epoch, applied_seq) once the changes up to it are on disk (at most every POSITION_SAVE_INTERVAL)."""
+        if not force and time.monotonic() < self._next_save:
+            return
+        with self._position_lock:
+            position = (self.epoch, self.applied_seq)
+            if not self._position_valid or position == self._saved:
+                return
+            tmp_file = self.position_file.with_suffix(".replica.tmp")
+            try:
+                self.repository.wal.sync()  # The position must never be ahead of the data on disk
+                tmp_file.write_text(f"{position[0]} {position[1]}\n", encoding="utf-8")
+                os.replace(tmp_file, self.position_file)
+                self._saved = position
+            except (OSError, ValueError) as e:
+                logger.warning("[WARN] Could not save the replication position: %s", e)
+            self._next_save = time.monotonic() + POSITION_SAVE_INTERVAL
+
+    def lag(self) -> tuple:
+        """(changes the leader has that are not applied here, seconds since the last line from the leader)."""
+        return self.leader_seq - self.applied_seq, time.monotonic() - self._last_contact
+
+    def start(self):
+        threading.Thread(target=self._run, name="replica", daemon=True).start()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self._follow()
+            except (OSError, ValueError) as e:
+                if not self._stop.is_set():
+                    logger.warning("[WARN] Replication from %s:%s interrupted: %s", *self.leader, e)
+            self.connected = False
+            self._stop.wait(self.retry_interval)
+
+    def _follow(self):
+        with socket.create_connection(self.leader, timeout=self.timeout) as sock:
+            self._socket = sock
+            sock.sendall(f"RF {self.epoch} {self.applied_seq}\n".encode("utf-8"))
+            with sock.makefile("r", encoding="utf-8") as reader:
+                for line in reader:
+                    self._last_contact = time.monotonic()
+                    self._handle(line.rstrip("\n"), reader)
+                    self.connected = True  # In sync with the leader's stream
+        raise ConnectionError("Leader closed the connection")
+
+    def _handle(self, line: str, reader):
+        parts = line.split(" ", 2)
+        if parts[0] == "RC" and len(parts) == 3:
+            seq = int(parts[1])
+            if seq != self.applied_seq + 1:
+                raise ValueError(f"Change {seq} out of order (applied {self.applied_seq})")
+            self.repository.apply_replicated(parts[2].split(";"))
+            self.applied_seq = seq
+            self.leader_seq = max(self.leader_seq, seq)
+            self._save_position()
+        elif parts[0] == "RH" and len(parts) == 2:
+            self.leader_seq = int(parts[1])
+            self._save_position(force=True)  # Idle: nothing newer will follow soon
+        elif parts[0] == "RS" and len(parts) == 3:
+            seq, count = (int(value) for value in parts[2].split())
+            records = [reader.readline().rstrip("\n") for _ in range(count)]
+            if not all(records):  # EOF in the middle of the transfer
+                raise ValueError("Incomplete state transfer")
+            self.repository.load_replica(records)
+            self.epoch, self.applied_seq, self.leader_seq = parts[1], seq, seq
+            self._save_position(force=True)
+            logger.info("[INFO] Loaded the leader's state: %d records as of change %d", count, seq)
+        else:
+            raise ValueError(f"Invalid replication line: {line[:40]}")
+
+    def stop(self, keep_position: bool = True):
+        """
+        Stops following; the local data stays as it is.
+
+        Args:
+            keep_position (bool): Save the position to resume from after a restart.
+                False on promotion: the data will take changes the old leader never had,
+                so following again must start from the full state.
+        """
+        self._stop.set()
+        if self._socket is not None:
+            try:
+                self._socket.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+        if keep_position:
+            self._save_position(force=True)
+            return
+        with self._position_lock:
+            self._position_valid = False
+            try:
+                os.remove(self.position_file)
+            except FileNotFoundError:
+                pass
@@ -1,6 +1,14 @@
 import socket
+import logging
 import threading
 from core.bank_service import BankService
+from core.framing import LineReader, encode_responses
+from core.binary_protocol import HELLO, HELLO_REJECTED, FrameReader, encode_response, execute_frames
+from shared.logger import REQUEST_LOGGER
+from core.metrics import METRICS
+
+logger = logging.getLogger(__name__)
+request_log = logging.getLogger(REQUEST_LOGGER)
 
 
 class BankNode:
@@ -18,13 +26,21 @@ class BankNode:
         ip (str): The IP address to bind to.
         port (int): The TCP port to listen on.
         service (BankService): The business logic controller.
+        backlog (int): Size of the kernel accept queue.
+        reuse_port (bool): Share the port with other processes (SO_REUSEPORT, sharded mode).
+        ready (threading.Event): Set once the server is listening.
     """
 
-    def __init__(self, ip: str, port: int):
+    def __init__(self, ip: str, port: int, service: BankService = None, backlog: int = 128,
+                 reuse_port: bool = False):
         self.ip = ip
         self.port = port
         self.running = True
-        self.service = BankService()
+        self.service = service or BankService()
+        self.backlog = backlog
+        self.reuse_port = reuse_port
+        self.ready = threading.Event()
+        self._server_socket = None
 
     def start_server(self):
         """
@@ -36,16 +52,27 @@ class BankNode:
 
         # Allow reusing the address/port immediately after restart
         server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        if self.reuse_port:
+            # Several shard processes accept on the same port; the kernel balances connections
+            server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        self._server_socket = server_socket
 
         try:
             server_socket.bind((self.ip, self.port))
-            server_socket.listen(5)  # Backlog of 5 connections
-            print(f"[SERVER] Bank Node running on {self.ip}:{self.port}")
-            print(f"[SERVER] Ready to accept P2P connections via PuTTY...")
+            server_socket.listen(self.backlog)
+            self.port = server_socket.getsockname()[1]  # Resolves port 0 to the real port
+            logger.info("[SERVER] Bank Node running on %s:%s", self.ip, self.port)
+            logger.info("[SERVER] Ready to accept P2P connections via PuTTY...")
+            self.ready.set()
 
             while self.running:
                 # Accept new connection (Blocking call)
-                client_socket, client_address = server_socket.accept()
+                try:
+                    client_socket, client_address = server_socket.accept()
+                except OSError:
+                    if not self.running:
+                        break  # Socket closed by stop()
+                    raise
 
                 # --- THREADING (Assignment 16.3) ---
                 # Handle each client in a separate thread
@@ -55,54 +82,103 @@ class BankNode:
                 )
                 client_thread.start()
 
-                # Log active thread count
-                print(f"[INFO] Active connections: {threading.active_count() - 1}")
-
         except Exception as e:
-            print(f"[CRITICAL] Server failed: {e}")
+            logger.critical("[CRITICAL] Server failed: %s", e)
         finally:
             server_socket.close()
 
+    def stop(self):
+        """Stops the accept loop from any thread."""
+        self.running = False
+        if self._server_socket is not None:
+            try:
+                self._server_socket.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            self._server_socket.close()
+
     def handle_client(self, conn: socket.socket, addr):
         """
         Handles the lifecycle of a single client connection.
-        Receives data, decodes it, executes commands via Service, and sends responses.
+        Receives data, splits it into lines, executes commands via Service, and sends responses.
+
+        Clients may pipeline several commands in one packet or split a command
+        across packets; every complete line is executed in order and all
+        responses for one received chunk are sent back with a single sendall().
+
+        A client (normally another Bank Node) that sends "BP 2" and waits for
+        the same answer switches the connection to the binary protocol
+        (length-prefixed frames, see core.binary_protocol). Text clients
+        never see a difference. A hello followed by more data in the same
+        read is refused (HELLO_REJECTED) and the connection stays text.
 
         Args:
             conn (socket): The connected client socket object.
             addr (tuple): The (IP, Port) of the client.
         """
-        print(f"[CONN] {addr[0]} connected.")
+        request_log.info("[CONN] %s connected.", addr[0])
+        active = METRICS.gauge("bank_active_connections")
+        active.inc()
 
         # Set timeout (manual testing friendly)
         conn.settimeout(300)
+        reader = LineReader()
+        frames = None  # FrameReader once the client switched to the binary protocol
 
         try:
             while True:
                 # Receive data
-                data = conn.recv(1024)
+                data = conn.recv(4096)
                 if not data:
                     break  # Connection closed by client
 
-                # Decode command (UTF-8)
-                command_str = data.decode("utf-8").strip()
-                if not command_str:
+                if frames is not None:
+                    try:
+                        payloads = frames.feed(data)
+                    except ValueError as e:
+                        conn.sendall(encode_response(None, f"ER {e}"))
+                        break
+                    if payloads:
+                        conn.sendall(execute_frames(self.service, payloads, addr[0]))
                     continue
 
-                print(f"[RECV] {command_str}")
+                try:
+                    lines = reader.feed(data)
+                except ValueError as e:
+                    conn.sendall(encode_responses([f"ER {e}"]))
+                    break
+
+                responses = []
+                for index, line in enumerate(lines):
+                    command_str = line.strip()
+                    if not command_str:
+                        continue
+
+                    request_log.info("[RECV] %s", command_str)
+
+                    if command_str == HELLO:
+                        if reader.pending or any(rest.strip() for rest in lines[index + 1:]):
+                            responses.append(HELLO_REJECTED)
+                            continue
+                        # Binary from the next packet on (the client waits for this answer)
+                        responses.append(HELLO)
+                        frames = FrameReader()
+                        break
 
-                # --- PROCESS COMMAND ---
-                response = self.service.execute_command(command_str, addr[0])
+                    # --- PROCESS COMMAND ---
+                    responses.append(self.service.execute_command(command_str, addr[0]))
 
-                # Send response
-                conn.sendall(f"{response}\r\n".encode("utf-8"))
+                # Send all responses of this chunk at once
+                if responses:
+                    conn.sendall(encode_responses(responses))
 
         except socket.timeout:
-            print(f"[TIMEOUT] Client {addr[0]} was idle for too long.")
+            logger.info("[TIMEOUT] Client %s was idle for too long.", addr[0])
         except ConnectionResetError:
-            print(f"[DISCONNECT] Client {addr[0]} forcibly closed connection.")
+            logger.info("[DISCONNECT] Client %s forcibly closed connection.", addr[0])
         except Exception as e:
-            print(f"[ERROR] Handling client {addr[0]}: {e}")
+            logger.error("[ERROR] Handling client %s: %s", addr[0], e)
         finally:
+            active.dec()
             conn.close()
-            print(f"[CLOSED] Connection with {addr[0]} closed.")
\ No newline at end of file
+            request_log.info("[CLOSED] Connection with %s closed.", addr[0])
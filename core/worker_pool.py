@@ -0,0 +1,138 @@
+import time
+import logging
+import threading
+from collections import deque
+from typing import NamedTuple
+from core.metrics import METRICS, MetricsRegistry
+
+logger = logging.getLogger(__name__)
+
+# What submit() does when the queue is full
+OVERLOAD_POLICIES = ("reject", "block", "shed-oldest")
+
+
+class _Job(NamedTuple):
+    fn: object
+    args: tuple
+    on_reject: object
+    enqueued: float
+
+
+class WorkerPool:
+    """
+    Fixed number of worker threads fed by a bounded job queue.
+
+    The number of threads never grows with the load. When the queue is full,
+    the overload policy decides what happens:
+        - reject:      the new job is refused (its on_reject callback runs, e.g. "ER Busy")
+        - block:       the submitting thread waits for a free slot (backpressure)
+        - shed-oldest: the oldest queued job is dropped (its on_reject runs) to make room
+
+    Reports bank_worker_queue_depth, bank_worker_busy, bank_worker_queue_wait_seconds
+    and bank_worker_overload_total{policy} to the metrics registry.
+
+    Attributes:
+        workers (int): Number of worker threads.
+        queue_size (int): Maximum number of queued (not yet running) jobs.
+        overload (str): One of OVERLOAD_POLICIES.
+    """
+
+    def __init__(self, workers: int = 16, queue_size: int = 1024, overload: str = "reject",
+                 metrics: MetricsRegistry = None, name: str = "bank-worker"):
+        if overload not in OVERLOAD_POLICIES:
+            raise ValueError(f"Unknown overload policy: {overload}")
+        if workers <= 0 or queue_size <= 0:
+            raise ValueError("Workers and queue size must be positive")
+        self.workers = workers
+        self.queue_size = queue_size
+        self.overload = overload
+
+        metrics = metrics or METRICS
+        self._depth = metrics.gauge("bank_worker_queue_depth")
+        self._busy = metrics.gauge("bank_worker_busy")
+        self._wait = metrics.histogram("bank_worker_queue_wait_seconds")
+        self._overloaded = metrics.counter("bank_worker_overload_total", policy=overload)
+
+        self._jobs = deque()
+        self._lock = threading.Lock()
+        self._not_empty = threading.Condition(self._lock)
+        self._not_full = threading.Condition(self._lock)
+        self._closed = False
+        self._threads = [threading.Thread(target=self._run, name=f"{name}-{i}", daemon=True)
+                         for i in range(workers)]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, fn, *args, on_reject=None) -> bool:
+        """
+        Queues fn(*args) for a worker.
+
+        Args:
+            fn (callable): The job.
+            *args: Arguments of the job.
+            on_reject (callable): Called with the same *args if the job is refused
+                or later shed (runs on the submitting thread).
+
+        Returns:
+            bool: False if the job was refused (policy 'reject' or pool shut down).
+        """
+        shed = None
+        with self._lock:
+            while not self._closed and len(self._jobs) >= self.queue_size:
+                if self.overload == "shed-oldest":
+                    shed = self._jobs.popleft()
+                    break
+                if self.overload == "reject":
+                    break
+                self._not_full.wait()
+
+            accepted = not self._closed and len(self._jobs) < self.queue_size
+            if accepted:
+                self._jobs.append(_Job(fn, args, on_reject, time.perf_counter()))
+                self._depth.set(len(self._jobs))
+                self._not_empty.notify()
+
+        if shed is not None:
+            self._overloaded.inc()
+            if shed.on_reject is not None:
+                shed.on_reject(*shed.args)
+        if not accepted:
+            self._overloaded.inc()
+            if on_reject is not None:
+                on_reject(*args)
+        return accepted
+
+    @property
+    def depth(self) -> int:
+        """Number of queued jobs that are not running yet."""
+        return len(self._jobs)
+
+    def _run(self):
+        while True:
+            with self._lock:
+                while not self._jobs and not self._closed:
+                    self._not_empty.wait()
+                if not self._jobs:
+                    return  # Closed and drained
+                job = self._jobs.popleft()
+                self._depth.set(len(self._jobs))
+                self._not_full.notify()
+
+            self._wait.observe(time.perf_counter() - job.enqueued)
+            self._busy.inc()
+            try:
+                job.fn(*job.args)
+            except Exception as e:
+                logger.error("[ERROR] Worker job failed: %s", e)
+            finally:
+                self._busy.dec()
+
+    def shutdown(self, wait: bool = True):
+        """Stops accepting jobs; workers finish the queued ones and exit."""
+        with self._lock:
+            self._closed = True
+            self._not_empty.notify_all()
+            self._not_full.notify_all()
+        if wait:
+            for thread in self._threads:
+                thread.join(5)
@@ -1,6 +1,21 @@
 import argparse
+import logging
 import sys
 from core.server import BankNode
+from core.async_server import AsyncBankNode
+from core.pool_server import PooledBankNode
+from core.worker_pool import OVERLOAD_POLICIES
+from core.bank_service import BankService, PEER_PORT
+from core.peer_pool import PeerConnectionPool, parse_endpoint
+from core.peer_registry import PeerRegistry
+from core.circuit_breaker import CircuitBreakerRegistry
+from core.audit import AuditLog
+from core.cluster import (ShardChannel, ShardRouter, check_unsharded_data, run_cluster, shard_data_file,
+                          shard_socket_path)
+from shared.logger import setup_logging
+from core.metrics import MetricsServer
+from core.replication import REPLICATION_PORT, ReplicationFollower, ReplicationServer
+from shared.persistence.repository import AccountRepository
 
 
 # --- CODE REUSE NOTE ---
@@ -16,6 +31,37 @@ def validate_args():
         argparse.Namespace: An object containing the parsed arguments:
             - port (int): The TCP port to listen on.
             - ip (str): The IP address to bind to.
+            - data_file (str): Path of the JSON snapshot.
+            - fsync_every (int): WAL records per forced disk sync.
+            - fsync_interval (float): Max seconds between forced disk syncs.
+            - snapshot_every (int): WAL records between snapshots.
+            - store (str): In-memory storage backend ('dict' or 'array').
+            - snapshot_format (str): 'json' or 'binary' (memory-mapped, lazy loading).
+            - group_commit (bool): Coalesce concurrent log writes into shared fsyncs.
+            - group_commit_latency (float): Max milliseconds a write waits for its batch.
+            - group_commit_batch (int): Max records per group commit batch.
+            - history_size (int): Records kept in the in-memory audit history.
+            - log_level (str): Minimum level of log messages.
+            - hot_path_sample (float): Fraction of per-request log lines to keep.
+            - engine (str): Network engine ('threaded', 'asyncio' or 'pool').
+            - backlog (int): Size of the kernel accept queue.
+            - max_connections (int): Connection cap of the asyncio and pool engines.
+            - workers (int): Worker threads of the pool engine.
+            - queue_size (int): Bounded request queue of the pool engine.
+            - overload (str): What the pool engine does when the queue is full.
+            - metrics_port (int): Port of the plain-text metrics listener (None = disabled).
+            - shards (int): Number of shard processes sharing the port (1 = single process).
+            - peer (list): Known peer banks ("ip" or "ip:port") for NA/NN.
+            - fanout_timeout (float): Seconds NA/NN wait for the peers' answers.
+            - peer_refresh (float): Seconds between background checks of known peers.
+            - peer_connect_timeout (float): Connect timeout of forwarded requests.
+            - peer_read_timeout (float): Response timeout of forwarded requests.
+            - circuit_threshold (int): Consecutive failures that mark a peer as down.
+            - circuit_reset (float): Seconds before a down peer gets a trial request.
+            - peer_protocol (str): 'binary' (negotiated, text fallback) or 'text' for forwarding.
+            - transfer_retry (float): Seconds between retries of transfers to unreachable banks.
+            - replication_port (int): Port that streams changes to followers (None = disabled).
+            - follow (str): "ip[:port]" of a leader's replication port; makes this node a read-only follower.
     """
     parser = argparse.ArgumentParser(description="P2P Banking Node - Distributed System Project")
 
@@ -34,29 +80,359 @@ def validate_args():
         help="The IP address to bind the server to (Default: 0.0.0.0 for all interfaces)."
     )
 
+    # --- Network engine ---
+    parser.add_argument(
+        "--engine",
+        choices=["threaded", "asyncio", "pool"],
+        default="threaded",
+        help="Server engine: one thread per connection, a single asyncio event loop, "
+             "or a fixed worker pool with a bounded request queue (Default: threaded)."
+    )
+
+    parser.add_argument(
+        "--backlog",
+        type=int,
+        default=128,
+        help="Size of the kernel accept queue for pending connections (Default: 128)."
+    )
+
+    parser.add_argument(
+        "--max-connections",
+        type=int,
+        default=10000,
+        help="Maximum simultaneous clients for the asyncio and pool engines (Default: 10000)."
+    )
+
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=16,
+        help="Worker threads executing commands in the pool engine (Default: 16)."
+    )
+
+    parser.add_argument(
+        "--queue-size",
+        type=int,
+        default=1024,
+        help="Maximum queued requests of the pool engine before the overload policy applies (Default: 1024)."
+    )
+
+    parser.add_argument(
+        "--overload",
+        choices=list(OVERLOAD_POLICIES),
+        default="reject",
+        help="Pool engine behaviour on a full queue: answer ER Busy, block reading, "
+             "or drop the oldest queued request (Default: reject)."
+    )
+
+    parser.add_argument(
+        "--metrics-port",
+        type=int,
+        default=None,
+        help="Serve Prometheus-style metrics on http://<ip>:<port>/metrics (Default: disabled)."
+    )
+
+    parser.add_argument(
+        "--shards",
+        type=int,
+        default=1,
+        help="Run N worker processes on the same port, accounts partitioned by number %% N (Default: 1)."
+    )
+
+    # --- P2P network ---
+    parser.add_argument(
+        "--peer",
+        action="append",
+        default=[],
+        metavar="IP[:PORT]",
+        help="A known peer bank, queried by the network aggregate commands NA/NN (repeatable, default port 65525)."
+    )
+
+    parser.add_argument(
+        "--fanout-timeout",
+        type=float,
+        default=2.0,
+        help="Seconds NA/NN wait for the peers' answers; slower peers are reported as missing (Default: 2)."
+    )
+
+    parser.add_argument(
+        "--peer-refresh",
+        type=float,
+        default=30.0,
+        help="Seconds between background health checks / port rescans of known peer banks (Default: 30)."
+    )
+
+    parser.add_argument(
+        "--peer-connect-timeout",
+        type=float,
+        default=1.0,
+        help="Seconds to wait for a TCP connection to a peer bank (Default: 1)."
+    )
+
+    parser.add_argument(
+        "--peer-read-timeout",
+        type=float,
+        default=5.0,
+        help="Seconds to wait for a peer bank's response to a forwarded command (Default: 5)."
+    )
+
+    parser.add_argument(
+        "--circuit-threshold",
+        type=int,
+        default=3,
+        help="Consecutive failed requests after which a peer is considered down and "
+             "requests to it fail immediately (Default: 3)."
+    )
+
+    parser.add_argument(
+        "--circuit-reset",
+        type=float,
+        default=10.0,
+        help="Seconds before a peer that is down gets a trial request (Default: 10). "
+             "It is also probed in the background every 2 seconds."
+    )
+
+    parser.add_argument(
+        "--peer-protocol",
+        choices=["binary", "text"],
+        default="text",
+        help="Protocol for forwarded commands: 'binary' ('BP 2', accepted by every engine) is negotiated per "
+             "connection and falls back to text for nodes that do not support it (Default: text)."
+    )
+
+    parser.add_argument(
+        "--transfer-retry",
+        type=float,
+        default=5.0,
+        help="Seconds between retries of transfers whose destination bank was unreachable (Default: 5)."
+    )
+
+    # --- Replication ---
+    parser.add_argument(
+        "--replication-port",
+        type=int,
+        default=None,
+        help=f"Stream every change to followers connecting to this port, e.g. {REPLICATION_PORT} (Default: disabled)."
+    )
+
+    parser.add_argument(
+        "--follow",
+        default=None,
+        help=f"Run as a read-only follower of the leader at IP[:PORT] (its --replication-port, "
+             f"default port {REPLICATION_PORT}). Promote with RP (Default: disabled)."
+    )
+
+    # --- Persistence tuning (Write-Ahead Log) ---
+    parser.add_argument(
+        "--data-file",
+        type=str,
+        default="data/accounts.json",
+        help="Path of the account snapshot file (Default: data/accounts.json)."
+    )
+
+    parser.add_argument(
+        "--fsync-every",
+        type=int,
+        default=1,
+        help="Force the write-ahead log to disk after N records (Default: 1, 0 = leave it to the OS)."
+    )
+
+    parser.add_argument(
+        "--fsync-interval",
+        type=float,
+        default=0.0,
+        help="Force the write-ahead log to disk at least every N seconds (Default: 0 = disabled)."
+    )
+
+    parser.add_argument(
+        "--snapshot-every",
+        type=int,
+        default=10000,
+        help="Compact the write-ahead log into a new snapshot after N records (Default: 10000)."
+    )
+
+    parser.add_argument(
+        "--group-commit",
+        action="store_true",
+        help="Write and fsync log records of concurrent requests together (one durable flush per batch)."
+    )
+
+    parser.add_argument(
+        "--group-commit-latency",
+        type=float,
+        default=1.0,
+        help="Max milliseconds a write waits for others to join its batch (Default: 1)."
+    )
+
+    parser.add_argument(
+        "--group-commit-batch",
+        type=int,
+        default=1024,
+        help="Max records per group commit batch (Default: 1024)."
+    )
+
+    parser.add_argument(
+        "--store",
+        choices=["dict", "array"],
+        default="dict",
+        help="In-memory account storage: dict of objects or compact preallocated array (Default: dict)."
+    )
+
+    parser.add_argument(
+        "--snapshot-format",
+        choices=["json", "binary"],
+        default="json",
+        help="Snapshot file format. 'binary' writes data/accounts.bin, which is memory-mapped at startup "
+             "and loaded lazily (Default: json)."
+    )
+
+    parser.add_argument(
+        "--history-size",
+        type=int,
+        default=10000,
+        help="Transactions kept in the in-memory audit history; older ones go to data/audit.log (Default: 10000)."
+    )
+
+    # --- Logging ---
+    parser.add_argument(
+        "--log-level",
+        choices=["DEBUG", "INFO", "WARNING", "ERROR"],
+        default="INFO",
+        help="Minimum level of log messages (Default: INFO)."
+    )
+
+    parser.add_argument(
+        "--hot-path-sample",
+        type=float,
+        default=1.0,
+        help="Fraction of per-request [RECV]/[LOG] lines to write: 1 = all, 0.01 = every 100th, 0 = none (Default: 1)."
+    )
+
     return parser.parse_args()
 
 
+def run_node(args, shard_index: int = None):
+    """
+    Builds the persistence layer, service and Bank Node from the parsed
+    arguments and serves until the node is stopped.
+
+    Args:
+        args (argparse.Namespace): The parsed command line.
+        shard_index (int): Index of this process in sharded mode (None = single process).
+    """
+    # (Re)installed per process: a forked shard does not inherit the writer thread
+    setup_logging(args.log_level, args.hot_path_sample)
+
+    sharded = shard_index is not None
+    data_file = shard_data_file(args.data_file, shard_index) if sharded else args.data_file
+
+    # Initialize the persistence layer, service and Bank Node with provided configuration
+    repository = AccountRepository(
+        data_file,
+        fsync_every=args.fsync_every,
+        fsync_interval=args.fsync_interval,
+        snapshot_every=args.snapshot_every,
+        store=args.store,
+        snapshot_format=args.snapshot_format,
+        group_commit=args.group_commit,
+        group_commit_batch=args.group_commit_batch,
+        group_commit_latency=args.group_commit_latency / 1000,
+        shard_index=shard_index or 0,
+        shard_count=args.shards if sharded else 1,
+    )
+    audit_log = AuditLog(args.history_size, spill_file=repository.data_file.parent / "audit.log")
+    peers = [parse_endpoint(peer, PEER_PORT) for peer in args.peer]
+    # Routing table of peer banks (which port of 65525-65535 each bank IP listens on)
+    peer_registry = PeerRegistry(refresh_interval=args.peer_refresh)
+    peer_registry.own_endpoints.add((args.ip, args.port))
+    peer_registry.start()
+    # Fail fast on peers that are down instead of waiting for their timeouts
+    breakers = CircuitBreakerRegistry(args.circuit_threshold, args.circuit_reset, probe=peer_registry.check)
+    breakers.start()
+    peer_pool = PeerConnectionPool(timeout=args.peer_read_timeout, connect_timeout=args.peer_connect_timeout,
+                                   binary=args.peer_protocol == "binary")
+    service = BankService(repository, peer_pool=peer_pool, audit_log=audit_log, peers=peers,
+                          fanout_timeout=args.fanout_timeout, peer_registry=peer_registry, breakers=breakers)
+    if args.ip not in service.my_ips:
+        service.my_ips.append(args.ip)  # Bound to one specific address (e.g. 127.0.0.2 for local tests)
+
+    channel = None
+    if sharded:
+        socket_paths = [shard_socket_path(args.data_file, i) for i in range(args.shards)]
+        ShardRouter(shard_index, args.shards, socket_paths).attach(service)
+        channel = ShardChannel(socket_paths[shard_index], service)
+        channel.start()
+
+    if args.engine == "asyncio":
+        node = AsyncBankNode(args.ip, args.port, service, backlog=args.backlog,
+                             max_connections=args.max_connections, reuse_port=sharded)
+    elif args.engine == "pool":
+        node = PooledBankNode(args.ip, args.port, service, backlog=args.backlog,
+                              max_connections=args.max_connections, workers=args.workers,
+                              queue_size=args.queue_size, overload=args.overload, reuse_port=sharded)
+    else:
+        node = BankNode(args.ip, args.port, service, backlog=args.backlog, reuse_port=sharded)
+
+    # Replication: with sharding, shard i of a follower follows shard i of the leader (port + i)
+    replication = follower = None
+    if args.replication_port is not None:
+        replication = ReplicationServer(args.ip, args.replication_port + (shard_index or 0), repository)
+        replication.start()
+    if args.follow:
+        leader_ip, leader_port = parse_endpoint(args.follow, REPLICATION_PORT)
+        follower = ReplicationFollower((leader_ip, leader_port + (shard_index or 0)), repository)
+        service.replica = follower
+        service.read_only = True
+        follower.start()
+
+    # Finish transfers interrupted by a restart or an unreachable bank
+    service.start_transfer_recovery(args.transfer_retry)
+
+    if args.metrics_port is not None:
+        # One listener per shard: metrics-port, metrics-port + 1, ...
+        MetricsServer(args.ip, args.metrics_port + (shard_index or 0)).start()
+
+    try:
+        # Start the TCP Server (Blocking call)
+        node.start_server()
+    except KeyboardInterrupt:
+        logging.info("[STOP] Server stopped manually by user.")
+    finally:
+        # Persist everything that is still buffered
+        peer_registry.stop()
+        breakers.stop()
+        service.stop_transfer_recovery()
+        if follower is not None:
+            follower.stop()
+        if replication is not None:
+            replication.stop()
+        if channel is not None:
+            channel.stop()
+        audit_log.flush()
+        repository.close()
+        logging.shutdown()
+
+
 if __name__ == "__main__":
     """
     Main Application Entry Point.
 
     1. Parses CLI arguments.
-    2. Initializes the BankNode (Network Layer).
+    2. Initializes the BankNode (Network Layer), or one per shard process.
     3. Starts the server loop.
     4. Handles graceful shutdown on KeyboardInterrupt (Ctrl+C).
     """
     args = validate_args()
 
-    # Initialize the Bank Node with provided configuration
-    node = BankNode(args.ip, args.port)
-
     try:
-        # Start the TCP Server (Blocking call)
-        node.start_server()
+        if args.shards > 1:
+            setup_logging(args.log_level, args.hot_path_sample)
+            check_unsharded_data(args.data_file)
+            run_cluster(args.shards, run_node, args)
+        else:
+            run_node(args)
     except KeyboardInterrupt:
-        print("\n[STOP] Server stopped manually by user.")
         sys.exit(0)
     except Exception as e:
-        print(f"\n[CRITICAL] Unexpected error: {e}")
-        sys.exit(1)
\ No newline at end of file
+        logging.critical("[CRITICAL] Unexpected error: %s", e)
+        sys.exit(1)
@@ -0,0 +1,148 @@
+import sys
+import queue
+import logging
+import itertools
+import threading
+import time
+
+# Per-request lines ([RECV], [LOG], [CONN], ...) go through this logger, so
+# they can be sampled or switched off without touching the other messages.
+REQUEST_LOGGER = "bank.request"
+
+_STOP = object()
+
+
+class BackgroundBatchHandler(logging.Handler):
+    """
+    Logging handler that never blocks the caller on console I/O.
+
+    emit() only puts the record on an in-memory queue. A background writer
+    thread drains the queue, formats records in batches and writes each batch
+    with a single write() + flush(), so request threads never wait for the
+    stdout lock. The queue is bounded: when the output cannot keep up,
+    records are dropped and counted instead of piling up in memory, and the
+    writer reports the number of dropped records with its next batch.
+
+    Attributes:
+        stream: Output stream (stdout by default).
+        max_batch (int): Maximum records written per flush.
+        flush_interval (float): Max seconds a record may wait for more records to batch with.
+        max_queue (int): Records that may wait for the writer before new ones are dropped.
+        dropped (int): Records dropped so far because the queue was full.
+    """
+
+    def __init__(self, stream=None, max_batch: int = 512, flush_interval: float = 0.05,
+                 max_queue: int = 10000):
+        super().__init__()
+        self.stream = stream or sys.stdout
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval
+        self.max_queue = max_queue
+        self.dropped = 0
+        self._reported = 0
+        self._dropped_lock = threading.Lock()
+        self._queue = queue.Queue(max_queue)
+        self._thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+        self._thread.start()
+
+    def handle(self, record) -> bool:
+        # No handler lock needed: the queue is thread-safe and emit() does no I/O
+        rv = self.filter(record)
+        if rv:
+            self.emit(record)
+        return rv
+
+    def emit(self, record):
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            with self._dropped_lock:
+                self.dropped += 1
+
+    def _run(self):
+        while True:
+            record = self._queue.get()
+            if record is _STOP:
+                return
+            batch = [record]
+            deadline = time.monotonic() + self.flush_interval
+            stop = False
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                try:
+                    record = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if record is _STOP:
+                    stop = True
+                    break
+                batch.append(record)
+            self._write(batch)
+            if stop:
+                return
+
+    def _write(self, batch: list):
+        lines = []
+        dropped = self.dropped - self._reported
+        if dropped:
+            self._reported += dropped
+            lines.append(f"[WARN] {dropped} log messages dropped (output too slow)")
+        for record in batch:
+            try:
+                lines.append(self.format(record))
+            except Exception:
+                self.handleError(record)
+        try:
+            self.stream.write("\n".join(lines) + "\n")
+            self.stream.flush()
+        except Exception:
+            pass
+
+    def close(self):
+        """Drains the queue and stops the writer thread."""
+        if self._thread.is_alive():
+            self._queue.put(_STOP)  # Blocks until there is room: the stop marker is never dropped
+            self._thread.join(5)
+        super().close()
+
+
+class SamplingFilter(logging.Filter):
+    """Lets only every N-th record through (N derived from the sample rate)."""
+
+    def __init__(self, rate: float):
+        super().__init__()
+        self.every = max(1, round(1 / rate))
+        self._counter = itertools.count()
+
+    def filter(self, record) -> bool:
+        return next(self._counter) % self.every == 0
+
+
+def setup_logging(level: str = "INFO", hot_path_sample: float = 1.0, stream=None) -> BackgroundBatchHandler:
+    """
+    Configures the root logger with a background, batching console handler.
+
+    Args:
+        level (str): Minimum level of messages that are written.
+        hot_path_sample (float): Fraction of per-request lines to keep
+            (1.0 = all, 0.01 = every 100th, 0 = suppress them entirely).
+        stream: Output stream (stdout by default).
+
+    Returns:
+        BackgroundBatchHandler: The installed handler.
+    """
+    handler = BackgroundBatchHandler(stream)
+    handler.setFormatter(logging.Formatter("%(asctime)s %(message)s", "%H:%M:%S"))
+
+    root = logging.getLogger()
+    for old in list(root.handlers):
+        root.removeHandler(old)
+    root.addHandler(handler)
+    root.setLevel(level.upper())
+
+    request_logger = logging.getLogger(REQUEST_LOGGER)
+    request_logger.filters.clear()
+    request_logger.disabled = hot_path_sample <= 0  # Disabled loggers skip record creation
+    if 0 < hot_path_sample < 1:
+        request_logger.addFilter(SamplingFilter(hot_path_sample))
+    return handler
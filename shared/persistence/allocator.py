@@ -0,0 +1,74 @@
+import random
+import threading
+from array import array
+from core.domain import ACCOUNT_MIN, ACCOUNT_MAX
+
+
+class AccountNumberAllocator:
+    """
+    Hands out unused account numbers in O(1).
+
+    All free numbers of the 10000-99999 space are kept in a pool (a compact
+    int array, ~360 KB for the full range). Allocation swaps a random entry
+    to the end and pops it (one step of a Fisher-Yates shuffle), removal of
+    an account appends the number. Numbers stay unpredictable, but AC no
+    longer has to guess and retry, even when the space is almost full, and
+    the pool never needs a full shuffle up front.
+
+    The pool is built once at load time. Accounts created with an explicit
+    number (WAL replay, tests) are skipped lazily on allocation via the
+    `is_used` callback, so the pool never has to search for them.
+
+    In a sharded cluster every shard only hands out its own numbers
+    (low, low + step, low + 2 * step, ...).
+
+    Attributes:
+        is_used (callable): Returns True if a number is already taken.
+    """
+
+    def __init__(self, is_used, low: int = ACCOUNT_MIN, high: int = ACCOUNT_MAX, rng: random.Random = None,
+                 step: int = 1):
+        self.is_used = is_used
+        self._rng = rng or random.Random()
+        self._lock = threading.Lock()
+        self._free = array("i", (n for n in range(low, high + 1, step) if not is_used(n)))
+
+    def _pop_random(self) -> int:
+        free = self._free
+        index = self._rng.randrange(len(free))
+        free[index], free[-1] = free[-1], free[index]
+        return free.pop()
+
+    def allocate(self) -> int:
+        """Returns a free account number. Raises ValueError when the space is exhausted."""
+        with self._lock:
+            while self._free:
+                number = self._pop_random()
+                if not self.is_used(number):
+                    return number
+        raise ValueError("No free account numbers")
+
+    def allocate_many(self, count: int) -> list:
+        """
+        Reserves `count` free numbers at once (bulk pre-allocation).
+        Raises ValueError (and reserves nothing) if fewer numbers are available.
+        """
+        numbers = []
+        with self._lock:
+            while self._free and len(numbers) < count:
+                number = self._pop_random()
+                if not self.is_used(number):
+                    numbers.append(number)
+            if len(numbers) < count:
+                self._free.extend(numbers)
+                raise ValueError("No free account numbers")
+        return numbers
+
+    def release(self, number: int):
+        """Returns a number to the pool (after AR)."""
+        with self._lock:
+            self._free.append(number)
+
+    def __len__(self) -> int:
+        """Upper bound of free numbers (may include lazily skipped, explicitly created ones)."""
+        return len(self._free)
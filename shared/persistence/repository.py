@@ -1,7 +1,40 @@
+import os
 import json
+import time
+import logging
+import threading
 from pathlib import Path
-from typing import Dict
-from core.domain import Account
+from typing import Optional
+from core.domain import Account, ACCOUNT_MIN
+from core.metrics import METRICS
+from shared.persistence.wal import WriteAheadLog
+from shared.persistence.stores import STORES
+from shared.persistence.allocator import AccountNumberAllocator
+from shared.persistence.snapshot import MappedAccountStore, write_binary_snapshot
+
+SNAPSHOT_FORMATS = ("json", "binary")
+# How a transfer intent ended (recorded in its Y record)
+INTENT_OUTCOMES = ("commit", "abort")
+# Longest wait before a failed background compaction is tried again
+COMPACTION_BACKOFF_MAX = 60.0
+# Seconds the outcome of a closed intent is kept for retried TCs (unless acknowledged earlier)
+INTENT_RETENTION = 7 * 24 * 3600
+
+logger = logging.getLogger(__name__)
+
+
+class BatchError(ValueError):
+    """
+    Raised by apply_batch() when one operation fails; nothing of the batch was applied.
+
+    Attributes:
+        index (int): Position of the failed operation in the batch (0-based).
+    """
+
+    def __init__(self, index: int, message: str):
+        super().__init__(message)
+        self.index = index
+
 
 class AccountRepository:
     """
@@ -13,62 +46,739 @@ class AccountRepository:
     from my previous 'Image Processing Pipeline' project (specifically CSVExporter).
     -----------------------
 
+    Persistence model:
+        Every mutation is appended to a Write-Ahead Log (one small record), so
+        a deposit costs O(1) instead of rewriting the whole file. Once the log
+        grows past `snapshot_every` records it is compacted into a new JSON
+        snapshot and truncated. On startup the snapshot is loaded and the log
+        is replayed on top of it.
+
+        With group commit enabled, log records of concurrent requests are
+        written and fsynced together by one writer thread. A mutation returns
+        only after its record is durable, but the account lock is released
+        before waiting, so other requests can join the same batch.
+
+        If the WAL fails (a write or fsync error), the memory may already hold
+        changes that never became durable. The repository then turns read-only
+        for good: every further change and compaction raises OSError until
+        the node is restarted from its files.
+
+    Concurrency model:
+        Accounts are guarded by lock striping: account N is protected by
+        stripe N % lock_stripes, so operations on unrelated accounts run in
+        parallel while two operations on the same account are serialized.
+        Structural changes of the account map (create/delete/iteration) are
+        additionally guarded by a map lock. A snapshot holds every stripe, so
+        it always captures a consistent cut of the data.
+
+    Aggregates:
+        The total balance and the number of accounts are kept as running
+        counters, updated by every mutation, so BA/BN are O(1) instead of a
+        scan over all accounts. They are verified against a full recompute
+        at load time (binary snapshots: taken from the checksummed header).
+
+    Snapshot formats:
+        'json' (default) is parsed completely at startup. 'binary' writes
+        data/accounts.bin (see shared.persistence.snapshot), which is
+        memory-mapped at startup with the default store: accounts are only
+        hydrated on first access, so startup time does not depend on the
+        number of accounts. An existing JSON snapshot is still loaded once
+        and replaced by a binary one at the next compaction.
+
+    Transfer intents:
+        A transfer between banks opens an intent (id -> free-text details)
+        in the same WAL batch as its debit or prepare step and closes it in
+        the batch that completes it, together with its outcome (commit or
+        abort) and the time it was closed. A retried TC is answered from the
+        recorded outcome until the source acknowledges it (forget_intent) or
+        `intent_retention` seconds have passed. Open and closed intents are
+        not part of the snapshot; they are carried over into the new log at
+        every compaction, where expired outcomes are dropped.
+
     Attributes:
-        data_file (Path): The file path where accounts are stored (JSON).
-        _accounts (Dict[int, Account]): In-memory cache of loaded accounts.
+        data_file (Path): The JSON snapshot file (also names the WAL and the binary snapshot).
+        snapshot_format (str): 'json' or 'binary'.
+        snapshot_file (Path): The file snapshots are written to (accounts.json / accounts.bin).
+        wal (WriteAheadLog): Append-only log of mutations since the last snapshot.
+        allocator (AccountNumberAllocator): Pool of unused account numbers for AC.
+        snapshot_every (int): Number of log records after which a snapshot is taken (0 = never).
+        shard_index (int): Partition of this repository in a sharded cluster (AC only
+            allocates numbers with number % shard_count == shard_index).
+        shard_count (int): Number of partitions (1 = not sharded).
+        replication (ReplicationLog): Set on a replication leader; every change is published to it
+            once the WAL made it durable.
+        intent_retention (float): Seconds the outcome of a closed transfer intent is kept.
+        failure (Exception): The WAL error that made the repository read-only (None = writable).
+        _store (DictAccountStore | ArrayAccountStore): In-memory storage backend of loaded accounts.
     """
-    def __init__(self, data_file: str = "data/accounts.json"):
+    def __init__(self, data_file: str = "data/accounts.json", wal_file: str = None,
+                 fsync_every: int = 1, fsync_interval: float = 0.0, snapshot_every: int = 10000,
+                 lock_stripes: int = 64, store: str = "dict", group_commit: bool = False,
+                 group_commit_batch: int = 1024, group_commit_latency: float = 0.001,
+                 shard_index: int = 0, shard_count: int = 1, snapshot_format: str = "json"):
         self.data_file = Path(data_file)
         # Ensure the directory exists
         self.data_file.parent.mkdir(parents=True, exist_ok=True)
-        self._accounts: Dict[int, Account] = {}
+        self.snapshot_every = snapshot_every
+        self.shard_index = shard_index
+        self.shard_count = shard_count
+        if store not in STORES:
+            raise ValueError(f"Unknown store backend: {store}")
+        if snapshot_format not in SNAPSHOT_FORMATS:
+            raise ValueError(f"Unknown snapshot format: {snapshot_format}")
+        self.snapshot_format = snapshot_format
+        binary = snapshot_format == "binary"
+        self.snapshot_file = self.data_file.with_suffix(".bin") if binary else self.data_file
+        # The dict store gets a memory-mapped base when binary snapshots are used
+        self._store = MappedAccountStore() if binary and store == "dict" else STORES[store]()
+        self._stripes = [threading.Lock() for _ in range(lock_stripes)]
+        self._map_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._total_balance = 0
+        self._count = 0
+        self._intents = {}
+        self._closed_intents = {}  # Intent id -> (outcome, closed at: unix time)
+        self.intent_retention = INTENT_RETENTION
+        self._intent_lock = threading.Lock()
+        self.replication = None
+        self.wal = WriteAheadLog(
+            wal_file or self.data_file.with_suffix(".wal"),
+            fsync_every=fsync_every,
+            fsync_interval=fsync_interval,
+            group_commit=group_commit,
+            max_batch=group_commit_batch,
+            max_latency=group_commit_latency,
+        )
+        self.wal.on_durable = self._publish
+        self._allocator = None
+        self._allocator_lock = threading.Lock()
+        # Background compaction: one snapshot at a time, retried with backoff after a failure
+        self._snapshot_lock = threading.Lock()
+        self._compact_due = threading.Event()
+        self._compactor = None
+        self._compactor_stop = False
+        self._compact_backoff = 0.0
+        self._compact_retry_at = 0.0
+        self._failure = None
         self._load()
+        self._start_allocator_build()
 
     def _load(self):
-        """Internal method to load data from the JSON file into memory on startup."""
-        if not self.data_file.exists():
+        """Internal method to load the snapshot and replay the WAL into memory on startup."""
+        lazy = False
+        binary_file = self.data_file.with_suffix(".bin")
+        # The configured format wins; the other one is read when switching formats
+        if binary_file.exists() and (self.snapshot_format == "binary" or not self.data_file.exists()):
+            try:
+                lazy = self._load_binary(binary_file)
+            except Exception as e:
+                logger.error("[ERROR] Failed to load database: %s", e)
+        elif self.data_file.exists():
+            try:
+                with open(self.data_file, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+                    for acc_data in data:
+                        account = Account.from_dict(acc_data)
+                        self._apply_record("B", account.number, account.balance)
+            except Exception as e:
+                logger.error("[ERROR] Failed to load database: %s", e)
+
+        replayed = 0
+        for op, number, balance in self.wal.replay():
+            self._apply_record(op, number, balance)
+            replayed += 1
+        self.wal.record_count = replayed
+        if not lazy:
+            self._verify_aggregates()  # Full scan; a mapped snapshot carries checked totals instead
+        logger.info("[INFO] Loaded %d accounts (%d log records replayed).", len(self._store), replayed)
+
+    def _load_binary(self, path: Path) -> bool:
+        """
+        Loads a binary snapshot. Returns True if it was mapped lazily
+        (the aggregates come from its header), False if it was copied
+        into the store.
+        """
+        if isinstance(self._store, MappedAccountStore):
+            self._store.attach(path)
+            self._adjust(self._store.base_total, len(self._store))
+            return True
+        store = MappedAccountStore()
+        store.attach(path)
+        for number, balance in store.items():
+            self._apply_record("B", number, balance)
+        return False
+
+    def _apply_record(self, op: str, number: int, balance: int = None):
+        """Applies a single WAL record to the in-memory state and the aggregate counters."""
+        if op == "X":
+            self._intents[number] = balance  # Intent id and details
+            return
+        if op == "Y":
+            self._close_intent(number, *balance)  # Intent id, outcome and time
             return
+        old_balance = self._store.get_balance(number)
+        if op == "C":
+            self._store.add(number)
+            self._adjust(-(old_balance or 0), 0 if old_balance is not None else 1)
+        elif op == "B":
+            if old_balance is None:
+                self._store.add(number, balance)
+                self._adjust(balance, 1)
+            else:
+                self._store.set_balance(number, balance)
+                self._adjust(balance - old_balance, 0)
+        elif op == "R" and old_balance is not None:
+            self._store.remove(number)
+            self._adjust(-old_balance, -1)
+
+    def _adjust(self, balance_delta: int, count_delta: int):
+        """Updates the running aggregates (total balance, number of accounts)."""
+        with self._stats_lock:
+            self._total_balance += balance_delta
+            self._count += count_delta
+
+    def _verify_aggregates(self):
+        """Compares the incrementally built counters with a full recompute (load time only)."""
+        total = sum(balance for _, balance in self._store.items())
+        count = len(self._store)
+        if (total, count) != (self._total_balance, self._count):
+            logger.warning("[WARN] Aggregate mismatch (total %d vs %d, count %d vs %d). Using recomputed values.",
+                           self._total_balance, total, self._count, count)
+            self._total_balance = total
+            self._count = count
+
+    def _close_intent(self, intent_id: str, outcome: str, closed_at: int):
+        """Moves an intent from the open ones to the closed ones. Caller holds _intent_lock."""
+        self._intents.pop(intent_id, None)
+        self._closed_intents[intent_id] = (outcome, closed_at)
+
+    def _stripe(self, number: int) -> threading.Lock:
+        """Returns the lock guarding the given account number."""
+        return self._stripes[number % len(self._stripes)]
+
+    def _append(self, op: str, number: int, balance: int = None):
+        """
+        Hands a record to the WAL. Must be called while holding the account's stripe,
+        so records of one account reach the log in the order they were applied.
+
+        Returns:
+            The ticket to pass to _commit() once the stripe is released.
+        """
+        return self._submit([WriteAheadLog.encode(op, number, balance)])
+
+    def _submit(self, lines: list):
+        """
+        Hands records to the WAL. Callers hold the locks of everything the
+        records touch, so changes of one account reach the log in the order
+        applied (see _publish).
+        """
         try:
-            with open(self.data_file, "r", encoding="utf-8") as f:
-                data = json.load(f)
-                for acc_data in data:
-                    account = Account.from_dict(acc_data)
-                    self._accounts[account.number] = account
-            print(f"[INFO] Loaded {len(self._accounts)} accounts.")
+            with METRICS.timer("bank_wal_append_seconds"):
+                return self.wal.submit(lines)
         except Exception as e:
-            print(f"[ERROR] Failed to load database: {e}")
+            self._fail(e)
+            raise
 
-    def save_all(self):
-        """Persists the current state of all accounts to the JSON file."""
-        data = [acc.to_dict() for acc in self._accounts.values()]
+    def _publish(self, lines: list):
+        """
+        WAL callback for durable records: on a replication leader they go to
+        the followers, in log order. A change is never replicated before it
+        survives a crash of this node.
+        """
+        if self.replication is not None:
+            self.replication.publish(lines)
+
+    def _commit(self, ticket):
+        """Waits (without holding a stripe) until the record is durable, then requests a compaction if due."""
         try:
-            with open(self.data_file, "w", encoding="utf-8") as f:
-                json.dump(data, f, indent=4)
+            if ticket is not None:
+                with METRICS.timer("bank_wal_commit_wait_seconds"):
+                    self.wal.wait(ticket)
         except Exception as e:
-            print(f"[CRITICAL] Failed to save database: {e}")
+            self._fail(e)
+            raise
+        self._maybe_compact()
+
+    @property
+    def failure(self) -> Optional[Exception]:
+        """The WAL error that made the repository read-only (None = writable)."""
+        return self._failure or self.wal.error
+
+    def _fail(self, error: Exception):
+        """The WAL lost a change that is already in memory: no further changes are accepted."""
+        if self._failure is None:
+            self._failure = error
+            logger.critical("[CRITICAL] Failed to append to log, the repository is read-only now: %s", error)
+
+    def _check_writable(self):
+        """Raises OSError once the WAL failed (see failure)."""
+        failure = self.failure
+        if failure is not None:
+            self._fail(failure)
+            raise OSError(f"Storage failure, changes are disabled: {failure}")
+
+    def _maybe_compact(self):
+        """
+        Wakes the background compactor once the WAL grew too large (not
+        before the backoff after a failed compaction has passed).
+        """
+        if not self.snapshot_every or self.wal.record_count < self.snapshot_every:
+            return
+        if self.failure is not None or time.monotonic() < self._compact_retry_at:
+            return
+        if self._compactor is None:
+            with self._snapshot_lock:
+                if self._compactor is None:
+                    self._compactor = threading.Thread(target=self._run_compactor, name="compactor", daemon=True)
+                    self._compactor.start()
+        self._compact_due.set()
+
+    def _run_compactor(self):
+        while True:
+            self._compact_due.wait()
+            self._compact_due.clear()
+            try:
+                self._snapshot(only_if_due=True)
+                self._compact_backoff = 0.0
+            except Exception as e:
+                self._compact_backoff = min(max(self._compact_backoff * 2, 1.0), COMPACTION_BACKOFF_MAX)
+                self._compact_retry_at = time.monotonic() + self._compact_backoff
+                logger.critical("[CRITICAL] Failed to save database (next try in %.0fs): %s", self._compact_backoff, e)
+            if self._compactor_stop:
+                return
+
+    def save_all(self):
+        """
+        Writes a full snapshot of all accounts and truncates the WAL (compaction).
+        The snapshot is written to a temporary file first and atomically renamed,
+        so a crash never leaves a half-written database behind.
+
+        Raises:
+            OSError: The snapshot could not be written (the WAL stays as it is),
+                or the WAL failed earlier (memory may hold changes that are not durable).
+        """
+        self._snapshot()
+
+    def _snapshot(self, only_if_due: bool = False):
+        """
+        Copies the state under all locks (writers only wait for the copy) and
+        writes it outside of them. Records appended meanwhile stay in the log.
+        """
+        start = time.perf_counter()
+        with self._snapshot_lock:
+            self._lock_all()
+            try:
+                self._check_writable()  # A failed WAL: memory may hold changes that must not be persisted
+                # Re-check under the locks: another thread may have compacted already
+                if only_if_due and self.wal.record_count < self.snapshot_every:
+                    return
+                with self._map_lock:
+                    items = list(self._store.items())
+                keep = self._intent_records()  # Not part of the snapshot: they start the new log
+                since = self.wal.checkpoint()
+            finally:
+                self._unlock_all()
+            self._write_snapshot(items, keep, since)
+        METRICS.histogram("bank_snapshot_seconds").observe(time.perf_counter() - start)
+
+    def _lock_all(self):
+        """Takes every stripe and the intent lock: nothing can change until _unlock_all()."""
+        for stripe in self._stripes:
+            stripe.acquire()
+        self._intent_lock.acquire()  # Intent-only batches hold no stripe
+
+    def _unlock_all(self):
+        self._intent_lock.release()
+        for stripe in self._stripes:
+            stripe.release()
+
+    def _write_snapshot(self, items: list, keep: list, since: tuple = None):
+        """
+        Writes the snapshot of `items` and resets the WAL to `keep` plus the
+        records written after the checkpoint `since`. Raises on failure.
+        """
+        tmp_file = self.snapshot_file.with_suffix(self.snapshot_file.suffix + ".tmp")
+        if self.snapshot_format == "binary":
+            write_binary_snapshot(tmp_file, items)
+        else:
+            data = [{"number": number, "balance": balance} for number, balance in items]
+            with open(tmp_file, "w", encoding="utf-8") as f:
+                json.dump(data, f, separators=(",", ":"))
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(tmp_file, self.snapshot_file)
+        # A snapshot in the other format is outdated now
+        stale = self.data_file if self.snapshot_format == "binary" else self.data_file.with_suffix(".bin")
+        if stale.exists():
+            os.remove(stale)
+        self.wal.reset(keep, since)
+
+    def _intent_records(self) -> list:
+        """Log records that recreate the open and the closed intents (expired outcomes are dropped)."""
+        oldest = time.time() - self.intent_retention
+        self._closed_intents = {intent_id: closed for intent_id, closed in self._closed_intents.items()
+                                if closed[1] >= oldest}
+        records = [f"Y {intent_id} {outcome} {closed_at}"
+                   for intent_id, (outcome, closed_at) in self._closed_intents.items()]
+        return records + [f"X {intent_id} {details}" for intent_id, details in self._intents.items()]
+
+    # --- Replication (see core.replication) ---
+
+    def replication_state(self) -> tuple:
+        """
+        Leader side: a consistent cut of the whole state for a follower that
+        cannot resume from the replication backlog.
+
+        Returns:
+            tuple: (sequence number of the last published change, log records
+                that rebuild the state: one B per account plus the intents).
+        """
+        self._lock_all()
+        try:
+            self.wal.wait_all()  # Everything in the state has been published: seq matches it
+            with self._map_lock:
+                records = [WriteAheadLog.encode("B", number, balance) for number, balance in self._store.items()]
+            return self.replication.seq, records + self._intent_records()
+        finally:
+            self._unlock_all()
+
+    def load_replica(self, records: list):
+        """
+        Follower side: replaces the whole state by the leader's (see
+        replication_state) and writes it as a new snapshot.
+        """
+        balances, intents, closed = {}, {}, {}
+        for record in map(WriteAheadLog.parse, records):
+            if record is None:
+                continue
+            op, key, value = record
+            if op == "B":
+                balances[key] = value
+            elif op == "X":
+                intents[key] = value
+            elif op == "Y":
+                closed[key] = value
+        self._lock_all()
+        try:
+            with self._map_lock:
+                for number in [number for number, _ in self._store.items() if number not in balances]:
+                    self._store.remove(number)
+                for number, balance in balances.items():
+                    if number in self._store:
+                        self._store.set_balance(number, balance)
+                    else:
+                        self._store.add(number, balance)
+            with self._stats_lock:
+                self._total_balance = sum(balances.values())
+                self._count = len(balances)
+            self._intents = intents
+            self._closed_intents = closed
+            with self._allocator_lock:
+                self._allocator = None  # Rebuilt from the new accounts below
+            if self.replication is not None:
+                self.replication.reset()  # Our own followers need the new state too
+            with self._snapshot_lock:
+                self._write_snapshot(list(balances.items()), self._intent_records())
+        finally:
+            self._unlock_all()
+        self._start_allocator_build()
+
+    def apply_replicated(self, lines: list):
+        """
+        Follower side: applies the log records of one change published by the
+        leader (a single mutation or a whole batch) and appends them to the
+        own WAL, so the follower restarts from its own files.
+        """
+        self._check_writable()
+        records = [record for record in map(WriteAheadLog.parse, lines) if record is not None]
+        numbers = {number for op, number, _ in records if op in ("C", "B", "R")}
+        stripes = sorted({number % len(self._stripes) for number in numbers})
+        for index in stripes:
+            self._stripes[index].acquire()
+        try:
+            with self._intent_lock, self._map_lock:
+                for op, number, balance in records:
+                    if op != "T":
+                        self._apply_record(op, number, balance)
+            ticket = self._submit(lines)
+        finally:
+            for index in stripes:
+                self._stripes[index].release()
+        self._commit(ticket)
+        for op, number, _ in records:
+            if op == "R":
+                self._release_number(number)  # Free again after a promotion
+
+    def close(self):
+        """Finishes a due compaction and flushes outstanding log records to disk. Call on shutdown."""
+        if self._compactor is not None:
+            self._compactor_stop = True
+            self._compact_due.set()
+            self._compactor.join()
+        self.wal.close()
 
     def create(self, number: int) -> Account:
         """Creates and saves a new account. Raises ValueError if it already exists."""
-        if number in self._accounts:
-            raise ValueError("Account already exists")
-        new_account = Account(number)
-        self._accounts[number] = new_account
-        self.save_all()
-        return new_account
+        self._check_writable()
+        with self._stripe(number):
+            with self._map_lock:
+                if number in self._store:
+                    raise ValueError("Account already exists")
+                self._store.add(number)
+            self._adjust(0, 1)
+            ticket = self._append("C", number)
+        self._commit(ticket)
+        return Account(number)
+
+    @property
+    def allocator(self) -> AccountNumberAllocator:
+        """The pool of free numbers, built in the background after loading (waits for it if necessary)."""
+        allocator = self._allocator
+        return allocator if allocator is not None else self._build_allocator()
+
+    def _start_allocator_build(self):
+        """Builds the allocator on a thread (~250 ms at 90k accounts): neither startup nor the first AC waits."""
+        threading.Thread(target=self._build_allocator, name="allocator", daemon=True).start()
+
+    def _build_allocator(self) -> AccountNumberAllocator:
+        with self._allocator_lock:
+            if self._allocator is None:
+                # Accounts created meanwhile are skipped lazily by the allocator (is_used)
+                first = ACCOUNT_MIN + (self.shard_index - ACCOUNT_MIN) % self.shard_count
+                self._allocator = AccountNumberAllocator(lambda number: number in self._store,
+                                                         low=first, step=self.shard_count)
+            return self._allocator
+
+    def _release_number(self, number: int):
+        # Under the build lock: a pool being built may have seen the number as used
+        with self._allocator_lock:
+            if self._allocator is not None:
+                self._allocator.release(number)
+
+    def create_next(self) -> Account:
+        """
+        Creates an account with the next free number from the allocator (O(1)).
+        Raises ValueError when the whole account number space is used up.
+        """
+        while True:
+            number = self.allocator.allocate()
+            try:
+                return self.create(number)
+            except ValueError:
+                continue  # Taken meanwhile by an explicit create(number)
+
+    def create_many(self, count: int) -> list:
+        """
+        Bulk pre-allocation: reserves `count` numbers in one step and creates
+        the accounts as one WAL batch (a single submit and fsync).
+        Raises ValueError (creating nothing) if not enough numbers are free.
+        """
+        self._check_writable()
+        accounts = []
+        while len(accounts) < count:
+            numbers = self.allocator.allocate_many(count - len(accounts))
+            stripes = sorted({number % len(self._stripes) for number in numbers})
+            for index in stripes:
+                self._stripes[index].acquire()
+            try:
+                with self._map_lock:
+                    # A number taken meanwhile by an explicit create(number) is replaced in the next round
+                    created = [number for number in numbers if number not in self._store]
+                    for number in created:
+                        self._store.add(number)
+                self._adjust(0, len(created))
+                records = [WriteAheadLog.encode("C", number) for number in created]
+                ticket = self._submit(WriteAheadLog.encode_batch(records)) if records else None
+            finally:
+                for index in stripes:
+                    self._stripes[index].release()
+            self._commit(ticket)
+            accounts.extend(Account(number) for number in created)
+        return accounts
+
+    def deposit(self, number: int, amount: int) -> int:
+        """
+        Atomically adds funds to an account and logs the new balance.
+        Raises ValueError if the account doesn't exist or the amount is negative.
+
+        Returns:
+            int: The new balance.
+        """
+        self._check_writable()
+        with self._stripe(number):
+            current = self._store.get_balance(number)
+            if current is None:
+                raise ValueError("Account not found")
+            # Business rules stay in the domain entity
+            account = Account(number, current)
+            account.deposit(amount)
+            balance = account.balance
+            self._store.set_balance(number, balance)
+            self._adjust(amount, 0)
+            ticket = self._append("B", number, balance)
+        self._commit(ticket)
+        return balance
+
+    def withdraw(self, number: int, amount: int) -> int:
+        """
+        Atomically checks and deducts funds from an account and logs the new balance.
+        Raises ValueError if the account doesn't exist or has insufficient funds.
+
+        Returns:
+            int: The new balance.
+        """
+        self._check_writable()
+        with self._stripe(number):
+            current = self._store.get_balance(number)
+            if current is None:
+                raise ValueError("Account not found")
+            # Business rules stay in the domain entity
+            account = Account(number, current)
+            account.withdraw(amount)
+            balance = account.balance
+            self._store.set_balance(number, balance)
+            self._adjust(-amount, 0)
+            ticket = self._append("B", number, balance)
+        self._commit(ticket)
+        return balance
+
+    def apply_batch(self, ops: list, open_intent: tuple = None, close_intent: str = None,
+                    outcome: str = "commit") -> list:
+        """
+        Applies several deposits/withdrawals/balance reads atomically.
+
+        The stripes of all involved accounts are taken in ascending order (no
+        deadlock with other batches or snapshots), the operations are checked
+        against a working copy of the balances, and only if all of them
+        succeed are the new balances stored and written to the WAL as one
+        batch record (a single submit, so one write/fsync for the whole batch).
+
+        Args:
+            ops (list): (op, number, amount) tuples; op is "deposit", "withdraw"
+                or "balance" (amount is ignored for "balance").
+            open_intent (tuple): (id, details) of a transfer intent to open in the same batch.
+            close_intent (str): Id of an open transfer intent to close in the same batch.
+            outcome (str): How the closed intent ended: "commit" or "abort".
+
+        Returns:
+            list: The balance of the account after each operation.
+
+        Raises:
+            BatchError: An operation failed (unknown account, insufficient
+                funds, ...), the intent to open already exists or the intent
+                to close is not open (index -1); no change was applied.
+        """
+        if outcome not in INTENT_OUTCOMES:
+            raise ValueError(f"Unknown intent outcome: {outcome}")
+        self._check_writable()
+        stripes = sorted({number % len(self._stripes) for _, number, _ in ops})
+        for index in stripes:
+            self._stripes[index].acquire()
+        intents = open_intent is not None or close_intent is not None
+        if intents:
+            self._intent_lock.acquire()  # After the stripes, like _snapshot()
+        try:
+            if open_intent is not None and (
+                    open_intent[0] in self._intents or open_intent[0] in self._closed_intents):
+                raise BatchError(-1, "Transfer already exists")
+            if close_intent is not None and close_intent not in self._intents:
+                raise BatchError(-1, "Unknown transfer")
+            balances = {}
+            results = []
+            for index, (op, number, amount) in enumerate(ops):
+                try:
+                    if number not in balances:
+                        current = self._store.get_balance(number)
+                        if current is None:
+                            raise ValueError("Account not found")
+                        balances[number] = current
+                    # Business rules stay in the domain entity
+                    account = Account(number, balances[number])
+                    if op == "deposit":
+                        account.deposit(amount)
+                    elif op == "withdraw":
+                        account.withdraw(amount)
+                    balances[number] = account.balance
+                    results.append(account.balance)
+                except ValueError as e:
+                    raise BatchError(index, str(e)) from None
+
+            # All operations passed: publish the new balances
+            records = []
+            for number, balance in balances.items():
+                old_balance = self._store.get_balance(number)
+                if balance != old_balance:
+                    self._store.set_balance(number, balance)
+                    self._adjust(balance - old_balance, 0)
+                    records.append(WriteAheadLog.encode("B", number, balance))
+            if open_intent is not None:
+                self._intents[open_intent[0]] = open_intent[1]
+                records.append(f"X {open_intent[0]} {open_intent[1]}")
+            if close_intent is not None:
+                closed_at = int(time.time())
+                self._close_intent(close_intent, outcome, closed_at)
+                records.append(f"Y {close_intent} {outcome} {closed_at}")
+            ticket = self._submit(WriteAheadLog.encode_batch(records)) if records else None
+        finally:
+            if intents:
+                self._intent_lock.release()
+            for index in stripes:
+                self._stripes[index].release()
+        self._commit(ticket)
+        return results
+
+    def intents(self) -> dict:
+        """Open transfer intents: {id: details}."""
+        with self._intent_lock:
+            return dict(self._intents)
+
+    def intent_outcome(self, intent_id: str) -> str:
+        """How a closed intent ended ("commit" or "abort"); None if it is open, unknown or forgotten."""
+        with self._intent_lock:
+            closed = self._closed_intents.get(intent_id)
+        return closed[0] if closed is not None else None
+
+    def forget_intent(self, intent_id: str):
+        """
+        Drops the outcome of a closed intent once the other side acknowledged
+        it (no retry can follow). The next compaction leaves it out of the log.
+        """
+        with self._intent_lock:
+            self._closed_intents.pop(intent_id, None)
 
     def find_by_number(self, number: int) -> Account:
-        """Retrieves an account by its ID. Returns None if not found."""
-        return self._accounts.get(number)
+        """
+        Retrieves an account by its ID. Returns None if not found.
+        Use deposit()/withdraw() for changes: depending on the store backend
+        the returned object may be a detached copy.
+        """
+        return self._store.get(number)
 
     def delete(self, number: int):
         """Deletes an account. Raises ValueError if account has funds or doesn't exist."""
-        if number not in self._accounts:
-            raise ValueError("Account not found")
-        if self._accounts[number].balance > 0:
-            raise ValueError("Cannot delete account with funds")
-        del self._accounts[number]
-        self.save_all()
+        self._check_writable()
+        with self._stripe(number):
+            with self._map_lock:
+                balance = self._store.get_balance(number)
+                if balance is None:
+                    raise ValueError("Account not found")
+                if balance > 0:
+                    raise ValueError("Cannot delete account with funds")
+                self._store.remove(number)
+            self._adjust(0, -1)
+            ticket = self._append("R", number)
+        self._commit(ticket)
+        self._release_number(number)
 
     def get_all_accounts(self) -> list[Account]:
         """Returns a list of all registered accounts."""
-        return list(self._accounts.values())
\ No newline at end of file
+        with self._map_lock:
+            return self._store.accounts()
+
+    def total_balance(self) -> int:
+        """Returns the sum of all balances in O(1) (running counter)."""
+        return self._total_balance
+
+    def count(self) -> int:
+        """Returns the number of accounts in O(1) (running counter)."""
+        return self._count
@@ -0,0 +1,239 @@
+"""
+Binary snapshot format and the memory-mapped account store that reads it.
+
+File layout (little-endian):
+    Header (28 bytes):
+        magic     4s   b"BNKS"
+        version   H    SNAPSHOT_VERSION
+        reserved  H    0
+        count     I    number of records
+        total     q    sum of all balances (BA without a scan)
+        crc32     I    CRC-32 of the record area
+        size      I    record size in bytes (12)
+    Records (12 bytes each, sorted by account number):
+        number    I
+        balance   q
+
+Because the records are fixed-width and sorted, an account is found by a
+binary search directly in the mapped file; nothing has to be parsed at
+startup except the header.
+
+Conversion tool (JSON <-> binary, direction taken from the source file):
+    python -m shared.persistence.snapshot data/accounts.json [data/accounts.bin]
+"""
+import os
+import json
+import mmap
+import zlib
+import struct
+import argparse
+from pathlib import Path
+from typing import Dict, Iterator, Optional, Tuple
+from core.domain import Account
+
+MAGIC = b"BNKS"
+SNAPSHOT_VERSION = 1
+HEADER = struct.Struct("<4sHHIqII")
+RECORD = struct.Struct("<Iq")
+
+
+def write_binary_snapshot(path, items) -> int:
+    """
+    Writes (number, balance) pairs as a binary snapshot (fsynced).
+
+    Args:
+        path (str | Path): Target file (written directly; rename it into place yourself).
+        items (iterable): (number, balance) pairs in any order.
+
+    Returns:
+        int: Number of records written.
+    """
+    records = b"".join(RECORD.pack(number, balance) for number, balance in sorted(items))
+    count = len(records) // RECORD.size
+    total = sum(balance for _, balance in RECORD.iter_unpack(records))
+    header = HEADER.pack(MAGIC, SNAPSHOT_VERSION, 0, count, total, zlib.crc32(records), RECORD.size)
+    with open(path, "wb") as f:
+        f.write(header)
+        f.write(records)
+        f.flush()
+        os.fsync(f.fileno())
+    return count
+
+
+def read_header(data) -> Tuple[int, int]:
+    """
+    Validates the header and checksum of a binary snapshot.
+
+    Returns:
+        tuple: (count, total) from the header.
+
+    Raises:
+        ValueError: Not a snapshot, unsupported version, truncated or corrupted.
+    """
+    if len(data) < HEADER.size:
+        raise ValueError("Snapshot is truncated")
+    magic, version, _, count, total, crc, record_size = HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise ValueError("Not a binary snapshot")
+    if version != SNAPSHOT_VERSION or record_size != RECORD.size:
+        raise ValueError(f"Unsupported snapshot version {version}")
+    if len(data) != HEADER.size + count * RECORD.size:
+        raise ValueError("Snapshot is truncated")
+    # zlib runs over the mapped pages in C: ~1 ms for the full 90k account space
+    if zlib.crc32(memoryview(data)[HEADER.size:]) != crc:
+        raise ValueError("Snapshot checksum mismatch")
+    return count, total
+
+
+def is_binary_snapshot(path) -> bool:
+    with open(path, "rb") as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+class MappedAccountStore:
+    """
+    Storage backend on top of a memory-mapped binary snapshot.
+
+    Opening a snapshot only maps the file and checks its header, so startup
+    time does not grow with the number of accounts. An account is hydrated
+    into an Account object (kept in a dict overlay, like DictAccountStore)
+    the first time it is accessed; accounts that are never touched cost no
+    Python objects at all. Removed snapshot accounts are remembered in a set.
+
+    Account objects handed out by get() are live, as in DictAccountStore.
+
+    Attributes:
+        path (Path): The mapped snapshot file (None = empty store).
+        base_total (int): Sum of balances in the snapshot (from the header).
+    """
+
+    def __init__(self):
+        self.path = None
+        self.base_total = 0
+        self._map = None
+        self._base_count = 0
+        self._overlay: Dict[int, Account] = {}
+        self._removed = set()
+        self._size = 0
+
+    def attach(self, path):
+        """Maps a binary snapshot as the base of the store. Raises ValueError if it is invalid."""
+        with open(path, "rb") as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            count, total = read_header(mapped)
+        except ValueError:
+            mapped.close()
+            raise
+        self.path = Path(path)
+        self._map = mapped
+        self._base_count = count
+        self.base_total = total
+        self._size = count
+
+    def _find(self, number: int) -> Optional[int]:
+        """Binary search for the balance of an account in the mapped records."""
+        mapped, low, high = self._map, 0, self._base_count - 1
+        if mapped is None:
+            return None
+        unpack = RECORD.unpack_from
+        while low <= high:
+            mid = (low + high) >> 1
+            found, balance = unpack(mapped, HEADER.size + mid * RECORD.size)
+            if found == number:
+                return balance
+            if found < number:
+                low = mid + 1
+            else:
+                high = mid - 1
+        return None
+
+    def get(self, number: int) -> Optional[Account]:
+        """Returns the (live) Account object or None, hydrating it on first access."""
+        account = self._overlay.get(number)
+        if account is not None or number in self._removed:
+            return account
+        balance = self._find(number)
+        if balance is None:
+            return None
+        # setdefault: concurrent first accesses end up with the same object
+        return self._overlay.setdefault(number, Account(number, balance))
+
+    def get_balance(self, number: int) -> Optional[int]:
+        account = self.get(number)
+        return account.balance if account is not None else None
+
+    def set_balance(self, number: int, balance: int):
+        self.get(number).balance = balance
+
+    def add(self, number: int, balance: int = 0):
+        if number not in self:
+            self._size += 1
+        self._overlay[number] = Account(number, balance)
+        self._removed.discard(number)
+
+    def remove(self, number: int):
+        if number not in self:
+            raise KeyError(number)
+        self._removed.add(number)
+        self._overlay.pop(number, None)
+        self._size -= 1
+
+    def items(self) -> Iterator[Tuple[int, int]]:
+        """Yields (number, balance) pairs of all stored accounts (snapshot accounts first)."""
+        overlay = dict(self._overlay)
+        removed = set(self._removed)
+        if self._map is not None:
+            records = memoryview(self._map)[HEADER.size:HEADER.size + self._base_count * RECORD.size]
+            for number, balance in RECORD.iter_unpack(records):
+                account = overlay.pop(number, None)
+                if account is not None:
+                    yield number, account.balance
+                elif number not in removed:
+                    yield number, balance
+            records.release()
+        for account in overlay.values():
+            yield account.number, account.balance
+
+    def accounts(self) -> list:
+        return [Account(number, balance) for number, balance in self.items()]
+
+    def __contains__(self, number: int) -> bool:
+        # No hydration: the allocator checks every number of the space
+        if number in self._overlay:
+            return True
+        return number not in self._removed and self._find(number) is not None
+
+    def __len__(self) -> int:
+        return self._size
+
+
+def load_json(path) -> list:
+    """Reads the (number, balance) pairs of a JSON snapshot."""
+    with open(path, "r", encoding="utf-8") as f:
+        return [(entry["number"], entry["balance"]) for entry in json.load(f)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Converts account snapshots between JSON and the binary format.")
+    parser.add_argument("source", help="Snapshot to convert (JSON or binary, detected from the content).")
+    parser.add_argument("target", nargs="?",
+                        help="Output file (Default: the source with the suffix .bin or .json).")
+    args = parser.parse_args()
+
+    source = Path(args.source)
+    if is_binary_snapshot(source):
+        store = MappedAccountStore()
+        store.attach(source)
+        target = Path(args.target or source.with_suffix(".json"))
+        with open(target, "w", encoding="utf-8") as f:
+            json.dump([{"number": n, "balance": b} for n, b in sorted(store.items())], f, separators=(",", ":"))
+        count = len(store)
+    else:
+        target = Path(args.target or source.with_suffix(".bin"))
+        count = write_binary_snapshot(target, load_json(source))
+    print(f"Converted {count} accounts: {source} -> {target}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+from array import array
+from typing import Dict, Iterator, Optional, Tuple
+from core.domain import Account, ACCOUNT_MIN, ACCOUNT_MAX
+
+
+class DictAccountStore:
+    """
+    Default in-memory storage backend: a dictionary of Account objects.
+
+    Fast and simple, but every account costs a full Python object plus a
+    dictionary slot (roughly 150 bytes per account).
+    """
+
+    def __init__(self):
+        self._accounts: Dict[int, Account] = {}
+
+    def get(self, number: int) -> Optional[Account]:
+        """Returns the (live) Account object or None."""
+        return self._accounts.get(number)
+
+    def get_balance(self, number: int) -> Optional[int]:
+        account = self._accounts.get(number)
+        return account.balance if account is not None else None
+
+    def set_balance(self, number: int, balance: int):
+        self._accounts[number].balance = balance
+
+    def add(self, number: int, balance: int = 0):
+        self._accounts[number] = Account(number, balance)
+
+    def remove(self, number: int):
+        del self._accounts[number]
+
+    def items(self) -> Iterator[Tuple[int, int]]:
+        """Yields (number, balance) pairs of all stored accounts."""
+        for account in list(self._accounts.values()):
+            yield account.number, account.balance
+
+    def accounts(self) -> list:
+        return list(self._accounts.values())
+
+    def __contains__(self, number: int) -> bool:
+        return number in self._accounts
+
+    def __len__(self) -> int:
+        return len(self._accounts)
+
+
+class ArrayAccountStore:
+    """
+    Memory-compact storage backend for the fixed 10000-99999 account range.
+
+    Balances live in one preallocated array of signed 64-bit integers indexed
+    by (number - ACCOUNT_MIN), and an occupancy bitmap records which numbers
+    exist. The whole account space costs ~700 KB regardless of how many
+    accounts are open, and no per-account Python objects are kept.
+
+    Account objects handed out by get() are detached copies: changes must go
+    through the repository (set_balance), not through the returned object.
+    """
+
+    SIZE = ACCOUNT_MAX - ACCOUNT_MIN + 1
+
+    def __init__(self):
+        self._balances = array("q", bytes(8 * self.SIZE))
+        self._occupied = bytearray((self.SIZE + 7) // 8)
+        self._size = 0
+
+    @classmethod
+    def _index(cls, number: int) -> int:
+        index = number - ACCOUNT_MIN
+        if not 0 <= index < cls.SIZE:
+            raise ValueError("Account number out of range")
+        return index
+
+    def _is_set(self, index: int) -> bool:
+        return bool(self._occupied[index >> 3] & (1 << (index & 7)))
+
+    def get(self, number: int) -> Optional[Account]:
+        """Returns a detached Account copy or None."""
+        balance = self.get_balance(number)
+        return Account(number, balance) if balance is not None else None
+
+    def get_balance(self, number: int) -> Optional[int]:
+        index = number - ACCOUNT_MIN
+        if not 0 <= index < self.SIZE or not self._is_set(index):
+            return None
+        return self._balances[index]
+
+    def set_balance(self, number: int, balance: int):
+        self._balances[self._index(number)] = balance
+
+    def add(self, number: int, balance: int = 0):
+        index = self._index(number)
+        if not self._is_set(index):
+            self._occupied[index >> 3] |= 1 << (index & 7)
+            self._size += 1
+        self._balances[index] = balance
+
+    def remove(self, number: int):
+        index = self._index(number)
+        if not self._is_set(index):
+            raise KeyError(number)
+        self._occupied[index >> 3] &= ~(1 << (index & 7)) & 0xFF
+        self._balances[index] = 0
+        self._size -= 1
+
+    def items(self) -> Iterator[Tuple[int, int]]:
+        """Yields (number, balance) pairs of all stored accounts in ascending order."""
+        occupied = self._occupied
+        balances = self._balances
+        for byte_index, byte in enumerate(occupied):
+            if not byte:
+                continue
+            base = byte_index << 3
+            for bit in range(8):
+                if byte & (1 << bit):
+                    index = base + bit
+                    yield index + ACCOUNT_MIN, balances[index]
+
+    def accounts(self) -> list:
+        return [Account(number, balance) for number, balance in self.items()]
+
+    def __contains__(self, number: int) -> bool:
+        index = number - ACCOUNT_MIN
+        return 0 <= index < self.SIZE and self._is_set(index)
+
+    def __len__(self) -> int:
+        return self._size
+
+
+STORES = {
+    "dict": DictAccountStore,
+    "array": ArrayAccountStore,
+}
@@ -0,0 +1,369 @@
+import os
+import time
+import threading
+from pathlib import Path
+from typing import Optional
+
+
+class WriteAheadLog:
+    """
+    Append-only log of account mutations (Write-Ahead Log).
+
+    Instead of rewriting the whole database after every deposit, each mutation
+    is appended as one short text line. The log is replayed on top of the last
+    snapshot at startup and truncated whenever a new snapshot is written.
+
+    Record format (one line per record, UTF-8):
+        C <number>            -> account created (balance 0)
+        B <number> <balance>  -> balance of the account is now <balance>
+        R <number>            -> account removed
+        T <count>             -> the next <count> records belong to one batch
+        X <id> <details>      -> transfer intent <id> opened (details: free text)
+        Y <id> <outcome> <t>  -> transfer intent <id> closed at unix time <t> (outcome: commit / abort)
+
+    A batch (BT command) is applied either completely or not at all: on
+    replay its records are only used once all <count> of them are in the
+    file, so a crash in the middle of writing a batch drops the whole batch.
+    Such an incomplete batch is cut off when the log is opened, so records
+    appended after the restart are never counted into it.
+
+    Transfer intents (AT command) are written in the same batch as the
+    balance change they belong to, so a debit and its intent survive a
+    crash together. Intents that are still open are carried over into the
+    new log when it is reset.
+
+    Records store the *resulting* balance instead of the delta, so replaying
+    a record twice (e.g. after a crash during compaction) is harmless.
+
+    Group commit:
+        With `group_commit=True`, submit() only queues the records and a single
+        writer thread writes everything queued so far with one write() and one
+        fsync(). A batch is closed when it reaches `max_batch` records or when
+        its first record has waited `max_latency` seconds. Callers block in
+        wait() until their batch is on disk, so many concurrent writers share
+        one fsync without weakening durability (every batch is fsynced,
+        regardless of fsync_every/fsync_interval). The records of one submit()
+        call are never split across two writes.
+
+    Attributes:
+        path (Path): Location of the log file.
+        fsync_every (int): Force data to disk after this many records (0 = never force).
+        fsync_interval (float): Force data to disk if this many seconds passed since the last fsync.
+        record_count (int): Number of records appended since the last reset.
+        group_commit (bool): Whether records are written by the group commit writer thread.
+        max_batch (int): Maximum records per group commit batch.
+        max_latency (float): Maximum seconds a record waits for others to join its batch.
+        batches (int): Number of group commit batches written (for monitoring).
+        on_durable (callable): Called with the records of every submit() once they
+            are written (and fsynced as configured), in log order (None = no callback).
+    """
+
+    def __init__(self, path, fsync_every: int = 1, fsync_interval: float = 0.0,
+                 group_commit: bool = False, max_batch: int = 1024, max_latency: float = 0.001):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.fsync_every = fsync_every
+        self.fsync_interval = fsync_interval
+        self.record_count = 0
+        self.group_commit = group_commit
+        self.max_batch = max_batch
+        self.max_latency = max_latency
+        self.batches = 0
+        self.on_durable = None
+
+        self._lock = threading.Lock()
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+        self._drop_torn_tail()
+        self._file = open(self.path, "a", encoding="utf-8")
+
+        # Group commit state: queued submits (lists of lines) and sequence numbers of submitted / durable records
+        self._cond = threading.Condition(threading.Lock())
+        self._pending = []
+        self._pending_records = 0
+        self._submitted = 0
+        self._durable = 0
+        self._error = None
+        self._closing = False
+        self._writer = None
+        if group_commit:
+            self._writer = threading.Thread(target=self._run_writer, name="wal-writer", daemon=True)
+            self._writer.start()
+
+    def _drop_torn_tail(self):
+        """
+        Cuts off a partially written last record and an incomplete trailing
+        batch, so new appends start on a fresh line outside of any batch.
+        """
+        if not self.path.exists():
+            return
+        with open(self.path, "rb+") as f:
+            size = end = batch_start = batch_left = 0
+            for raw in f:
+                size += len(raw)
+                if not raw.endswith(b"\n"):
+                    break  # Torn last line
+                record = self.parse(raw.decode("utf-8", errors="replace"))
+                if record is not None and record[0] == "T":
+                    batch_start, batch_left = end, record[1]
+                elif record is not None and batch_left:
+                    batch_left -= 1
+                end = size
+            if batch_left:
+                end = batch_start  # The batch never got all of its records
+            if end != size:
+                f.truncate(end)
+
+    @staticmethod
+    def encode(op: str, number: int, balance: int = None) -> str:
+        """Formats a single record as a log line (without the trailing newline)."""
+        if balance is None:
+            return f"{op} {number}"
+        return f"{op} {number} {balance}"
+
+    @staticmethod
+    def encode_batch(lines: list) -> list:
+        """Prefixes pre-encoded records with a batch header, so they are replayed all-or-nothing."""
+        return [f"T {len(lines)}"] + lines
+
+    @staticmethod
+    def parse(line: str):
+        """
+        Turns one log line into an (op, number, balance) tuple (see replay() for
+        the intent and batch records). Returns None for malformed lines.
+        """
+        parts = line.split()
+        try:
+            if len(parts) == 2 and parts[0] in ("C", "R", "T"):
+                return parts[0], int(parts[1]), None
+            if len(parts) == 3 and parts[0] == "B":
+                return "B", int(parts[1]), int(parts[2])
+        except ValueError:
+            return None
+        if len(parts) > 2 and parts[0] == "X":
+            return "X", parts[1], " ".join(parts[2:])
+        if 2 <= len(parts) <= 4 and parts[0] == "Y":
+            # Older logs: no outcome (a commit) and no time (counted from now)
+            outcome = parts[2] if len(parts) > 2 else "commit"
+            try:
+                closed_at = int(parts[3]) if len(parts) > 3 else int(time.time())
+            except ValueError:
+                return None
+            return "Y", parts[1], (outcome, closed_at)
+        return None
+
+    def append(self, op: str, number: int, balance: int = None):
+        """Appends one record and applies the configured fsync policy."""
+        self.append_many([self.encode(op, number, balance)])
+
+    def append_many(self, lines: list):
+        """Appends several pre-encoded records with a single write call."""
+        if not lines:
+            return
+        with self._lock:
+            self._file.write("\n".join(lines) + "\n")
+            self._file.flush()
+            self.record_count += len(lines)
+            self._unsynced += len(lines)
+            if self._should_sync():
+                self._sync_locked()
+            if self.on_durable is not None:
+                self.on_durable(lines)  # Under the lock: callbacks come in log order
+
+    def submit(self, lines: list):
+        """
+        Hands records over for writing and returns a ticket for wait().
+        Without group commit the records are written immediately (ticket None).
+        """
+        if not self.group_commit or not lines:
+            self.append_many(lines)
+            return None
+        with self._cond:
+            if self._closing:
+                raise OSError("Write-ahead log is closed")
+            if self._error is not None:
+                raise OSError(f"Write-ahead log failure: {self._error}")
+            self._pending.append(lines)
+            self._pending_records += len(lines)
+            self._submitted += len(lines)
+            self.record_count += len(lines)
+            self._cond.notify_all()
+            return self._submitted
+
+    @property
+    def error(self) -> Optional[Exception]:
+        """The error that stopped the group commit writer (None while it works)."""
+        return self._error
+
+    def wait_all(self):
+        """Blocks until every record submitted so far is durable."""
+        with self._cond:
+            submitted = self._submitted
+        self.wait(submitted or None)
+
+    def wait(self, ticket):
+        """Blocks until the records of the ticket are durable. Raises OSError if writing failed."""
+        if ticket is None:
+            return
+        with self._cond:
+            while self._durable < ticket and self._error is None:
+                self._cond.wait()
+            if self._durable < ticket:
+                raise OSError(f"Write-ahead log failure: {self._error}")
+
+    def _run_writer(self):
+        """Group commit writer: one write() + fsync() per batch of queued records."""
+        while True:
+            with self._cond:
+                while not self._pending and not self._closing:
+                    self._cond.wait()
+                if not self._pending and self._closing:
+                    return
+                # Give concurrent writers a short window to join this batch
+                deadline = time.monotonic() + self.max_latency
+                while self._pending_records < self.max_batch and not self._closing:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                # Whole submits only (at least one), so a T batch never spans two writes
+                batch, taken = [], 0
+                for lines in self._pending:
+                    if batch and len(batch) + len(lines) > self.max_batch:
+                        break
+                    batch.extend(lines)
+                    taken += 1
+                units = self._pending[:taken]
+                del self._pending[:taken]
+                self._pending_records -= len(batch)
+                target = self._submitted - self._pending_records
+
+            try:
+                with self._lock:
+                    self._file.write("\n".join(batch) + "\n")
+                    self._file.flush()
+                    self._sync_locked()
+                    self.batches += 1
+            except Exception as e:
+                with self._cond:
+                    self._error = e
+                    self._cond.notify_all()
+                return
+
+            if self.on_durable is not None:
+                for lines in units:  # Only this thread writes: log order
+                    self.on_durable(lines)
+            with self._cond:
+                self._durable = target
+                self._cond.notify_all()
+
+    def _should_sync(self) -> bool:
+        if self.fsync_every > 0 and self._unsynced >= self.fsync_every:
+            return True
+        if self.fsync_interval > 0 and time.monotonic() - self._last_sync >= self.fsync_interval:
+            return True
+        return False
+
+    def _sync_locked(self):
+        os.fsync(self._file.fileno())
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+
+    def sync(self):
+        """Forces all appended records to disk."""
+        with self._lock:
+            if self._unsynced:
+                self._sync_locked()
+
+    def replay(self):
+        """
+        Yields (op, number, balance) tuples for every complete record in the log.
+        Intent records are yielded as ("X", id, details) and ("Y", id, (outcome, closed at)).
+        A torn last line (crash in the middle of a write) is silently skipped.
+        """
+        if not self.path.exists():
+            return
+        batch, batch_left = [], 0
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                if not line.endswith("\n"):
+                    break  # Incomplete record at the end of the file
+                record = self.parse(line)
+                if record is None:
+                    continue
+                if record[0] == "T":
+                    batch, batch_left = [], record[1]
+                    continue
+                if batch_left:
+                    batch.append(record)
+                    batch_left -= 1
+                    if not batch_left:
+                        yield from batch  # Batch complete
+                    continue
+                yield record
+
+    def checkpoint(self) -> tuple:
+        """
+        Marks the current end of the log for reset(since=...), after writing
+        out everything submitted so far. Records appended later survive the reset.
+
+        Returns:
+            tuple: (byte offset of the end of the log, record_count at that point).
+        """
+        self.wait_all()
+        with self._lock:
+            self._file.flush()
+            return os.path.getsize(self.path), self.record_count
+
+    def reset(self, keep: list = None, since: tuple = None):
+        """
+        Truncates the log. Called after a snapshot has been safely written.
+        Queued group commit records are written out first.
+
+        Args:
+            keep (list): Pre-encoded records that start the new log (records
+                the snapshot does not cover, e.g. open transfer intents). The
+                new log is written aside and renamed into place, so a crash
+                never loses them.
+            since (tuple): A checkpoint() taken when the snapshot's state was
+                copied: the records written after it follow `keep` in the new
+                log (None = the snapshot covers the whole log).
+        """
+        if since is None:
+            self.wait_all()
+        with self._lock:
+            self._file.flush()
+            tail = b""
+            if since is not None:
+                with open(self.path, "rb") as f:
+                    f.seek(since[0])
+                    tail = f.read()
+            self._file.close()
+            if keep or tail:
+                tmp_file = self.path.with_suffix(self.path.suffix + ".tmp")
+                with open(tmp_file, "wb") as f:
+                    if keep:
+                        f.write(("\n".join(keep) + "\n").encode("utf-8"))
+                    f.write(tail)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp_file, self.path)
+                self._file = open(self.path, "a", encoding="utf-8")
+            else:
+                self._file = open(self.path, "w", encoding="utf-8")
+                self._sync_locked()
+            self.record_count = max(0, self.record_count - since[1]) if since is not None else 0
+
+    def close(self):
+        """Flushes pending records to disk and closes the file."""
+        if self._writer is not None:
+            with self._cond:
+                self._closing = True
+                self._cond.notify_all()
+            self._writer.join()
+        with self._lock:
+            if self._file.closed:
+                return
+            if self._unsynced:
+                self._sync_locked()
+            self._file.close()
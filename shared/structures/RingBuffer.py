@@ -0,0 +1,52 @@
+class RingBuffer:
+    """
+    A fixed-capacity circular buffer backed by a preallocated list.
+
+    Memory use never grows: once the buffer is full, every new item
+    overwrites (evicts) the oldest one.
+
+    Attributes:
+        capacity (int): Maximum number of stored items.
+        _items (list): Preallocated slots.
+        _start (int): Index of the oldest item.
+        _count (int): The current number of elements in the buffer.
+    """
+
+    def __init__(self, capacity: int):
+        if capacity <= 0:
+            raise ValueError("Capacity must be positive")
+        self.capacity = capacity
+        self._items = [None] * capacity
+        self._start = 0
+        self._count = 0
+
+    def add(self, value):
+        """Appends an item. Returns the evicted oldest item if the buffer was full, else None."""
+        if self._count < self.capacity:
+            self._items[(self._start + self._count) % self.capacity] = value
+            self._count += 1
+            return None
+        evicted = self._items[self._start]
+        self._items[self._start] = value
+        self._start = (self._start + 1) % self.capacity
+        return evicted
+
+    def count(self):
+        """Returns the number of items in the buffer."""
+        return self._count
+
+    def clear(self):
+        """Removes all items from the buffer."""
+        self._items = [None] * self.capacity
+        self._start = 0
+        self._count = 0
+
+    def __iter__(self):
+        """Iterates from the oldest to the newest item."""
+        for i in range(self._count):
+            yield self._items[(self._start + i) % self.capacity]
+
+    def newest_first(self):
+        """Iterates from the newest to the oldest item."""
+        for i in range(self._count - 1, -1, -1):
+            yield self._items[(self._start + i) % self.capacity]
@@ -0,0 +1,82 @@
+import tempfile
+import unittest
+from core.bank_service import BankService
+from core.cluster import (ShardChannel, ShardRouter, check_unsharded_data, shard_data_file, shard_of,
+                          shard_socket_path)
+from shared.persistence.repository import AccountRepository
+
+
+class TestShardRouting(unittest.TestCase):
+    """Two shards of one node in one process, connected over their unix sockets."""
+    shards = 2
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)  # Runs last
+        data_file = f"{self.tmp.name}/accounts.json"
+        paths = [shard_socket_path(data_file, i) for i in range(self.shards)]
+        self.services = []
+        for index in range(self.shards):
+            repository = AccountRepository(shard_data_file(data_file, index), fsync_every=0,
+                                           shard_index=index, shard_count=self.shards)
+            service = BankService(repository)
+            router = ShardRouter(index, self.shards, paths)
+            router.attach(service)
+            channel = ShardChannel(paths[index], service)
+            channel.start()
+            self.addCleanup(repository.close)
+            self.addCleanup(channel.stop)
+            self.addCleanup(router.pool.close_all)
+            self.services.append(service)
+
+    def run_cmd(self, shard: int, command: str) -> str:
+        return self.services[shard].execute_command(command, "127.0.0.1")
+
+    def test_accounts_are_created_in_the_own_partition(self):
+        for shard in range(self.shards):
+            for _ in range(5):
+                number = int(self.run_cmd(shard, "AC").split()[1].split("/")[0])
+                self.assertEqual(shard_of(number, self.shards), shard)
+
+    def test_commands_are_routed_to_the_owner(self):
+        account = self.run_cmd(1, "AC").split()[1]
+        self.assertEqual(self.run_cmd(0, f"AD {account} 300"), "AD")
+        self.assertEqual(self.run_cmd(0, f"AW {account} 100"), "AW")
+        self.assertEqual(self.run_cmd(1, f"AB {account}"), "AB 200")
+        self.assertEqual(self.services[0].repository.count(), 0)
+
+    def test_bank_totals_aggregate_all_shards(self):
+        for shard in range(self.shards):
+            account = self.run_cmd(shard, "AC").split()[1]
+            self.run_cmd(shard, f"AD {account} 100")
+        self.assertEqual(self.run_cmd(0, "BN"), "BN 2")
+        self.assertEqual(self.run_cmd(1, "BA"), "BA 200")
+
+    def test_batch_is_split_per_shard(self):
+        first, second = self.run_cmd(0, "AC").split()[1], self.run_cmd(1, "AC").split()[1]
+        self.assertEqual(self.run_cmd(0, f"BT AD {first} 10;AD {second} 20;AB {second}"), "BT AD;AD;AB 20")
+        self.assertEqual(self.run_cmd(1, "BA"), "BA 30")
+
+    def test_transfer_between_shards(self):
+        first, second = self.run_cmd(0, "AC").split()[1], self.run_cmd(1, "AC").split()[1]
+        self.run_cmd(0, f"AD {first} 100")
+        # Sent to shard 1, which routes the AT to the owner of the source account
+        self.assertEqual(self.run_cmd(1, f"AT {first} {second} 30"), "AT")
+        self.assertEqual((self.run_cmd(0, "BA"), self.run_cmd(1, f"AB {second}")), ("BA 100", "AB 30"))
+        self.assertEqual(self.services[0].repository.intents(), {})
+
+
+class TestUnshardedData(unittest.TestCase):
+    def test_existing_single_node_data_is_refused(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            data_file = f"{tmp}/accounts.json"
+            check_unsharded_data(data_file)  # Fresh directory
+            repository = AccountRepository(data_file, fsync_every=0)
+            repository.create_next()
+            repository.close()
+            with self.assertRaises(RuntimeError):
+                check_unsharded_data(data_file)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,84 @@
+import random
+import socket
+import tempfile
+import threading
+import unittest
+from core.bank_service import BankService
+from core.server import BankNode
+from shared.persistence.repository import AccountRepository
+
+
+class TestConcurrentClients(unittest.TestCase):
+    """Stress test: many clients hammer one node, money must be conserved."""
+
+    CLIENTS = 16
+    OPS_PER_CLIENT = 150
+    ACCOUNTS = 4
+    INITIAL = 1000
+    REPO_OPTIONS = {"fsync_every": 0}
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.data_file = f"{self.tmp.name}/accounts.json"
+        self.repository = AccountRepository(self.data_file, snapshot_every=500, **self.REPO_OPTIONS)
+        self.node = BankNode("127.0.0.1", 0, BankService(self.repository))
+        threading.Thread(target=self.node.start_server, daemon=True).start()
+        self.assertTrue(self.node.ready.wait(5))
+
+        for number in range(10001, 10001 + self.ACCOUNTS):
+            self.repository.create(number)
+            self.repository.deposit(number, self.INITIAL)
+
+    def tearDown(self):
+        self.node.stop()
+        self.repository.close()
+        self.tmp.cleanup()
+
+    def client(self, seed: int, results: list):
+        rng = random.Random(seed)
+        delta = 0
+        with socket.create_connection(("127.0.0.1", self.node.port), timeout=10) as conn:
+            reader = conn.makefile("r", encoding="utf-8", newline="\r\n")
+            for _ in range(self.OPS_PER_CLIENT):
+                number = rng.randrange(10001, 10001 + self.ACCOUNTS)
+                amount = rng.randint(1, 300)
+                cmd = rng.choice(("AD", "AW"))
+                conn.sendall(f"{cmd} {number}/127.0.0.1 {amount}\n".encode("utf-8"))
+                response = reader.readline().strip()
+                if response == "AD":
+                    delta += amount
+                elif response == "AW":
+                    delta -= amount
+                else:
+                    self.assertEqual(response, "ER Insufficient funds")
+        results.append(delta)
+
+    def test_balances_are_conserved(self):
+        results = []
+        threads = [threading.Thread(target=self.client, args=(seed, results)) for seed in range(self.CLIENTS)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join(60)
+        self.assertEqual(len(results), self.CLIENTS)
+
+        expected = self.ACCOUNTS * self.INITIAL + sum(results)
+        accounts = self.repository.get_all_accounts()
+        self.assertTrue(all(acc.balance >= 0 for acc in accounts))
+        self.assertEqual(sum(acc.balance for acc in accounts), expected)
+        self.assertEqual(self.repository.total_balance(), expected)
+
+        # The persisted state (snapshot + log) must match memory as well
+        self.repository.close()
+        reloaded = AccountRepository(self.data_file)
+        self.addCleanup(reloaded.close)
+        self.assertEqual(sum(acc.balance for acc in reloaded.get_all_accounts()), expected)
+
+
+class TestConcurrentClientsGroupCommit(TestConcurrentClients):
+    """Same stress test with durable group commit (every batch fsynced)."""
+    REPO_OPTIONS = {"group_commit": True}
+
+
+if __name__ == '__main__':
+    unittest.main()
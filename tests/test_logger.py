@@ -0,0 +1,79 @@
+import io
+import logging
+import threading
+import unittest
+from shared.logger import BackgroundBatchHandler, SamplingFilter, REQUEST_LOGGER, setup_logging
+
+
+class TestLogging(unittest.TestCase):
+    def setUp(self):
+        root = logging.getLogger()
+        self.saved = (list(root.handlers), root.level)
+
+    def tearDown(self):
+        root = logging.getLogger()
+        for handler in list(root.handlers):
+            root.removeHandler(handler)
+            handler.close()
+        for handler in self.saved[0]:
+            root.addHandler(handler)
+        root.setLevel(self.saved[1])
+        request_logger = logging.getLogger(REQUEST_LOGGER)
+        request_logger.disabled = False
+        request_logger.filters.clear()
+
+    def test_background_handler_writes_batches_in_order(self):
+        stream = io.StringIO()
+        handler = BackgroundBatchHandler(stream)
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        logger = logging.getLogger("test.batch")
+        logger.addHandler(handler)
+        logger.propagate = False
+        for i in range(100):
+            logger.warning("line %d", i)
+        handler.close()
+        logger.removeHandler(handler)
+        self.assertEqual(stream.getvalue().splitlines(), [f"line {i}" for i in range(100)])
+
+    def test_full_queue_drops_and_reports(self):
+        stream = io.StringIO()
+        handler = BackgroundBatchHandler(stream, max_batch=1, max_queue=5)
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        release = threading.Event()
+        handler.stream.write = lambda text, write=stream.write: (release.wait(5), write(text))  # A stuck console
+        logger = logging.getLogger("test.bounded")
+        logger.addHandler(handler)
+        logger.propagate = False
+        for i in range(50):
+            logger.warning("line %d", i)
+        self.assertGreaterEqual(handler.dropped, 40)
+        release.set()
+        handler.close()
+        logger.removeHandler(handler)
+        lines = stream.getvalue().splitlines()
+        warnings = [int(line.split()[1]) for line in lines if line.startswith("[WARN]")]
+        self.assertEqual(sum(warnings), handler.dropped)
+        self.assertEqual(len(lines) - len(warnings), 50 - handler.dropped)
+
+    def test_hot_path_sampling_and_suppression(self):
+        stream = io.StringIO()
+        handler = setup_logging("INFO", hot_path_sample=0.25, stream=stream)
+        request_logger = logging.getLogger(REQUEST_LOGGER)
+        for i in range(8):
+            request_logger.info("[RECV] %d", i)
+        logging.getLogger("test.other").info("[INFO] always")
+        handler.close()
+        lines = stream.getvalue().splitlines()
+        self.assertEqual(sum("[RECV]" in line for line in lines), 2)
+        self.assertTrue(any("always" in line for line in lines))
+
+        setup_logging("INFO", hot_path_sample=0, stream=io.StringIO())
+        self.assertTrue(request_logger.disabled)
+
+    def test_sampling_filter_rate(self):
+        f = SamplingFilter(0.1)
+        self.assertEqual(sum(f.filter(None) for _ in range(100)), 10)
+
+
+if __name__ == '__main__':
+    unittest.main()
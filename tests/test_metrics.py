@@ -0,0 +1,55 @@
+import unittest
+import urllib.request
+from core.metrics import MetricsRegistry, MetricsServer
+from tests.test_service import ServiceTestCase
+
+
+class TestMetricsRegistry(unittest.TestCase):
+    def test_histogram_percentiles_and_render(self):
+        registry = MetricsRegistry()
+        histogram = registry.histogram("bank_command_seconds", command="AD")
+        for _ in range(98):
+            histogram.observe(0.0003)
+        histogram.observe(0.02)
+        histogram.observe(0.02)
+        self.assertEqual(histogram.percentile(50), 0.0005)
+        self.assertEqual(histogram.percentile(99), 0.025)
+        registry.counter("bank_commands_total", command="AD", status="ok").inc(3)
+
+        text = registry.render()
+        self.assertIn('bank_command_seconds_count{command="AD"} 100', text)
+        self.assertIn('bank_command_seconds_bucket{command="AD",le="+Inf"} 100', text)
+        self.assertIn('bank_commands_total{command="AD",status="ok"} 3', text)
+        self.assertIn("AD:n=100", registry.summary())
+
+    def test_metrics_listener(self):
+        registry = MetricsRegistry()
+        registry.gauge("bank_active_connections").inc()
+        server = MetricsServer("127.0.0.1", 0, registry)
+        server.start()
+        self.addCleanup(server.stop)
+        with urllib.request.urlopen(f"http://127.0.0.1:{server.port}/metrics", timeout=5) as response:
+            self.assertIn("bank_active_connections 1", response.read().decode("utf-8"))
+
+
+class TestServiceMetrics(ServiceTestCase):
+    def setUp(self):
+        super().setUp()
+        self.service.metrics = MetricsRegistry()
+        self.service.metrics.add_collector(self.service._collect_metrics)
+
+    def test_commands_are_counted(self):
+        account = self.new_account()
+        self.run_cmd(f"AD {account} 100")
+        self.run_cmd(f"AW {account} 500")
+        self.run_cmd("XYZ")
+        metrics = self.service.metrics
+        self.assertEqual(metrics.counter("bank_commands_total", command="AD", status="ok").value, 1)
+        self.assertEqual(metrics.counter("bank_commands_total", command="AW", status="error").value, 1)
+        self.assertEqual(metrics.counter("bank_commands_total", command="OTHER", status="error").value, 1)
+        self.assertTrue(self.run_cmd("BM").startswith("BM AC:n=1"))
+        self.assertIn("bank_accounts 1", metrics.render())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,126 @@
+import time
+import tempfile
+import threading
+import unittest
+from core.bank_service import BankService
+from core.replication import ReplicationFollower, ReplicationLog, ReplicationServer
+from shared.persistence.repository import AccountRepository
+
+
+class TestReplication(unittest.TestCase):
+    """A leader and a follower repository in one process, connected over the replication port."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)  # Runs last
+        self.leader = self.open_repo("leader")
+        self.account = self.leader.create_next().number
+        self.leader.deposit(self.account, 100)  # Written before replication starts: sent as full state
+        self.server = ReplicationServer("127.0.0.1", 0, self.leader, heartbeat=0.05)
+        self.server.start()
+        self.addCleanup(self.server.stop)
+        self.follower_repo = self.open_repo("follower")
+        self.follower = self.follow(self.follower_repo)
+
+    def open_repo(self, name: str) -> AccountRepository:
+        repository = AccountRepository(f"{self.tmp.name}/{name}/accounts.json", fsync_every=0)
+        self.addCleanup(repository.close)
+        return repository
+
+    def follow(self, repository: AccountRepository) -> ReplicationFollower:
+        follower = ReplicationFollower(("127.0.0.1", self.server.port), repository, retry_interval=0.05)
+        follower.start()
+        self.addCleanup(follower.stop)
+        return follower
+
+    def wait_caught_up(self, follower: ReplicationFollower):
+        deadline = time.monotonic() + 5
+        while follower.applied_seq != self.leader.replication.seq or not follower.connected:
+            self.assertLess(time.monotonic(), deadline, "follower did not catch up")
+            time.sleep(0.01)
+
+    def state(self, repository: AccountRepository) -> tuple:
+        accounts = sorted((a.number, a.balance) for a in repository.get_all_accounts())
+        return accounts, repository.total_balance(), repository.count()
+
+    def test_changes_are_streamed(self):
+        self.wait_caught_up(self.follower)
+        self.assertEqual(self.state(self.follower_repo), self.state(self.leader))
+
+        second = self.leader.create_next().number
+        self.leader.apply_batch([("withdraw", self.account, 30), ("deposit", second, 30)])
+        self.leader.apply_batch([], open_intent=("t1", "in 1 5"))
+        third = self.leader.create_next().number
+        self.leader.delete(third)
+        self.wait_caught_up(self.follower)
+        self.assertEqual(self.state(self.follower_repo), self.state(self.leader))
+        self.assertEqual(self.follower_repo.intents(), {"t1": "in 1 5"})
+
+        # The follower restarts from its own snapshot and log
+        self.follower.stop()
+        self.follower_repo.close()
+        self.assertEqual(self.state(self.open_repo("follower")), self.state(self.leader))
+
+    def test_restarted_follower_resumes_from_its_position(self):
+        self.wait_caught_up(self.follower)
+        self.follower.stop()
+        self.follower_repo.close()
+        self.leader.deposit(self.account, 7)  # Missed while the follower was down
+
+        repository = self.open_repo("follower")
+        full_states = []
+        repository.load_replica = full_states.append
+        follower = self.follow(repository)
+        self.assertEqual(follower.epoch, self.leader.replication.epoch)
+        self.wait_caught_up(follower)
+        self.assertEqual(full_states, [])  # Only the missed change was sent
+        self.assertEqual(self.state(repository), self.state(self.leader))
+
+    def test_read_only_follower_and_promotion(self):
+        self.wait_caught_up(self.follower)
+        service = BankService(self.follower_repo)
+        service.replica, service.read_only = self.follower, True
+        account = f"{self.account}/127.0.0.1"
+
+        self.assertEqual(service.execute_command(f"AB {account}", "127.0.0.1"), "AB 100")
+        self.assertEqual(service.execute_command(f"AD {account} 5", "127.0.0.1"),
+                         "ER Read-only follower, send changes to the leader")
+        self.assertEqual(service.execute_command("RL", "127.0.0.1").split()[:4],
+                         ["RL", "follower", str(self.follower.applied_seq), "0"])
+        self.assertEqual(service.execute_command("RP", "10.0.0.9"), "ER Not allowed")
+
+        self.assertEqual(service.execute_command("RP", "127.0.0.1"), "RP")
+        self.assertFalse(self.follower.position_file.exists())  # Diverges from the leader from now on
+        self.assertEqual(service.execute_command(f"AD {account} 5", "127.0.0.1"), "AD")
+        self.assertEqual(service.execute_command("RL", "127.0.0.1"), "ER Replication is not enabled")
+        leader = BankService(self.leader)
+        self.assertEqual(leader.execute_command("RL", "127.0.0.1").split()[:3],
+                         ["RL", "leader", str(self.leader.replication.seq)])
+
+
+class TestReplicationLog(unittest.TestCase):
+    def test_backlog(self):
+        log = ReplicationLog(backlog=3)
+        for value in range(5):
+            log.publish([f"B 10001 {value}"])
+        self.assertEqual([seq for seq, _ in log.changes_after(3)], [4, 5])
+        self.assertEqual(log.changes_after(5), [])
+        self.assertIsNone(log.changes_after(1))  # Evicted: the follower needs the full state
+        log.reset()
+        self.assertIsNone(log.changes_after(5))
+
+    def test_changes_are_published_once_durable(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            repository = AccountRepository(f"{tmp}/accounts.json", group_commit=True, group_commit_latency=0.5)
+            self.addCleanup(repository.close)
+            repository.replication = log = ReplicationLog()
+            writer = threading.Thread(target=repository.create_next)
+            writer.start()
+            time.sleep(0.1)
+            self.assertEqual(log.seq, 0)  # Applied, but its group commit batch is not on disk yet
+            writer.join(5)
+            self.assertEqual(log.seq, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,324 @@
+import os
+import tempfile
+import threading
+import time
+import unittest
+from shared.persistence.allocator import AccountNumberAllocator
+from shared.persistence.repository import AccountRepository, BatchError
+from shared.persistence.snapshot import write_binary_snapshot
+from shared.persistence.wal import WriteAheadLog
+
+
+class TestAccountRepository(unittest.TestCase):
+    store = "dict"
+    snapshot_format = "json"
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.data_file = os.path.join(self.tmp.name, "accounts.json")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def open_repo(self, **kwargs):
+        kwargs.setdefault("store", self.store)
+        kwargs.setdefault("snapshot_format", self.snapshot_format)
+        repo = AccountRepository(self.data_file, **kwargs)
+        self.addCleanup(repo.close)
+        return repo
+
+    def test_wal_replay_restores_state(self):
+        repo = self.open_repo()
+        repo.create(10001)
+        repo.deposit(10001, 500)
+        repo.create(10002)
+        repo.delete(10002)
+        repo.close()
+
+        self.assertFalse(os.path.exists(self.data_file))  # No snapshot written yet
+        reloaded = self.open_repo()
+        self.assertEqual(reloaded.find_by_number(10001).balance, 500)
+        self.assertIsNone(reloaded.find_by_number(10002))
+
+    def test_snapshot_compacts_log(self):
+        repo = self.open_repo(snapshot_every=3)
+        repo.create(10001)
+        for _ in range(4):
+            repo.deposit(10001, 10)
+        repo.close()
+
+        self.assertTrue(repo.snapshot_file.exists())
+        self.assertLess(repo.wal.record_count, 3)
+        self.assertEqual(self.open_repo().find_by_number(10001).balance, 40)
+
+    def test_failed_snapshot_is_reported_and_keeps_the_log(self):
+        repo = self.open_repo()
+        repo.create(10001)
+        repo.deposit(10001, 10)
+        os.mkdir(str(repo.snapshot_file) + ".tmp")  # The temporary file cannot be written
+        with self.assertRaises(OSError):
+            repo.save_all()
+        repo.close()
+        self.assertEqual(self.open_repo().find_by_number(10001).balance, 10)
+
+    def test_records_after_the_checkpoint_survive_compaction(self):
+        repo = self.open_repo()
+        repo.create(10001)
+        since = repo.wal.checkpoint()
+        repo.deposit(10001, 5)  # Written while the snapshot is being saved
+        repo._write_snapshot([(10001, 0)], [], since)
+        repo.close()
+        self.assertEqual(repo.wal.record_count, 1)
+        self.assertEqual(self.open_repo().find_by_number(10001).balance, 5)
+
+    def test_failed_log_makes_the_repository_read_only(self):
+        repo = self.open_repo(group_commit=True)
+        repo.create(10001)
+
+        def broken_disk():
+            raise OSError("No space left on device")
+
+        repo.wal._sync_locked = broken_disk
+        with self.assertRaises(OSError):
+            repo.deposit(10001, 10)  # In memory, but never durable
+        self.assertIsNotNone(repo.failure)
+        with self.assertRaises(OSError):
+            repo.deposit(10001, 5)
+        with self.assertRaises(OSError):
+            repo.save_all()  # Would persist the lost deposit
+        self.assertEqual(repo.find_by_number(10001).balance, 10)  # The second deposit was not applied
+        del repo.wal._sync_locked
+
+    def test_torn_record_is_ignored(self):
+        repo = self.open_repo()
+        repo.create(10001)
+        repo.deposit(10001, 100)
+        repo.close()
+        with open(repo.wal.path, "a", encoding="utf-8") as f:
+            f.write("B 10001 99")  # Crash in the middle of a write
+
+        reloaded = self.open_repo()
+        self.assertEqual(reloaded.find_by_number(10001).balance, 100)
+        reloaded.deposit(10001, 1)
+        reloaded.close()
+        self.assertEqual(self.open_repo().find_by_number(10001).balance, 101)
+
+    def test_aggregate_counters(self):
+        repo = self.open_repo()
+        for number in (10001, 10002, 10003):
+            repo.create(number)
+        repo.deposit(10001, 300)
+        repo.deposit(10002, 200)
+        repo.withdraw(10001, 50)
+        repo.delete(10003)
+        self.assertEqual((repo.total_balance(), repo.count()), (450, 2))
+        with self.assertRaises(ValueError):
+            repo.withdraw(10002, 1000)
+        self.assertEqual(repo.total_balance(), 450)
+
+        repo.close()
+        reloaded = self.open_repo()
+        self.assertEqual((reloaded.total_balance(), reloaded.count()), (450, 2))
+
+    def test_group_commit_batches_concurrent_writers(self):
+        repo = self.open_repo(group_commit=True, group_commit_latency=0.005)
+        repo.create(10001)
+        threads = [threading.Thread(target=lambda: [repo.deposit(10001, 1) for _ in range(20)])
+                   for _ in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(repo.find_by_number(10001).balance, 160)
+        self.assertLess(repo.wal.batches, 161)  # Many records shared one fsync
+        repo.close()
+        self.assertEqual(self.open_repo().find_by_number(10001).balance, 160)
+
+    def test_batch_is_all_or_nothing(self):
+        repo = self.open_repo()
+        repo.create(10001)
+        repo.create(10002)
+        self.assertEqual(repo.apply_batch([("deposit", 10001, 100), ("withdraw", 10001, 30),
+                                           ("deposit", 10002, 5), ("balance", 10001, None)]), [100, 70, 5, 70])
+        with self.assertRaises(BatchError) as ctx:
+            repo.apply_batch([("deposit", 10002, 50), ("withdraw", 10001, 500)])
+        self.assertEqual((ctx.exception.index, str(ctx.exception)), (1, "Insufficient funds"))
+        self.assertEqual((repo.find_by_number(10002).balance, repo.total_balance()), (5, 75))
+
+        repo.close()
+        with open(repo.wal.path, "a", encoding="utf-8") as f:
+            f.write("T 2\nB 10001 0\n")  # Crash in the middle of a batch
+        reloaded = self.open_repo()
+        self.assertEqual((reloaded.find_by_number(10001).balance, reloaded.total_balance()), (70, 75))
+
+    def test_torn_batch_is_cut_before_new_records(self):
+        repo = self.open_repo()
+        repo.create(10001)
+        repo.create(10002)
+        repo.close()
+        with open(repo.wal.path, "a", encoding="utf-8") as f:
+            f.write("T 3\nB 10001 999\n")  # Crash after the first record of a batch
+
+        reloaded = self.open_repo()
+        reloaded.deposit(10002, 10)
+        reloaded.deposit(10002, 20)  # Would complete the torn batch if it were still in the log
+        reloaded.close()
+        reopened = self.open_repo()
+        self.assertEqual((reopened.find_by_number(10001).balance, reopened.find_by_number(10002).balance,
+                          reopened.total_balance()), (0, 30, 30))
+
+    def test_group_commit_keeps_batches_whole(self):
+        wal = WriteAheadLog(os.path.join(self.tmp.name, "batches.wal"), group_commit=True, max_batch=2)
+        self.addCleanup(wal.close)
+        wal.wait(wal.submit(wal.encode_batch(["B 10001 1", "B 10002 2", "B 10003 3"])))
+        self.assertEqual(wal.batches, 1)  # Larger than max_batch, still one write
+        self.assertEqual(len(list(wal.replay())), 3)
+
+    def test_transfer_intents_survive_restart_and_compaction(self):
+        repo = self.open_repo()
+        repo.create(10001)
+        repo.deposit(10001, 100)
+        repo.apply_batch([("withdraw", 10001, 40)], open_intent=("t1", "out 10001 5/10.0.0.5 40"))
+        with self.assertRaises(BatchError):
+            repo.apply_batch([], open_intent=("t1", "out 10001 5/10.0.0.5 40"))
+        repo.close()
+
+        reloaded = self.open_repo()
+        self.assertEqual(reloaded.intents(), {"t1": "out 10001 5/10.0.0.5 40"})
+        reloaded.save_all()  # The open intent is carried over into the new log
+        reloaded.close()
+        compacted = self.open_repo()
+        self.assertEqual((compacted.intents(), compacted.find_by_number(10001).balance),
+                         ({"t1": "out 10001 5/10.0.0.5 40"}, 60))
+        compacted.apply_batch([("deposit", 10001, 40)], close_intent="t1", outcome="abort")
+        with self.assertRaises(BatchError):
+            compacted.apply_batch([], close_intent="t1")
+        compacted.save_all()
+        compacted.close()
+        closed = self.open_repo()
+        self.assertEqual((closed.intents(), closed.intent_outcome("t1")), ({}, "abort"))
+        self.assertEqual(closed.find_by_number(10001).balance, 100)
+
+    def test_intent_outcomes_are_pruned(self):
+        repo = self.open_repo()
+        repo.create(10001)
+        for intent_id in ("t1", "t2"):
+            repo.apply_batch([], open_intent=(intent_id, "in 10001 5"))
+            repo.apply_batch([], close_intent=intent_id)
+        repo.close()
+        with open(repo.wal.path, "a", encoding="utf-8") as f:
+            f.write("Y t0 commit 1000\n")  # Closed long ago
+
+        reloaded = self.open_repo()
+        self.assertEqual([reloaded.intent_outcome(i) for i in ("t0", "t1", "t2")], ["commit"] * 3)
+        reloaded.forget_intent("t2")  # Acknowledged by the source
+        reloaded.save_all()
+        reloaded.close()
+        compacted = self.open_repo()
+        self.assertEqual([compacted.intent_outcome(i) for i in ("t0", "t1", "t2")], [None, "commit", None])
+
+    def test_create_next_and_bulk_allocation(self):
+        repo = self.open_repo()
+        first = repo.create_next()
+        records = repo.wal.record_count
+        bulk = repo.create_many(5)
+        numbers = {first.number} | {acc.number for acc in bulk}
+        self.assertEqual(len(numbers), 6)
+        self.assertEqual(repo.count(), 6)
+        self.assertEqual(repo.wal.record_count, records + 6)  # One batch: header + five creates
+        repo.close()
+        self.assertEqual(self.open_repo().count(), 6)
+
+    def test_allocator_is_built_in_the_background(self):
+        repo = self.open_repo()
+        deadline = time.monotonic() + 5
+        while repo._allocator is None:  # Without any AC
+            self.assertLess(time.monotonic(), deadline, "allocator was not built")
+            time.sleep(0.01)
+        self.assertIs(repo.allocator, repo._allocator)
+
+
+class TestAccountNumberAllocator(unittest.TestCase):
+    def test_exhaustion_and_release(self):
+        used = {10001}
+        allocator = AccountNumberAllocator(lambda n: n in used, low=10000, high=10003)
+        allocated = set()
+        for _ in range(3):
+            number = allocator.allocate()
+            used.add(number)
+            allocated.add(number)
+        self.assertEqual(allocated, {10000, 10002, 10003})
+        with self.assertRaises(ValueError):
+            allocator.allocate()
+
+        used.discard(10002)
+        allocator.release(10002)
+        self.assertEqual(allocator.allocate(), 10002)
+
+    def test_allocate_many_is_all_or_nothing(self):
+        allocator = AccountNumberAllocator(lambda n: False, low=10000, high=10004)
+        with self.assertRaises(ValueError):
+            allocator.allocate_many(6)
+        self.assertEqual(len(allocator.allocate_many(5)), 5)
+
+
+class TestArrayStoreRepository(TestAccountRepository):
+    """Runs the same scenarios against the compact array-backed store."""
+    store = "array"
+
+    def test_number_out_of_range(self):
+        repo = self.open_repo()
+        with self.assertRaises(ValueError):
+            repo.create(100000)
+        self.assertIsNone(repo.find_by_number(5))
+
+
+
+class TestBinarySnapshotRepository(TestAccountRepository):
+    """Runs the same scenarios with binary snapshots and the memory-mapped store."""
+    snapshot_format = "binary"
+
+    def test_accounts_are_hydrated_on_first_access(self):
+        write_binary_snapshot(os.path.join(self.tmp.name, "accounts.bin"),
+                              [(number, number - 10000) for number in range(10000, 10100)])
+        repo = self.open_repo()
+        self.assertEqual((repo.count(), repo.total_balance()), (100, 4950))
+        self.assertEqual(len(repo._store._overlay), 0)  # Nothing parsed at startup
+        self.assertEqual(repo.find_by_number(10042).balance, 42)
+        self.assertIsNone(repo.find_by_number(10100))
+        repo.deposit(10001, 9)
+        repo.delete(10000)
+        self.assertEqual(len(repo._store._overlay), 2)
+
+        repo.save_all()
+        repo.close()
+        reloaded = self.open_repo()
+        self.assertEqual((reloaded.count(), reloaded.total_balance()), (99, 4959))
+        self.assertIsNone(reloaded.find_by_number(10000))
+
+    def test_json_snapshot_is_migrated(self):
+        repo = self.open_repo(snapshot_format="json")
+        repo.create(10001)
+        repo.deposit(10001, 70)
+        repo.save_all()
+        repo.close()
+
+        migrated = self.open_repo()
+        self.assertEqual(migrated.find_by_number(10001).balance, 70)
+        migrated.save_all()
+        migrated.close()
+        self.assertFalse(os.path.exists(self.data_file))  # Replaced by accounts.bin
+        self.assertEqual(self.open_repo().find_by_number(10001).balance, 70)
+
+    def test_corrupted_snapshot_is_rejected(self):
+        path = os.path.join(self.tmp.name, "accounts.bin")
+        write_binary_snapshot(path, [(10001, 5)])
+        with open(path, "r+b") as f:
+            f.seek(-1, os.SEEK_END)
+            f.write(b"\x07")
+        with self.assertLogs("shared.persistence.repository", "ERROR"):
+            repo = self.open_repo()
+        self.assertEqual(repo.count(), 0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,327 @@
+import socket
+import tempfile
+import threading
+import time
+import unittest
+from core.async_server import AsyncBankNode
+from core.bank_service import BankService
+from core.binary_protocol import HELLO_REJECTED, decode_request, encode_request
+from core.circuit_breaker import CircuitBreakerRegistry
+from core.commands import CommandSpec
+from core.framing import LineReader
+from core.metrics import MetricsRegistry
+from core.peer_pool import PeerConnectionPool
+from core.peer_registry import PeerRegistry
+from core.pool_server import PooledBankNode
+from core.server import BankNode
+from core.worker_pool import WorkerPool
+from shared.persistence.repository import AccountRepository
+
+
+class ServerTestMixin:
+    """Starts a node of the engine under test on a random loopback port."""
+    engine = None
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.repository = AccountRepository(f"{self.tmp.name}/accounts.json", fsync_every=0)
+        self.node = self.engine("127.0.0.1", 0, BankService(self.repository))
+        self.thread = threading.Thread(target=self.node.start_server, daemon=True)
+        self.thread.start()
+        self.assertTrue(self.node.ready.wait(5))
+
+    def tearDown(self):
+        self.node.stop()
+        self.thread.join(5)
+        self.repository.close()
+        self.tmp.cleanup()
+
+    def connect(self):
+        conn = socket.create_connection(("127.0.0.1", self.node.port), timeout=5)
+        self.addCleanup(conn.close)
+        return conn, conn.makefile("r", encoding="utf-8", newline="\r\n")
+
+    def send(self, conn, reader, command):
+        conn.sendall(f"{command}\n".encode("utf-8"))
+        return reader.readline().strip()
+
+    def test_protocol_roundtrip(self):
+        conn, reader = self.connect()
+        created = self.send(conn, reader, "AC")
+        self.assertTrue(created.startswith("AC "))
+        account = created.split()[1]
+        self.assertEqual(self.send(conn, reader, f"AD {account} 300"), "AD")
+        self.assertEqual(self.send(conn, reader, f"AW {account} 100"), "AW")
+        self.assertEqual(self.send(conn, reader, f"AB {account}"), "AB 200")
+        self.assertEqual(self.send(conn, reader, "BN"), "BN 1")
+
+    def test_pipelined_and_split_commands(self):
+        conn, reader = self.connect()
+        account = self.send(conn, reader, "AC").split()[1]
+        # Two commands in one packet, the third one split across two packets
+        conn.sendall(f"AD {account} 100\r\nAD {account} 50\nAB {account[:3]}".encode("utf-8"))
+        conn.sendall(f"{account[3:]}\n".encode("utf-8"))
+        self.assertEqual([reader.readline().strip() for _ in range(3)], ["AD", "AD", "AB 150"])
+
+    def test_binary_protocol_or_text_fallback(self):
+        pool = PeerConnectionPool(binary=True)
+        self.addCleanup(pool.close_all)
+        endpoint = ("127.0.0.1", self.node.port)
+        created = pool.request(endpoint, "AC")
+        account = created.split()[1]
+        self.assertRegex(created, r"^AC \d{5}/127\.0\.0\.1$")
+        self.assertEqual(pool.request(endpoint, f"AD {account} 300"), "AD")
+        self.assertEqual(pool.request(endpoint, f"AW {account} 1000"), "ER Insufficient funds")
+        self.assertEqual(pool.request(endpoint, f"AB {account}"), "AB 300")
+        self.assertEqual(pool.request(endpoint, "BA"), "BA 300")
+        self.assertEqual(pool.request(endpoint, "BN"), "BN 1")
+        self.assertEqual(pool.request(endpoint, f"AD {account.split('/')[0]} 1"), "ER Invalid account format")
+        self.assertTrue(pool.request(endpoint, f"AH {account}").startswith("AH "))  # Sent as a text frame
+        conn, _ = pool.acquire(endpoint)
+        self.assertTrue(conn.binary)
+        self.assertEqual(pool.stats()["misses"], 1)
+
+    def test_data_after_hello_stays_text(self):
+        conn, reader = self.connect()
+        conn.sendall(b"BP 2\nBN\n")  # Did not wait for the answer: no switch
+        self.assertEqual([reader.readline().strip() for _ in range(2)], [HELLO_REJECTED, "BN 0"])
+        self.assertEqual(self.send(conn, reader, "BA"), "BA 0")
+        self.assertEqual(self.send(conn, reader, "bp 2"), "ER Unknown command")  # The hello is matched exactly
+
+    def test_binary_text_frames_use_the_services_commands(self):
+        self.node.service.register_command("BX", lambda request, client_ip: f"BX {request.account * 2}",
+                                           CommandSpec(1, 1, account=True))
+        pool = PeerConnectionPool(binary=True)
+        self.addCleanup(pool.close_all)
+        endpoint = ("127.0.0.1", self.node.port)
+        self.assertEqual(pool.request(endpoint, "BX 21"), "BX 42")
+        self.assertTrue(pool.acquire(endpoint)[0].binary)
+
+
+class TestBinaryProtocol(unittest.TestCase):
+    def test_account_ip_presence_is_a_flag(self):
+        for line, target_ip in (("AD 12345/0.0.0.0 5", "0.0.0.0"), ("AD 12345/10.0.0.5 5", "10.0.0.5"),
+                                ("AB 12345", None)):
+            _, data = encode_request(line)
+            request = decode_request(data[4:])
+            self.assertEqual((request.account, request.target_ip, request.raw), (12345, target_ip, line))
+
+
+class TestLineReader(unittest.TestCase):
+    def test_split_and_pipelined_lines(self):
+        reader = LineReader()
+        self.assertEqual(reader.feed(b"BN\r\nB"), ["BN"])
+        self.assertEqual(reader.feed(b"A\nBC\n"), ["BA", "BC"])
+        self.assertEqual(reader.pending, 0)
+
+    def test_line_too_long(self):
+        reader = LineReader(max_line_length=8)
+        with self.assertRaises(ValueError):
+            reader.feed(b"A" * 9)
+
+
+class TestPeerConnectionPool(unittest.TestCase):
+    def test_written_command_is_not_resent(self):
+        listener = socket.create_server(("127.0.0.1", 0))
+        self.addCleanup(listener.close)
+        received = []
+
+        def peer():
+            conn, _ = listener.accept()
+            with conn, conn.makefile("r", encoding="utf-8") as reader:
+                received.append(reader.readline().strip())
+                conn.sendall(b"AD\r\n")
+                received.append(reader.readline().strip())  # Dies before answering
+        thread = threading.Thread(target=peer, daemon=True)
+        thread.start()
+
+        pool = PeerConnectionPool(timeout=2)
+        self.addCleanup(pool.close_all)
+        endpoint = listener.getsockname()
+        self.assertEqual(pool.request(endpoint, "AD 10001/127.0.0.1 5"), "AD")
+        with self.assertRaises(ConnectionError):
+            pool.request(endpoint, "AD 10001/127.0.0.1 5")
+        thread.join(5)
+        self.assertEqual(received, ["AD 10001/127.0.0.1 5"] * 2)
+        self.assertEqual(pool.stats()["reconnects"], 0)
+
+
+class TestThreadedEngine(ServerTestMixin, unittest.TestCase):
+    engine = BankNode
+
+    def test_peer_pool_reuses_connections(self):
+        pool = PeerConnectionPool()
+        self.addCleanup(pool.close_all)
+        endpoint = ("127.0.0.1", self.node.port)
+        self.assertEqual(pool.request(endpoint, "BN"), "BN 0")
+        self.assertEqual(pool.request(endpoint, "BA"), "BA 0")
+        stats = pool.stats()
+        self.assertEqual((stats["misses"], stats["hits"], stats["idle"]), (1, 1, 1))
+
+        pool.idle_timeout = 0
+        pool.evict_idle()
+        self.assertEqual(pool.stats()["idle"], 0)
+
+    def test_forwarding_resolves_the_port(self):
+        port = self.node.port
+        registry = PeerRegistry(ports=range(port - 3, port + 1), probe_timeout=0.5)
+        self.addCleanup(registry.stop)
+        with tempfile.TemporaryDirectory() as tmp:
+            repository = AccountRepository(f"{tmp}/accounts.json", fsync_every=0)
+            self.addCleanup(repository.close)
+            client = BankService(repository, peer_registry=registry)
+            client.my_ips = ["10.255.255.1"]  # 127.0.0.1 is a remote bank for this service
+
+            account = self.node.service.repository.create_next().number
+            self.assertEqual(client.execute_command(f"AD {account}/127.0.0.1 70", "127.0.0.1"), "AD")
+            self.assertEqual(registry.resolve("127.0.0.1"), ("127.0.0.1", port))
+            self.assertTrue(registry.entries()[0].healthy)
+
+            self.node.stop()
+            self.thread.join(5)
+            client.peer_pool.close_all()
+            registry.mark_failed("127.0.0.1")
+            response = client.execute_command(f"AB {account}/127.0.0.1", "127.0.0.1")
+            self.assertTrue(response.startswith("ER No bank found at 127.0.0.1"), response)
+            self.assertFalse(registry.entries()[0].healthy)
+
+    def test_circuit_breaker_fails_fast_and_recovers(self):
+        port = self.node.port
+        registry = PeerRegistry(ports=range(port, port + 1), probe_timeout=0.5)
+        self.addCleanup(registry.stop)
+        breakers = CircuitBreakerRegistry(failure_threshold=2, reset_timeout=60, probe=registry.check)
+        with tempfile.TemporaryDirectory() as tmp:
+            repository = AccountRepository(f"{tmp}/accounts.json", fsync_every=0)
+            self.addCleanup(repository.close)
+            client = BankService(repository, peer_registry=registry, breakers=breakers)
+            client.my_ips = ["10.255.255.1"]  # 127.0.0.1 is a remote bank for this service
+            account = self.node.service.repository.create_next().number
+            balance = f"AB {account}/127.0.0.1"
+            self.assertEqual(client.execute_command(balance, "127.0.0.1"), "AB 0")
+
+            service = self.node.service
+            self.node.stop()
+            self.thread.join(5)
+            client.peer_pool.close_all()
+            for _ in range(2):
+                self.assertTrue(client.execute_command(balance, "127.0.0.1").startswith("ER"))
+            self.assertEqual(client.execute_command("PS", "127.0.0.1"), f"PS 127.0.0.1:{port}=open:2")
+            self.assertEqual(client.execute_command(balance, "127.0.0.1"),
+                             "ER Bank 127.0.0.1 is unavailable (circuit open)")
+
+            # The peer comes back: the background probe closes the circuit
+            self.node = BankNode("127.0.0.1", port, service)
+            self.thread = threading.Thread(target=self.node.start_server, daemon=True)
+            self.thread.start()
+            self.assertTrue(self.node.ready.wait(5))
+            breakers.probe_open()
+            self.assertEqual(client.execute_command("PS", "127.0.0.1"), f"PS 127.0.0.1:{port}=closed:0")
+            self.assertEqual(client.execute_command(balance, "127.0.0.1"), "AB 0")
+
+
+class TestAsyncioEngine(ServerTestMixin, unittest.TestCase):
+    engine = AsyncBankNode
+
+    def test_connection_cap(self):
+        self.node.max_connections = 1
+        conn, reader = self.connect()
+        self.assertEqual(self.send(conn, reader, "BN"), "BN 0")
+        _, second = self.connect()
+        self.assertEqual(second.readline().strip(), "ER Too many connections")
+
+
+class TestPoolEngine(ServerTestMixin, unittest.TestCase):
+    engine = PooledBankNode
+
+    def fill_pool(self):
+        gate, started = threading.Event(), threading.Semaphore(0)
+        self.addCleanup(gate.set)
+        for _ in range(self.node.workers):
+            self.node.pool.submit(lambda: (started.release(), gate.wait()))
+        for _ in range(self.node.workers):
+            self.assertTrue(started.acquire(timeout=5))  # Every worker is busy
+        self.node.pool.queue_size = 1
+        self.node.pool.submit(gate.wait)  # ... and the single queue slot is taken
+        return gate
+
+    def test_overload_answers_busy(self):
+        gate = self.fill_pool()
+        conn, reader = self.connect()
+        conn.sendall(b"BN\nBA\n")
+        self.assertEqual([reader.readline().strip() for _ in range(2)], ["ER Busy", "ER Busy"])
+        gate.set()
+        deadline = time.monotonic() + 5
+        while self.node.pool.depth:  # The freed workers pick up the queued job first
+            self.assertLess(time.monotonic(), deadline, "queue did not drain")
+            time.sleep(0.01)
+        self.assertEqual(self.send(conn, reader, "BN"), "BN 0")
+
+    def test_block_policy_stops_reading_but_keeps_serving(self):
+        self.node.overload = "block"
+        gate = self.fill_pool()
+        conn, reader = self.connect()
+        conn.sendall(b"BN\n")
+        second, second_reader = self.connect()
+        second.sendall(b"BA\n")
+        conn.settimeout(0.2)
+        with self.assertRaises(socket.timeout):
+            conn.recv(1)
+        conn.settimeout(5)
+        self.assertEqual(len(self.node._stalled), 2)  # The I/O thread kept accepting and reading
+        gate.set()
+        self.assertEqual(reader.readline().strip(), "BN 0")
+        self.assertEqual(second_reader.readline().strip(), "BA 0")
+        self.assertEqual(self.send(conn, reader, "BN"), "BN 0")
+
+    def test_workers_hand_closed_connections_to_the_io_thread(self):
+        conn, reader = self.connect()
+        self.assertEqual(self.send(conn, reader, "BN"), "BN 0")
+        conn.sendall(b"BN\n")
+        conn.shutdown(socket.SHUT_WR)
+        self.assertEqual(reader.readline().strip(), "BN 0")
+        self.assertEqual(conn.recv(1), b"")  # Closed after the last answer
+        deadline = time.monotonic() + 5
+        while self.node._connections:
+            self.assertLess(time.monotonic(), deadline, "connection was not closed")
+            time.sleep(0.01)
+
+
+class TestWorkerPool(unittest.TestCase):
+    def make_pool(self, overload):
+        pool = WorkerPool(workers=1, queue_size=1, overload=overload, metrics=MetricsRegistry())
+        self.gate = threading.Event()
+        self.addCleanup(pool.shutdown)
+        self.addCleanup(self.gate.set)
+        started = threading.Event()
+        pool.submit(lambda: (started.set(), self.gate.wait()))
+        self.assertTrue(started.wait(5))  # The only worker is busy from now on
+        return pool
+
+    def test_reject_when_full(self):
+        pool = self.make_pool("reject")
+        rejected = []
+        self.assertTrue(pool.submit(lambda: None))
+        self.assertFalse(pool.submit(lambda x: None, 1, on_reject=rejected.append))
+        self.assertEqual((rejected, pool.depth), ([1], 1))
+
+    def test_shed_oldest(self):
+        pool = self.make_pool("shed-oldest")
+        shed, done = [], threading.Event()
+        pool.submit(lambda x: None, "old", on_reject=shed.append)
+        self.assertTrue(pool.submit(lambda x: done.set(), "new", on_reject=shed.append))
+        self.assertEqual(shed, ["old"])
+        self.gate.set()
+        self.assertTrue(done.wait(5))
+
+    def test_block_until_slot_frees(self):
+        pool = self.make_pool("block")
+        pool.submit(lambda: None)
+        submitted = threading.Event()
+        threading.Thread(target=lambda: (pool.submit(lambda: None), submitted.set()), daemon=True).start()
+        self.assertFalse(submitted.wait(0.2))
+        self.gate.set()
+        self.assertTrue(submitted.wait(5))
+
+
+if __name__ == '__main__':
+    unittest.main()
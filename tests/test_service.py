@@ -0,0 +1,366 @@
+import os
+import pstats
+import socket
+import tempfile
+import threading
+import time
+import unittest
+from core.audit import AuditLog
+from core.bank_service import BankService, PeerUnavailable
+from core.commands import CommandSpec, ParseError, parse_command
+from core.peer_registry import PeerRegistry
+from core.profiling import ProfileSession
+from core.server import BankNode
+from shared.persistence.repository import AccountRepository
+from shared.structures.RingBuffer import RingBuffer
+
+
+class ServiceTestCase(unittest.TestCase):
+    """Base class: a BankService on a throw-away data directory."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.repository = AccountRepository(f"{self.tmp.name}/accounts.json", fsync_every=0)
+        self.service = BankService(self.repository)
+
+    def tearDown(self):
+        self.repository.close()
+        self.tmp.cleanup()
+
+    def run_cmd(self, command: str) -> str:
+        return self.service.execute_command(command, "127.0.0.1")
+
+    def new_account(self) -> str:
+        return self.run_cmd("AC").split()[1]
+
+
+class TestAccountHistory(ServiceTestCase):
+    def test_history_is_paged_newest_first(self):
+        account = self.new_account()
+        other = self.new_account()
+        for amount in (100, 200, 300):
+            self.run_cmd(f"AD {account} {amount}")
+        self.run_cmd(f"AD {other} 50")
+        self.run_cmd(f"AW {account} 25")
+
+        entries = self.run_cmd(f"AH {account} 0 2")[3:].split(";")
+        self.assertEqual([e.split()[1:] for e in entries],
+                         [["AW", account.split("/")[0], "25"], ["AD", account.split("/")[0], "300"]])
+        self.assertEqual(len(self.run_cmd(f"AH {account} 1 2")[3:].split(";")), 2)
+        self.assertEqual(len(self.run_cmd(f"AH {account} 2 2")[3:].split(";")), 1)  # Only the AC is left
+        self.assertEqual(self.run_cmd(f"AH {account} 5 2"), "AH")
+
+
+class TestCommandDispatch(ServiceTestCase):
+    def test_parser_converts_arguments_once(self):
+        request = parse_command("ad 12345/10.0.0.1 500")
+        self.assertEqual((request.command, request.account, request.target_ip, request.amount),
+                         ("AD", 12345, "10.0.0.1", 500))
+        self.assertEqual(parse_command("AH 12345 2 5").args, ("2", "5"))
+        self.assertIsNone(parse_command("AB 12345").target_ip)
+        for line, error in (("", "Empty command"), ("AD 12345 10", "Invalid account format"),
+                            ("AB 12345/bank.example", "Invalid account format"),
+                            ("AB 12345/010.0.0.1", "Invalid account format"),
+                            ("AB 12345/10.0.0.256", "Invalid account format"),
+                            ("AW 12345/1.2.3.4", "Invalid format"), ("AD 12345/1.2.3.4 ten", "Invalid amount")):
+            with self.assertRaises(ParseError) as ctx:
+                parse_command(line)
+            self.assertEqual(str(ctx.exception), error)
+
+    def test_parse_errors_and_unknown_commands(self):
+        self.assertEqual(self.run_cmd("AD 12345 10"), "ER Invalid account format")
+        self.assertEqual(self.run_cmd("AR"), "ER Invalid format")
+        self.assertEqual(self.run_cmd("XYZ 1"), "ER Unknown command")
+
+    def test_register_command(self):
+        self.service.register_command("AX", lambda request, client_ip: f"AX {request.account * 2}",
+                                      CommandSpec(1, 1, account=True))
+        self.assertEqual(self.run_cmd("AX 21"), "AX 42")
+        self.assertEqual(self.service.metrics.histogram("bank_command_seconds", command="AX").count, 1)
+
+
+class TestBatch(ServiceTestCase):
+    def test_local_batch(self):
+        first, second = self.new_account(), self.new_account()
+        self.assertEqual(self.run_cmd(f"BT AD {first} 100;AW {first} 40;AD {second} 7;AB {first};"),
+                         "BT AD;AW;AD;AB 60")
+        self.assertEqual(self.run_cmd(f"BT AD {second} 10;AW {first} 1000"),
+                         "BT ER Not applied;ER Insufficient funds")
+        self.assertEqual(self.run_cmd(f"AB {second}"), "AB 7")  # The whole batch was rolled back
+        self.assertEqual(self.run_cmd(f"BT AD {first} 1;AC"), "ER Op 2: AC is not allowed in a batch")
+        self.assertEqual(self.run_cmd(f"BT AD {first} x"), "ER Op 1: Invalid amount")
+
+
+class TestTransfer(ServiceTestCase):
+    def test_local_transfer(self):
+        first, second = self.new_account(), self.new_account()
+        self.run_cmd(f"AD {first} 100")
+        records = self.repository.wal.record_count
+        self.assertEqual(self.run_cmd(f"AT {first} {second} 30"), "AT")
+        self.assertEqual(self.repository.wal.record_count, records + 3)  # One batch: header + two balances
+        self.assertEqual(self.run_cmd(f"AB {first}"), "AB 70")
+        self.assertEqual(self.run_cmd(f"AB {second}"), "AB 30")
+        self.assertEqual(self.run_cmd(f"AT {first} {second} 500"), "ER Insufficient funds")
+        self.assertEqual(self.run_cmd(f"AT {first} 99999/127.0.0.1 5"), "ER Account not found")
+        self.assertEqual(self.run_cmd(f"AB {first}"), "AB 70")  # Nothing was debited
+        self.assertEqual(self.run_cmd(f"AT {first} {second} 0"), "ER Amount must be positive")
+        self.assertEqual(self.run_cmd(f"AT {first} {second.split('/')[0]} 5"), "ER Invalid account format")
+
+
+class TestProfiling(ServiceTestCase):
+    def wait_for_profile(self):
+        deadline = time.monotonic() + 5
+        while self.run_cmd("PF") == "PF running":
+            self.assertLess(time.monotonic(), deadline)
+            time.sleep(0.02)
+
+    def test_command_profile(self):
+        self.assertEqual(self.service.execute_command("PF cprofile 1", "10.0.0.9"), "ER Not allowed")
+        account = self.new_account()
+        path = self.run_cmd("PF cprofile 0.5").split(" ", 1)[1]
+        self.assertEqual(self.run_cmd("PF sample 1"), "ER A profile is already running")
+        for _ in range(20):
+            self.run_cmd(f"AD {account} 1")
+        self.wait_for_profile()
+        self.assertEqual(self.run_cmd("PF"), f"PF idle {path}")
+        self.assertNotIn("execute_command", vars(self.service))  # Unhooked after the window
+        stats = pstats.Stats(path).stats
+        self.assertTrue(any(name == "_account_deposit" for _, _, name in stats))
+
+    def test_stack_samples(self):
+        path = self.run_cmd("PF sample 0.1 1").split(" ", 1)[1]
+        self.wait_for_profile()
+        with open(path, encoding="utf-8") as f:
+            lines = f.read().splitlines()
+        self.assertTrue(lines)
+        self.assertTrue(all(line.rsplit(" ", 1)[1].isdigit() for line in lines))
+        self.assertEqual(self.run_cmd("PF trace 1"), "ER Unknown profile mode: trace")
+
+    def test_profiles_in_the_same_second_get_their_own_file(self):
+        session = ProfileSession(self.service, f"{self.tmp.name}/profiles")
+        session.directory.mkdir()
+        first, second = session._reserve_file("sample"), session._reserve_file("sample")
+        self.assertNotEqual(first, second)
+        self.assertTrue(first.exists() and second.exists())
+
+
+class TestNetworkAggregates(ServiceTestCase):
+    def start_peer(self, balance: int) -> tuple:
+        repository = AccountRepository(f"{self.tmp.name}/peer{balance}/accounts.json", fsync_every=0)
+        self.peer_account = repository.create_next().number  # Of the last started peer
+        repository.deposit(self.peer_account, balance)
+        node = BankNode("127.0.0.1", 0, BankService(repository))
+        thread = threading.Thread(target=node.start_server, daemon=True)
+        thread.start()
+        self.assertTrue(node.ready.wait(5))
+        self.addCleanup(repository.close)
+        self.addCleanup(thread.join, 5)
+        self.addCleanup(node.stop)
+        return "127.0.0.1", node.port
+
+    def silent_peer(self) -> tuple:
+        """Accepts connections but never answers (a hung bank)."""
+        listener = socket.socket()
+        listener.bind(("127.0.0.1", 0))
+        listener.listen()
+        self.addCleanup(listener.close)
+        return listener.getsockname()
+
+    def test_per_peer_state_is_bounded(self):
+        registry = self.service.peer_registry = PeerRegistry(ports=range(1, 2), negative_ttl=60)
+        self.addCleanup(registry.stop)
+        self.service.breakers.max_breakers = registry.max_entries = 4
+        for host in range(10):
+            self.assertTrue(self.run_cmd(f"AB 12345/127.0.0.{host + 2}").startswith("ER No bank found"))
+        self.assertEqual((len(registry.entries()), len(self.service.breakers.items())), (4, 4))
+        peers = {dict(labels).get("peer") for (name, labels), _ in self.service.metrics.items()
+                 if name.startswith("bank_forward")}
+        self.assertIn("unknown", peers)
+        self.assertFalse(peers & {f"127.0.0.{host + 2}" for host in range(10)})
+
+    def test_half_open_trial_always_reports_back(self):
+        breaker = self.service.breakers.get("10.9.9.9")
+        breaker.failures, breaker.state = 3, "half-open"
+
+        def broken_resolve(ip):
+            raise RuntimeError("routing table unavailable")
+
+        self.service.peer_registry.resolve = broken_resolve
+        with self.assertRaises(PeerUnavailable):
+            self.service._send_to_peer("10.9.9.9", "BA")
+        self.assertEqual(breaker.state, "open")  # The failed trial was recorded
+        breaker._opened_at -= breaker.reset_timeout
+        self.assertTrue(breaker.allow())  # ... so a new trial is let through later
+        self.assertFalse(breaker.allow())
+        breaker._trial_started -= breaker.trial_timeout
+        self.assertTrue(breaker.allow())  # A trial that never reported back times out
+
+    def test_fan_out_with_partial_results(self):
+        account = self.new_account()
+        self.run_cmd(f"AD {account} 100")
+        offline = self.silent_peer()
+        closed = socket.socket()
+        closed.bind(("127.0.0.1", 0))
+        closed_port = closed.getsockname()[1]
+        closed.close()  # Nothing listens here: connection refused
+
+        self.service.peers = [self.start_peer(500), self.start_peer(250), offline, ("127.0.0.1", closed_port)]
+        self.service.fanout_timeout = 0.5
+        start = time.monotonic()
+        self.assertEqual(self.run_cmd("NA"), "NA 850 3/5")
+        self.assertLess(time.monotonic() - start, 1.5)  # Roughly one timeout, not one per peer
+        self.assertEqual(self.run_cmd("NN"), "NN 3 3/5")
+
+    def test_batch_groups_operations_per_bank(self):
+        ip, port = self.start_peer(500)
+        self.service.my_ips = ["10.255.255.1"]  # 127.0.0.1 is the peer bank for this service
+        self.service.peer_registry = PeerRegistry(ports=range(port, port + 1))
+        self.addCleanup(self.service.peer_registry.stop)
+        local = f"{self.repository.create_next().number}/10.255.255.1"
+        remote = f"{self.peer_account}/{ip}"
+        batch = f"BT AD {local} 5;AB {remote};AW {remote} 100;AD {local} 1;AB {remote}"
+        self.assertEqual(self.run_cmd(batch), "BT AD;AB 500;AW;AD;AB 400")
+        self.assertEqual(self.service.peer_pool.stats()["misses"], 1)  # One sub-batch for the peer
+
+    def test_transfer_to_another_bank(self):
+        ip, port = self.start_peer(0)
+        self.service.my_ips = ["10.255.255.1"]  # 127.0.0.1 is the peer bank for this service
+        self.service.peer_registry = PeerRegistry(ports=range(port, port + 1))
+        self.addCleanup(self.service.peer_registry.stop)
+        local = f"{self.repository.create_next().number}/10.255.255.1"
+        self.run_cmd(f"AD {local} 100")
+
+        self.assertEqual(self.run_cmd(f"AT {local} {self.peer_account}/{ip} 30"), "AT")
+        self.assertEqual(self.run_cmd(f"AB {self.peer_account}/{ip}"), "AB 30")
+        # The destination refuses: the debit is refunded
+        self.assertEqual(self.run_cmd(f"AT {local} 99999/{ip} 30"), "ER Account not found")
+        self.assertEqual(self.run_cmd(f"AB {local}"), "AB 70")
+        self.assertEqual(self.repository.intents(), {})
+
+    def test_unreachable_transfer_is_refunded_at_once(self):
+        closed = socket.socket()
+        closed.bind(("127.0.0.1", 0))
+        closed_port = closed.getsockname()[1]
+        closed.close()  # Nothing listens here: no bank found
+        self.service.my_ips = ["10.255.255.1"]
+        self.service.peer_registry = PeerRegistry(ports=range(closed_port, closed_port + 1))
+        self.addCleanup(self.service.peer_registry.stop)
+        local = f"{self.repository.create_next().number}/10.255.255.1"
+        self.run_cmd(f"AD {local} 100")
+
+        response = self.run_cmd(f"AT {local} 12345/127.0.0.1 40")
+        self.assertTrue(response.startswith("ER No bank found at 127.0.0.1"), response)  # TP never sent
+        self.assertEqual(self.run_cmd(f"AB {local}"), "AB 100")
+        self.assertEqual(self.repository.intents(), {})
+
+    def test_unanswered_transfer_is_recovered(self):
+        def no_answer(line):
+            raise PeerUnavailable("Timeout connecting to 127.0.0.1")
+        self.service.my_ips = ["10.255.255.1"]
+        self.service._transfer_channel = lambda account, ip: no_answer
+        local = f"{self.repository.create_next().number}/10.255.255.1"
+        self.run_cmd(f"AD {local} 100")
+
+        response = self.run_cmd(f"AT {local} 12345/127.0.0.1 40")
+        self.assertTrue(response.startswith("ER Transfer ") and " pending: " in response, response)
+        self.assertEqual(self.run_cmd(f"AB {local}"), "AB 60")  # Debited, intent open
+        self.assertEqual(self.service.recover_transfers(), 1)  # Still no answer
+
+        # The bank answers again but never saw the prepare: recovery refunds
+        del self.service._transfer_channel
+        _, port = self.start_peer(0)
+        self.service.peer_registry = PeerRegistry(ports=range(port, port + 1))
+        self.addCleanup(self.service.peer_registry.stop)
+        self.service._pending_transfers.clear()  # Skip the retry delay
+        self.assertEqual(self.service.recover_transfers(), 0)
+        self.assertEqual(self.run_cmd(f"AB {local}"), "AB 100")
+        self.assertEqual(self.repository.intents(), {})
+
+    def test_unanswered_transfer_is_aborted(self):
+        def no_answer(line):
+            raise PeerUnavailable("Timeout connecting to 127.0.0.1")
+        self.service.my_ips = ["10.255.255.1"]
+        self.service._transfer_channel = lambda account, ip: no_answer
+        self.service.transfer_abort_after = 0
+        local = f"{self.repository.create_next().number}/10.255.255.1"
+        self.run_cmd(f"AD {local} 100")
+
+        self.assertIn(" pending: ", self.run_cmd(f"AT {local} 12345/127.0.0.1 40"))  # The TP got no answer
+        self.assertEqual(self.service.recover_transfers(), 0)  # No TC ever left: refunded
+        self.assertEqual(self.run_cmd(f"AB {local}"), "AB 100")
+
+        self.assertIn(" pending: ", self.run_cmd(f"AT {local} 12345/127.0.0.1 40"))
+        self.service._pending_transfers.clear()  # As after a restart: a TC may have been sent
+        self.assertEqual(self.service.recover_transfers(), 1)  # Never refunded on our own
+        self.assertEqual(self.run_cmd(f"AB {local}"), "AB 60")
+
+    def test_aborted_transfer_is_refunded_after_a_lost_reply(self):
+        ip, port = self.start_peer(0)
+        self.service.my_ips = ["10.255.255.1"]
+        self.service.peer_registry = PeerRegistry(ports=range(port, port + 1))
+        self.addCleanup(self.service.peer_registry.stop)
+        number = self.repository.create_next().number
+        self.run_cmd(f"AD {number}/10.255.255.1 100")
+        destination = f"{self.peer_account}/{ip}"
+
+        # An AT that was prepared, then the destination account was removed and the TC reply got lost
+        self.repository.apply_batch([("withdraw", number, 50)], open_intent=("abc123", f"out {number} {destination} 50"))
+        self.assertEqual(self.service._send_to_peer(ip, f"TP {destination} 50 abc123"), "TP")
+        self.assertEqual(self.service._send_to_peer(ip, f"AR {destination}"), "AR")
+        self.assertEqual(self.service._send_to_peer(ip, f"TC {destination} abc123"),
+                         "ER Transfer aborted: Account not found")
+        self.assertEqual(self.service._send_to_peer(ip, f"TP {destination} 50 abc123"), "ER Transfer aborted")
+
+        self.assertEqual(self.service.recover_transfers(), 0)  # The retried TC reports the abort: refund
+        self.assertEqual(self.run_cmd(f"AB {number}/10.255.255.1"), "AB 100")
+        self.assertEqual(self.repository.intents(), {})
+
+    def test_transfer_commands_are_idempotent(self):
+        account = f"{self.new_account().split('/')[0]}/127.0.0.1"
+        self.assertEqual(self.run_cmd(f"TP {account} 25 t1"), "TP")
+        self.assertEqual(self.run_cmd(f"TP {account} 25 t1"), "TP")
+        self.assertEqual(self.run_cmd(f"TC {account} t1"), "TC")
+        self.assertEqual(self.run_cmd(f"TC {account} t1"), "TC")  # Retried commit: credited once
+        self.assertEqual(self.run_cmd(f"AB {account}"), "AB 25")
+        self.assertEqual(self.run_cmd(f"TP {account} 25 t1"), "ER Transfer already committed")
+        self.assertEqual(self.run_cmd(f"TC {account} t2"), "ER Unknown transfer")
+        self.assertEqual(self.run_cmd(f"TP 99999/127.0.0.1 25 t3"), "ER Account not found")
+
+    def test_incoming_transfer_expires_and_is_acknowledged(self):
+        account = f"{self.new_account().split('/')[0]}/127.0.0.1"
+        self.assertEqual(self.run_cmd(f"TP {account} 25 t1"), "TP")
+        self.service.incoming_transfer_ttl = -1
+        self.service.recover_transfers()  # No TC came: the prepared transfer is aborted
+        self.assertEqual(self.run_cmd(f"TC {account} t1"), "ER Transfer aborted")
+        self.assertEqual(self.run_cmd(f"AB {account}"), "AB 0")
+        self.assertEqual(self.run_cmd(f"TA {account} t1"), "TA")  # The source refunded: outcome dropped
+        self.assertEqual(self.run_cmd(f"TC {account} t1"), "ER Unknown transfer")
+
+    def test_without_peers(self):
+        self.new_account()
+        self.assertEqual(self.run_cmd("NN"), "NN 1 1/1")
+
+
+class TestAuditLog(unittest.TestCase):
+    def test_ring_buffer_evicts_oldest(self):
+        ring = RingBuffer(3)
+        evicted = [ring.add(i) for i in range(5)]
+        self.assertEqual(evicted, [None, None, None, 0, 1])
+        self.assertEqual(list(ring), [2, 3, 4])
+        self.assertEqual(list(ring.newest_first()), [4, 3, 2])
+
+    def test_evicted_records_spill_to_disk(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            spill = os.path.join(tmp, "audit.log")
+            log = AuditLog(capacity=2, spill_file=spill, spill_batch=2)
+            for amount in range(5):
+                log.record("AD", 10001, amount)
+            log.flush()
+            with open(spill, encoding="utf-8") as f:
+                archived = [line.split()[-1] for line in f]
+            self.assertEqual(archived, ["0", "1", "2"])
+            self.assertEqual([r.amount for r in log.history(10001)], [4, 3])
+
+
+if __name__ == '__main__':
+    unittest.main()